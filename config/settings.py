@@ -39,6 +39,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'movies.replicas.PrimariaTrasEscrituraMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -71,6 +72,55 @@ DATABASES = {
     }
 }
 
+# Perfil de producción de SQLite: WAL (los lectores no esperan a los escritores),
+# conexiones persistentes y transacciones IMMEDIATE (el bloqueo de escritura se
+# toma al empezar, así busy_timeout espera en lugar de fallar con "database is
+# locked"). `manage.py mantener_sqlite` hace el checkpoint del WAL y `optimize`;
+# `manage.py benchmark_sqlite` compara ambos perfiles.
+SQLITE_PRODUCCION = True
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # con WAL solo arriesga la última transacción ante un corte de luz
+    'busy_timeout': 5000,  # milisegundos
+    'cache_size': -20000,  # negativo = KiB por conexión
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCCION:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {nombre}={valor}' for nombre, valor in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+# Réplicas de lectura (movies.replicas): las vistas de lectura pesada y los
+# listados del admin leen de una réplica cuando está al día con el último
+# cambio de cada modelo; las escrituras van siempre a `default`. La réplica
+# SQLite es una copia que renueva `manage.py actualizar_replica` (cron); sin
+# el archivo, todo se lee de la primaria. Una réplica de Postgres se agrega
+# igual, p. ej. {'ENGINE': 'django.db.backends.postgresql', 'HOST': ..., 'CONN_MAX_AGE': 60}.
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db_replica.sqlite3',
+    # Sin conexiones persistentes: cada petición abre la copia vigente
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {
+        'init_command': 'PRAGMA query_only=1',
+    },
+}
+REPLICAS_LECTURA = {
+    'ALIAS': ['replica'],
+    'APPS': ['movies'],
+    'MAX_RETRASO': 300,  # segundos; solo para modelos sin fecha de último cambio conocida
+    'VENTANA_PRIMARIA': 10,  # segundos que un cliente lee de la primaria tras escribir
+    'COOKIE': 'vs_primaria',
+}
+DATABASE_ROUTERS = ['movies.replicas.RouterReplicas']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -207,9 +257,52 @@ DEFAULT_FROM_EMAIL = 'jhonalvarezj120@gmail.com'
 
 SITE_ID = 1
 
+# Caché (movies.cache, movies.cache_inicio, generaciones de los índices en memoria).
+# locmem es por proceso: con varios workers usar un backend compartido para que
+# las invalidaciones lleguen a todos, p. ej.
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vivastream',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
 # Configuración de expiración de tokens de activación
 ACCOUNT_ACTIVATION_TOKEN_EXPIRY_DAYS = 3
 
+# Buffer de escritura diferida del progreso de reproducción
+PROGRESO_BUFFER = {
+    'INTERVALO': 5.0,  # segundos entre volcados a la base de datos
+    'MAX_PENDIENTES': 500,  # vuelca antes si se acumulan tantas entradas
+}
+
+# Cola de escritura con commit agrupado (movies.escritura): un hilo escritor
+# ejecuta en una sola transacción lo que encolan las vistas
+ESCRITURA_AGRUPADA = {
+    'ACTIVA': True,
+    'MAX_COLA': 1000,  # operaciones pendientes antes de escribir desde el hilo de la petición
+    'MAX_LOTE': 100,  # operaciones por transacción
+    'VENTANA': 0.002,  # segundos que se espera a más operaciones para el mismo commit
+}
+
+# Búsqueda del navbar: índice de trigramas en memoria (tolera tildes y errores de tipeo).
+# Quitar para usar el índice FTS5 de SQLite o el backend nativo de la base de datos
+# (que se sigue manteniendo mientras tanto, así que el cambio no exige reconstruirlo).
+BUSQUEDA_BACKEND = 'movies.busqueda.BusquedaTrigramas'
+
+# Entrega de videos alojados en MEDIA_ROOT (movies.streaming).
+# 'django' sirve los rangos desde Django; 'x-accel-redirect' (nginx, con una
+# location `internal` en PREFIJO_INTERNO que apunte a MEDIA_ROOT) o 'x-sendfile'
+# delegan el envío en el servidor web tras comprobar el login.
+VIDEO_ENTREGA = {
+    'MODO': 'django',
+    'PREFIJO_INTERNO': '/protegido/media/',
+}
+
 # Configuración de redirección de autenticación
 LOGIN_URL = 'movies:login'
 
@@ -1,6 +1,17 @@
 from django.contrib import admin
 from django import forms
-from .models import Genre, Movie, Favorite, WatchHistory, Rating
+from .models import Genre, Movie, Favorite, WatchHistory, Rating, ResumenHorarioPelicula, ResumenHorarioGenero
+from .replicas import en_replica
+
+
+class ListadoEnReplicaAdmin(admin.ModelAdmin):
+    """Los listados (GET) leen de la réplica; las acciones masivas y los formularios, de la primaria."""
+    
+    def changelist_view(self, request, extra_context=None):
+        if request.method in ('GET', 'HEAD'):
+            return en_replica(super().changelist_view)(request, extra_context)
+        return super().changelist_view(request, extra_context)
+
 
 class MovieAdminForm(forms.ModelForm):
     duracion_display = forms.CharField(
@@ -67,14 +78,14 @@ class MovieAdminForm(forms.ModelForm):
         return instance
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(ListadoEnReplicaAdmin):
     list_display = ['nombre']
     search_fields = ['nombre']
     ordering = ['nombre']
 
 
 @admin.register(Movie)
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(ListadoEnReplicaAdmin):
     form = MovieAdminForm
     list_display = ['titulo', 'año_publicacion', 'duracion_formateada', 'fecha_agregado']
     list_filter = ['generos', 'año_publicacion', 'fecha_agregado']
@@ -97,7 +108,7 @@ class MovieAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ListadoEnReplicaAdmin):
     list_display = ['usuario', 'pelicula', 'fecha_agregado']
     list_filter = ['fecha_agregado']
     search_fields = ['usuario__username', 'pelicula__titulo']
@@ -108,7 +119,7 @@ class FavoriteAdmin(admin.ModelAdmin):
 
 
 @admin.register(WatchHistory)
-class WatchHistoryAdmin(admin.ModelAdmin):
+class WatchHistoryAdmin(ListadoEnReplicaAdmin):
     list_display = ['usuario', 'pelicula', 'timestamp_display', 'progreso_display', 'completado', 'ultima_visualizacion']
     list_filter = ['completado', 'ultima_visualizacion']
     search_fields = ['usuario__username', 'pelicula__titulo']
@@ -130,7 +141,7 @@ class WatchHistoryAdmin(admin.ModelAdmin):
     progreso_display.short_description = 'Progreso'
 
 @admin.register(Rating)
-class RatingAdmin(admin.ModelAdmin):
+class RatingAdmin(ListadoEnReplicaAdmin):
     list_display = ['usuario', 'pelicula', 'puntuacion', 'fecha_creacion']
     list_filter = ['puntuacion', 'fecha_creacion']
     search_fields = ['usuario__username', 'pelicula__titulo', 'resena']
@@ -148,4 +159,42 @@ class RatingAdmin(admin.ModelAdmin):
             'fields': ('fecha_creacion', 'fecha_modificacion'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(ResumenHorarioPelicula)
+class ResumenHorarioPeliculaAdmin(ListadoEnReplicaAdmin):
+    list_display = ['hora', 'pelicula', 'vistas', 'completadas', 'minutos_vistos']
+    list_filter = ['hora']
+    search_fields = ['pelicula__titulo']
+    ordering = ['-hora', '-vistas']
+    date_hierarchy = 'hora'
+    list_select_related = ['pelicula']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def minutos_vistos(self, obj):
+        return obj.segundos_vistos // 60
+    minutos_vistos.short_description = 'Minutos vistos'
+
+
+@admin.register(ResumenHorarioGenero)
+class ResumenHorarioGeneroAdmin(ListadoEnReplicaAdmin):
+    list_display = ['hora', 'genero', 'vistas', 'completadas', 'minutos_vistos']
+    list_filter = ['hora', 'genero']
+    ordering = ['-hora', '-vistas']
+    date_hierarchy = 'hora'
+    list_select_related = ['genero']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def minutos_vistos(self, obj):
+        return obj.segundos_vistos // 60
+    minutos_vistos.short_description = 'Minutos vistos'
@@ -0,0 +1,141 @@
+"""
+Agregación del registro de eventos de visualización en resúmenes por hora.
+
+`agregar` procesa los eventos posteriores a la marca guardada en
+`MarcaAgregacion`, en lotes por rango de id: cada lote se agrupa en SQL por
+(hora, película) y (hora, género) y se suma a las filas existentes de
+`ResumenHorarioPelicula` y `ResumenHorarioGenero` en la misma transacción que
+avanza la marca, así que un lote nunca se cuenta dos veces. Los eventos de los
+últimos `MARGEN` se dejan para la siguiente pasada: inserciones concurrentes
+pueden confirmarse fuera de orden de id.
+
+Los consumidores (tendencias, reportes, capacidad) leen los resúmenes y no el
+registro crudo, que puede purgarse una vez agregado. La purga conserva el
+evento de la marca: la marca sirve mientras los ids nuevos sean mayores, y
+con ese evento en la tabla ningún motor puede volver a entregar un id ya
+usado (SQLite usa AUTOINCREMENT, pero un motor que parte de max(id) lo haría).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Least, Trunc
+from django.utils import timezone
+
+from .models import (
+    EventoVisualizacion, Genre, MarcaAgregacion, Movie, ResumenHorarioGenero, ResumenHorarioPelicula,
+)
+
+MARCA = 'eventos_visualizacion'
+MARGEN = timedelta(minutes=1)
+DECILES = 10
+
+
+def agregar(lote=50000):
+    """Agrega los eventos pendientes en lotes. Devuelve cuántos eventos procesó."""
+    limite = timezone.now() - MARGEN
+    total = 0
+    while True:
+        procesados = _agregar_lote(lote, limite)
+        total += procesados
+        if procesados < lote:
+            return total
+
+
+def purgar(dias):
+    """
+    Borra los eventos ya agregados con más de `dias` días, salvo el de la
+    marca (ver el docstring del módulo). Devuelve cuántos borró.
+    """
+    marca = MarcaAgregacion.objects.filter(nombre=MARCA).values_list('ultimo_id', flat=True).first() or 0
+    borrados, _ = EventoVisualizacion.objects.filter(
+        fecha__lt=timezone.now() - timedelta(days=dias),
+        id__lt=marca,
+    ).delete()
+    return borrados
+
+
+def _agregar_lote(lote, limite):
+    with transaction.atomic():
+        marca, _ = MarcaAgregacion.objects.select_for_update().get_or_create(nombre=MARCA)
+        ids = list(
+            EventoVisualizacion.objects.filter(id__gt=marca.ultimo_id, fecha__lt=limite)
+            .order_by('id')
+            .values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            return 0
+
+        eventos = (
+            EventoVisualizacion.objects.filter(id__gt=marca.ultimo_id, id__lte=ids[-1])
+            .annotate(hora=Trunc('fecha', 'hour'))
+            .order_by()
+        )
+        totales = dict(
+            vistas=Count('id', filter=Q(tipo=EventoVisualizacion.INICIO)),
+            completadas=Count('id', filter=Q(tipo=EventoVisualizacion.FIN)),
+            segundos_vistos=Sum('segundos'),
+        )
+
+        por_pelicula = {
+            (fila['hora'], fila['pelicula_id']): fila
+            for fila in eventos.values('hora', 'pelicula_id').annotate(**totales)
+        }
+        deciles = (
+            eventos.annotate(decil=Least(F('porcentaje') / DECILES, Value(DECILES - 1)))
+            .values_list('hora', 'pelicula_id', 'decil')
+            .annotate(latidos=Count('id'))
+        )
+        for hora, pelicula_id, decil, latidos in deciles:
+            curva = por_pelicula[(hora, pelicula_id)].setdefault('curva', [0] * DECILES)
+            curva[decil] += latidos
+
+        por_genero = {
+            (fila['hora'], fila['pelicula__generos']): fila
+            for fila in eventos.filter(pelicula__generos__isnull=False)
+            .values('hora', 'pelicula__generos')
+            .annotate(**totales)
+        }
+
+        _sumar(ResumenHorarioPelicula, 'pelicula', Movie, por_pelicula)
+        _sumar(ResumenHorarioGenero, 'genero', Genre, por_genero)
+
+        marca.ultimo_id = ids[-1]
+        marca.save(update_fields=['ultimo_id', 'fecha'])
+        return len(ids)
+
+
+def _sumar(modelo, campo, modelo_referido, filas):
+    """Suma `filas` {(hora, id): totales} a las filas existentes de `modelo` o las crea."""
+    if not filas:
+        return
+    # El registro no tiene claves foráneas: descartar películas o géneros ya borrados
+    vigentes = set(
+        modelo_referido.objects.filter(pk__in={pk for _, pk in filas}).values_list('pk', flat=True)
+    )
+    filas = {clave: fila for clave, fila in filas.items() if clave[1] in vigentes}
+
+    existentes = {
+        (resumen.hora, getattr(resumen, f'{campo}_id')): resumen
+        for resumen in modelo.objects.filter(
+            hora__in={hora for hora, _ in filas},
+            **{f'{campo}_id__in': {pk for _, pk in filas}},
+        )
+    }
+    nuevos, actualizados = [], []
+    for (hora, pk), fila in filas.items():
+        resumen = existentes.get((hora, pk))
+        if resumen is None:
+            resumen = modelo(hora=hora, **{f'{campo}_id': pk})
+            nuevos.append(resumen)
+        else:
+            actualizados.append(resumen)
+        resumen.vistas += fila['vistas']
+        resumen.completadas += fila['completadas']
+        resumen.segundos_vistos += fila['segundos_vistos'] or 0
+        if 'curva' in fila:
+            resumen.curva = [a + b for a, b in zip(resumen.curva or [0] * DECILES, fila['curva'])]
+
+    campos = ['vistas', 'completadas', 'segundos_vistos'] + (['curva'] if modelo is ResumenHorarioPelicula else [])
+    modelo.objects.bulk_create(nuevos, batch_size=1000)
+    modelo.objects.bulk_update(actualizados, campos, batch_size=1000)
@@ -0,0 +1,73 @@
+"""
+Almacenamiento de pósters direccionado por contenido.
+
+Cada archivo se guarda como `<carpeta>/<h[:2]>/<h>.<ext>`, con `h` el SHA-256
+de su contenido: subir dos veces la misma imagen (con el mismo nombre o con
+otro) deja un solo archivo, y una URL nunca cambia de contenido. Por eso
+`servir_media` responde esas rutas (y las de los derivados, también con hash)
+con `Cache-Control: immutable` y un año de vigencia: navegadores y proxies no
+necesitan revalidarlas. En producción el servidor web debe enviar la misma
+cabecera para `MEDIA_URL`.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+# Un año, el máximo que respetan la mayoría de las cachés
+DURACION_INMUTABLE = 365 * 24 * 60 * 60
+RUTA_INMUTABLE = re.compile(r'(^|/)([0-9a-f]{2}/[0-9a-f]{64}\.\w+|derivados/[0-9a-f]{32}/\d+\.\w+)$')
+
+
+def hash_contenido(contenido):
+    sha = hashlib.sha256()
+    contenido.seek(0)
+    for bloque in contenido.chunks():
+        sha.update(bloque)
+    contenido.seek(0)
+    return sha.hexdigest()
+
+
+def ruta_por_contenido(nombre, contenido):
+    carpeta, archivo = os.path.split(nombre)
+    extension = os.path.splitext(archivo)[1].lower()
+    huella = hash_contenido(contenido)
+    return os.path.join(carpeta, huella[:2], f'{huella}{extension}').replace(os.sep, '/')
+
+
+def es_inmutable(nombre):
+    return bool(RUTA_INMUTABLE.search(nombre))
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """`FileSystemStorage` que nombra los archivos por su hash y no duplica contenido ya guardado."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        ruta = ruta_por_contenido(name, content)
+        if self.exists(ruta):
+            return ruta
+        return super().save(ruta, content, max_length=max_length)
+
+
+almacenamiento = AlmacenamientoPorContenido()
+
+
+def almacenamiento_posters():
+    # Invocable para que las migraciones no serialicen la instancia
+    return almacenamiento
+
+
+def servir_media(request, path, document_root=None, show_indexes=False):
+    """`django.views.static.serve` con caché inmutable para las rutas direccionadas por contenido."""
+    respuesta = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if respuesta.status_code == 200 and es_inmutable(path):
+        patch_cache_control(respuesta, public=True, max_age=DURACION_INMUTABLE, immutable=True)
+    return respuesta
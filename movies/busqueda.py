@@ -0,0 +1,243 @@
+"""
+Búsqueda de texto completo sobre título, descripción y nombres de género.
+
+El backend se elige con `settings.BUSQUEDA_BACKEND` (ruta a la clase) o, si
+no está definido, según el motor de la base de datos: FTS5 en SQLite,
+`tsvector` en PostgreSQL y `icontains` como último recurso. `BusquedaTrigramas`
+busca en memoria y solo lee de la base de datos las películas encontradas.
+Las señales de `movies.signals` mantienen el índice sincronizado llamando a
+`indexar` y `eliminar`.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Movie
+from .trigramas import IndiceTrigramas
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+MAX_TOKENS = 8
+
+
+def tokenizar(consulta):
+    return TOKEN.findall(consulta.lower())[:MAX_TOKENS]
+
+
+class BackendBusqueda:
+    """Interfaz común: cada backend devuelve IDs de película ordenados por relevancia."""
+
+    def buscar(self, consulta, limite=15):
+        raise NotImplementedError
+
+    def resultados(self, consulta, limite=15):
+        """Películas (con géneros precargados) en orden de relevancia."""
+        ids = self.buscar(consulta, limite)
+        peliculas = Movie.objects.prefetch_related('generos').in_bulk(ids)
+        return [peliculas[pk] for pk in ids if pk in peliculas]
+
+    def indexar(self, pelicula_ids):
+        pass
+
+    def eliminar(self, pelicula_ids):
+        pass
+
+    def reconstruir(self):
+        pass
+
+
+class BusquedaIcontains(BackendBusqueda):
+    def buscar(self, consulta, limite=15):
+        return list(
+            Movie.objects.filter(
+                Q(titulo__icontains=consulta) |
+                Q(descripcion__icontains=consulta)
+            ).values_list('id', flat=True)[:limite]
+        )
+
+
+class BusquedaSQLiteFTS5(BackendBusqueda):
+    """
+    Tabla virtual FTS5 con rowid = id de la película. El tokenizador
+    `unicode61 remove_diacritics 2` hace la búsqueda insensible a tildes.
+    """
+    TABLA = 'movies_movie_fts'
+    # Pesos BM25 por columna: título, descripción, géneros
+    PESOS = (10.0, 1.0, 4.0)
+
+    def buscar(self, consulta, limite=15):
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+
+        # Cada token entre comillas (sin operadores FTS del usuario) y con prefijo
+        expresion = ' '.join('"{}"*'.format(token.replace('"', '')) for token in tokens)
+        pesos = ', '.join(str(peso) for peso in self.PESOS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.TABLA} WHERE {self.TABLA} MATCH %s '
+                f'ORDER BY bm25({self.TABLA}, {pesos}) LIMIT %s',
+                [expresion, limite],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def indexar(self, pelicula_ids):
+        pelicula_ids = list(pelicula_ids)
+        filas = documentos(Movie.objects.filter(pk__in=pelicula_ids))
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.TABLA} WHERE rowid = %s', [(pk,) for pk in pelicula_ids])
+            cursor.executemany(
+                f'INSERT INTO {self.TABLA} (rowid, titulo, descripcion, generos) VALUES (%s, %s, %s, %s)',
+                filas,
+            )
+
+    def eliminar(self, pelicula_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.TABLA} WHERE rowid = %s', [(pk,) for pk in pelicula_ids])
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.TABLA}')
+            cursor.executemany(
+                f'INSERT INTO {self.TABLA} (rowid, titulo, descripcion, generos) VALUES (%s, %s, %s, %s)',
+                documentos(Movie.objects.all()),
+            )
+            cursor.execute(f"INSERT INTO {self.TABLA} ({self.TABLA}) VALUES ('optimize')")
+
+
+class BusquedaPostgres(BackendBusqueda):
+    """`tsvector` calculado al vuelo con pesos A/B/C; para catálogos grandes conviene un índice GIN."""
+
+    def buscar(self, consulta, limite=15):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+
+        vector = (
+            SearchVector('titulo', weight='A', config='spanish') +
+            SearchVector('generos__nombre', weight='B', config='spanish') +
+            SearchVector('descripcion', weight='C', config='spanish')
+        )
+        busqueda = SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='spanish')
+        # El join con géneros repite películas: se deduplica conservando el orden
+        ids = (
+            Movie.objects.annotate(rango=SearchRank(vector, busqueda))
+            .filter(rango__gt=0)
+            .order_by('-rango')
+            .values_list('id', flat=True)[:limite * 3]
+        )
+        return list(dict.fromkeys(ids))[:limite]
+
+
+class BusquedaTrigramas(BackendBusqueda):
+    """
+    Índice de trigramas en memoria del proceso. Solo guarda IDs, títulos y
+    géneros: las películas de los resultados se leen de la base de datos, así
+    que los cambios hechos con update() (pósters, agregados, enlaces) se ven
+    sin tocar el índice. Se carga en la primera búsqueda y se actualiza de
+    forma incremental; si otro proceso modifica el catálogo, sube una
+    generación en la caché compartida y este recarga el índice completo.
+
+    El índice propio del motor (FTS5 en SQLite) se sigue manteniendo, para
+    poder volver a él sin reconstruirlo.
+    """
+    CLAVE_GENERACION = 'busqueda:trigramas:gen'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indice = None
+        self._generacion = None
+        self._motor = BACKENDS_POR_MOTOR.get(connection.vendor, BusquedaIcontains)()
+
+    def buscar(self, consulta, limite=15):
+        return self._indice_actual().buscar(consulta, limite)
+
+    def indexar(self, pelicula_ids):
+        pelicula_ids = list(pelicula_ids)
+        self._motor.indexar(pelicula_ids)
+        if self._indice is None:
+            # Sin índice en este proceso (p. ej. un comando): avisar igual a los demás
+            self._publicar_cambio()
+            return
+        for pk, titulo, generos in _textos(Movie.objects.filter(pk__in=pelicula_ids)):
+            self._indice.agregar(pk, titulo, generos)
+        self._publicar_cambio()
+
+    def eliminar(self, pelicula_ids):
+        self._motor.eliminar(pelicula_ids)
+        if self._indice is None:
+            self._publicar_cambio()
+            return
+        for pk in pelicula_ids:
+            self._indice.quitar(pk)
+        self._publicar_cambio()
+
+    def reconstruir(self):
+        self._motor.reconstruir()
+        with self._lock:
+            self._cargar(cache.get(self.CLAVE_GENERACION))
+
+    def _indice_actual(self):
+        generacion = cache.get(self.CLAVE_GENERACION)
+        with self._lock:
+            if self._indice is None or generacion != self._generacion:
+                self._cargar(generacion)
+            return self._indice
+
+    def _cargar(self, generacion):
+        indice = IndiceTrigramas()
+        for pk, titulo, generos in _textos(Movie.objects.all(), todas=True):
+            indice.agregar(pk, titulo, generos)
+        self._indice, self._generacion = indice, generacion
+
+    def _publicar_cambio(self):
+        generacion = time.time_ns()
+        cache.set(self.CLAVE_GENERACION, generacion, None)
+        self._generacion = generacion
+
+
+def _textos(peliculas, todas=False):
+    """(id, título, [nombres de géneros]) de `peliculas`, en dos consultas y sin instanciar modelos."""
+    filas = list(peliculas.order_by().values_list('pk', 'titulo'))
+    relacion = Movie.generos.through.objects.values_list('movie_id', 'genre__nombre')
+    if not todas:
+        relacion = relacion.filter(movie_id__in=[pk for pk, _ in filas])
+    generos = defaultdict(list)
+    for pelicula_id, nombre in relacion:
+        generos[pelicula_id].append(nombre)
+    return [(pk, titulo, generos[pk]) for pk, titulo in filas]
+
+
+def documentos(peliculas):
+    """Filas (id, título, descripción, géneros) listas para indexar."""
+    return [
+        (pelicula.pk, pelicula.titulo, pelicula.descripcion, ' '.join(g.nombre for g in pelicula.generos.all()))
+        for pelicula in peliculas.prefetch_related('generos')
+    ]
+
+
+def obtener_backend():
+    global _backend
+    if _backend is None:
+        ruta = getattr(settings, 'BUSQUEDA_BACKEND', None)
+        if ruta:
+            _backend = import_string(ruta)()
+        else:
+            _backend = BACKENDS_POR_MOTOR.get(connection.vendor, BusquedaIcontains)()
+    return _backend
+
+
+BACKENDS_POR_MOTOR = {
+    'sqlite': BusquedaSQLiteFTS5,
+    'postgresql': BusquedaPostgres,
+}
+
+_backend = None
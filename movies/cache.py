@@ -0,0 +1,185 @@
+"""
+Caché de datos de modelos con claves versionadas.
+
+Cada dato cacheado pertenece a un `Espacio` (tarjetas de películas, géneros,
+agregados de calificaciones, listas de un usuario...) que declara de qué
+modelos depende. La clave incluye la generación actual de cada dependencia:
+las señales llaman a `invalidar(modelo)` para subir esa generación y todas
+las entradas que dependían de él quedan huérfanas (expiran por su TTL), sin
+tener que recordar ni borrar claves concretas.
+
+Para los modelos de un usuario (con campo `usuario`) hay además una
+generación por usuario: un favorito nuevo invalida las listas de ese usuario
+y los espacios globales, pero no las listas de los demás.
+
+Funciona sobre cualquier backend de `CACHES` (locmem, archivos, Redis); con
+varios procesos hace falta uno compartido para que la invalidación llegue a
+todos. Las vistas lo adoptan de a una con `obtener`, `memoizar` o
+`consulta_en_cache`.
+"""
+import functools
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import models
+
+from .models import Favorite, Genre, Movie, PeliculaRelacionada, Rating, WatchHistory
+
+PREFIJO = 'mc'
+# Subir al cambiar la forma de lo que se guarda: descarta todas las entradas anteriores
+VERSION_ESQUEMA = 1
+
+_AUSENTE = object()
+
+
+@dataclass(frozen=True)
+class Espacio:
+    ttl: int
+    # Modelos cuyo cambio (de cualquier usuario) invalida el espacio
+    dependencias: tuple
+    # Modelos de usuario de los que solo importan los cambios del propio usuario
+    dependencias_usuario: tuple = ()
+
+    @property
+    def por_usuario(self):
+        return bool(self.dependencias_usuario)
+
+
+ESPACIOS = {
+    'tarjetas': Espacio(ttl=600, dependencias=(Movie, Genre, Rating)),
+    'generos': Espacio(ttl=3600, dependencias=(Genre, Movie)),
+    'calificaciones': Espacio(ttl=600, dependencias=(Rating,)),
+    'relacionadas': Espacio(ttl=3600, dependencias=(PeliculaRelacionada, Movie, Genre)),
+    'listas_usuario': Espacio(ttl=300, dependencias=(Movie, Genre), dependencias_usuario=(Favorite, WatchHistory, Rating)),
+    # Páginas completas, para las validaciones de movies.condicional
+    'catalogo': Espacio(ttl=600, dependencias=(Movie, Genre)),
+    'detalle': Espacio(
+        ttl=600,
+        dependencias=(Movie, Genre, Rating, PeliculaRelacionada),
+        dependencias_usuario=(Favorite, WatchHistory, Rating),
+    ),
+}
+
+
+def es_por_usuario(modelo):
+    return any(campo.name == 'usuario' for campo in modelo._meta.concrete_fields)
+
+
+def invalidar(modelo, usuario_id=None):
+    """
+    Invalida lo que depende de `modelo`. Con `usuario_id` (modelos de usuario)
+    solo se invalidan las listas de ese usuario además de los espacios globales;
+    sin él, las de todos.
+    """
+    etiqueta = modelo._meta.label_lower
+    claves = [_clave_generacion(etiqueta)]
+    if es_por_usuario(modelo):
+        claves.append(_clave_generacion(etiqueta, usuario_id if usuario_id is not None else 'todos'))
+    for clave_generacion in claves:
+        subir_generacion(clave_generacion)
+    # Momento del cambio, para los Last-Modified de las vistas condicionales
+    cache.set_many({f'{clave_generacion}:fecha': time.time() for clave_generacion in claves}, None)
+
+
+def subir_generacion(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Sin contador (nuevo o desalojado): arrancar en un valor que no choque con generaciones previas
+        cache.set(clave, time.time_ns(), None)
+
+
+def version(espacio, usuario_id=None):
+    """Resumen de las generaciones vigentes de las dependencias de `espacio`."""
+    claves_generacion = _claves_generacion(espacio, usuario_id)
+    generaciones = cache.get_many(claves_generacion)
+    valores = '.'.join(str(generaciones.get(clave_generacion, 0)) for clave_generacion in claves_generacion)
+    return hashlib.sha1(valores.encode()).hexdigest()[:16]
+
+
+def ultima_modificacion(espacio, usuario_id=None):
+    """Timestamp del último cambio en las dependencias de `espacio`, o None si no se conoce para alguna."""
+    claves_fecha = [f'{clave_generacion}:fecha' for clave_generacion in _claves_generacion(espacio, usuario_id)]
+    fechas = cache.get_many(claves_fecha)
+    if len(fechas) < len(claves_fecha):
+        return None
+    return max(fechas.values())
+
+
+def fecha_cambio(modelo):
+    """Timestamp del último `invalidar(modelo)` (de cualquier usuario), o None si no se conoce."""
+    return cache.get(f'{_clave_generacion(modelo._meta.label_lower)}:fecha')
+
+
+def clave(espacio, partes=(), usuario_id=None):
+    """Clave de `partes` en `espacio` con las generaciones vigentes de sus dependencias."""
+    # Las partes pueden ser largas o tener espacios: se resumen para que la clave sirva en cualquier backend
+    resumen = hashlib.sha1(repr(tuple(_normalizar(parte) for parte in partes)).encode()).hexdigest()
+    usuario = f':u{usuario_id}' if ESPACIOS[espacio].por_usuario else ''
+    return f'{PREFIJO}:v{VERSION_ESQUEMA}:{espacio}{usuario}:{resumen}:{version(espacio, usuario_id)}'
+
+
+def obtener(espacio, partes, calcular, usuario_id=None):
+    """Valor cacheado de `partes` en `espacio`, o `calcular()` guardado con el TTL del espacio."""
+    clave_valor = clave(espacio, partes, usuario_id)
+    valor = cache.get(clave_valor, _AUSENTE)
+    if valor is _AUSENTE:
+        valor = calcular()
+        cache.set(clave_valor, valor, ESPACIOS[espacio].ttl)
+    return valor
+
+
+def memoizar(espacio):
+    """
+    Decorador: cachea el resultado de la función por sus argumentos en `espacio`.
+    En espacios por usuario el primer argumento debe ser el usuario o su id.
+    """
+    def decorador(funcion):
+        nombre = f'{funcion.__module__}.{funcion.__qualname__}'
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            usuario_id = None
+            if ESPACIOS[espacio].por_usuario:
+                usuario_id = getattr(args[0], 'pk', args[0])
+            partes = (nombre, args, tuple(sorted(kwargs.items())))
+            return obtener(espacio, partes, lambda: funcion(*args, **kwargs), usuario_id)
+
+        envoltura.sin_cache = funcion
+        return envoltura
+    return decorador
+
+
+def consulta_en_cache(queryset, espacio, usuario_id=None):
+    """Lista de objetos de `queryset` (con sus select/prefetch ya resueltos), cacheada por su SQL."""
+    sql, parametros = queryset.query.sql_with_params()
+    prefetch = tuple(str(busqueda) for busqueda in queryset._prefetch_related_lookups)
+    return obtener(espacio, (queryset.model._meta.label_lower, sql, parametros, prefetch), lambda: list(queryset), usuario_id)
+
+
+def _claves_generacion(espacio, usuario_id=None):
+    definicion = ESPACIOS[espacio]
+    if definicion.por_usuario and usuario_id is None:
+        raise ValueError(f'El espacio {espacio!r} es por usuario: falta usuario_id')
+
+    claves = [_clave_generacion(modelo._meta.label_lower) for modelo in definicion.dependencias]
+    for modelo in definicion.dependencias_usuario:
+        etiqueta = modelo._meta.label_lower
+        claves += [_clave_generacion(etiqueta, 'todos'), _clave_generacion(etiqueta, usuario_id)]
+    return claves
+
+
+def _clave_generacion(etiqueta, usuario=None):
+    if usuario is None:
+        return f'{PREFIJO}:gen:{etiqueta}'
+    return f'{PREFIJO}:gen:{etiqueta}:u{usuario}'
+
+
+def _normalizar(valor):
+    if isinstance(valor, models.Model):
+        return (valor._meta.label_lower, valor.pk)
+    if isinstance(valor, (list, tuple)):
+        return tuple(_normalizar(elemento) for elemento in valor)
+    return valor
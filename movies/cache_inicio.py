@@ -0,0 +1,115 @@
+"""
+Caché por secciones de la página de inicio.
+
+Cada sección tiene su propio TTL y un contador de generación en la caché.
+Las secciones globales comparten una entrada para todos los usuarios; las
+personales añaden además una generación por usuario, de modo que un cambio
+en los favoritos de un usuario no invalida la portada de los demás. Las
+señales de los modelos llaman a `invalidar` para subir la generación.
+"""
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from .cache import subir_generacion
+from .models import Favorite, Movie, Rating, WatchHistory
+
+PREFIJO = 'inicio'
+
+
+@dataclass(frozen=True)
+class Seccion:
+    ttl: int
+    por_usuario: bool
+    dependencias: tuple
+
+
+SECCIONES = {
+    'sugerencia': Seccion(ttl=600, por_usuario=True, dependencias=(Movie, Favorite, WatchHistory, Rating)),
+    'continuar': Seccion(ttl=120, por_usuario=True, dependencias=(Movie, WatchHistory)),
+    'generos_usuario': Seccion(ttl=300, por_usuario=True, dependencias=(Movie, WatchHistory, Rating)),
+    'tendencia_ahora': Seccion(ttl=60, por_usuario=False, dependencias=(Movie, WatchHistory)),
+    'top_vistas': Seccion(ttl=300, por_usuario=False, dependencias=(Movie, WatchHistory)),
+    'genero_global': Seccion(ttl=600, por_usuario=False, dependencias=(Movie, WatchHistory, Rating)),
+}
+
+_AUSENTE = object()
+_contadores = Counter()
+_contadores_lock = threading.Lock()
+
+
+def obtener(nombre, calcular, usuario=None):
+    """Devuelve la sección desde la caché o la calcula con `calcular()` y la guarda."""
+    seccion = SECCIONES[nombre]
+    clave = _clave(nombre, usuario.pk if seccion.por_usuario else None)
+
+    valor = cache.get(clave, _AUSENTE)
+    if valor is _AUSENTE:
+        _contar(nombre, 'misses')
+        valor = calcular()
+        cache.set(clave, valor, seccion.ttl)
+    else:
+        _contar(nombre, 'hits')
+
+    return valor
+
+
+def invalidar(modelo, usuario_id=None, globales=True, personales=True):
+    """
+    Invalida las secciones que dependen de `modelo`.
+
+    Con `usuario_id` las secciones personales se invalidan solo para ese usuario;
+    sin él, para todos. `globales=False` deja intactas las secciones compartidas
+    (p. ej. al actualizar el timestamp de un historial, que no cambia ningún
+    conteo global) y `personales=False` hace lo contrario.
+    """
+    for nombre, seccion in SECCIONES.items():
+        if modelo not in seccion.dependencias:
+            continue
+        if seccion.por_usuario and personales:
+            subir_generacion(_clave_generacion(nombre, usuario_id))
+        elif not seccion.por_usuario and globales:
+            subir_generacion(_clave_generacion(nombre))
+
+
+def estadisticas():
+    """Aciertos y fallos por sección en este proceso."""
+    with _contadores_lock:
+        contadores = dict(_contadores)
+
+    resultado = {}
+    for nombre in SECCIONES:
+        hits = contadores.get((nombre, 'hits'), 0)
+        misses = contadores.get((nombre, 'misses'), 0)
+        total = hits + misses
+        resultado[nombre] = {
+            'hits': hits,
+            'misses': misses,
+            'ratio': round(hits / total, 3) if total else None,
+        }
+    return resultado
+
+
+def _clave(nombre, usuario_id=None):
+    claves_generacion = [_clave_generacion(nombre)]
+    if usuario_id is not None:
+        claves_generacion.append(_clave_generacion(nombre, usuario_id))
+
+    generaciones = cache.get_many(claves_generacion)
+    partes = [PREFIJO, nombre, f'g{generaciones.get(claves_generacion[0], 0)}']
+    if usuario_id is not None:
+        partes += [f'u{usuario_id}', f'g{generaciones.get(claves_generacion[1], 0)}']
+    return ':'.join(partes)
+
+
+def _clave_generacion(nombre, usuario_id=None):
+    if usuario_id is None:
+        return f'{PREFIJO}:gen:{nombre}'
+    return f'{PREFIJO}:gen:{nombre}:u{usuario_id}'
+
+
+def _contar(nombre, tipo):
+    with _contadores_lock:
+        _contadores[(nombre, tipo)] += 1
@@ -0,0 +1,64 @@
+"""
+Catálogo por géneros con paginación por cursor (keyset).
+
+La primera página de todos los carruseles sale de una sola consulta sobre la
+tabla intermedia película-género con `ROW_NUMBER()` por género, más el
+prefetch de géneros de las tarjetas: el número de consultas no depende de
+cuántos géneros o películas haya. Las páginas siguientes se piden por htmx
+con un cursor `(fecha_agregado, id)` de la última película mostrada, de modo
+que cada página es un rango indexado y no un OFFSET creciente.
+
+Las películas con el enlace marcado como roto (ver `movies.enlaces`) no se listan.
+"""
+from django.db.models import F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+
+from .models import Movie
+from .paginacion import codificar_cursor, paginar
+
+TAMAÑO_PAGINA = 10
+ORDEN = ('-fecha_agregado', '-id')
+
+
+def primeras_paginas(tamaño=TAMAÑO_PAGINA):
+    """[(genero, peliculas, cursor_siguiente), ...] de los géneros con películas, por nombre."""
+    Relacion = Movie.generos.through
+    filas = (
+        Relacion.objects
+        .exclude(movie__enlace_estado=Movie.ENLACE_ROTO)
+        .annotate(fila=Window(
+            RowNumber(),
+            partition_by=F('genre_id'),
+            order_by=[F('movie__fecha_agregado').desc(), F('movie_id').desc()],
+        ))
+        .filter(fila__lte=tamaño + 1)
+        .select_related('genre', 'movie')
+        .order_by('genre__nombre', 'fila')
+    )
+
+    carruseles = {}
+    for relacion in filas:
+        carruseles.setdefault(relacion.genre, []).append(relacion.movie)
+
+    # Una misma película aparece en varios carruseles: se prefetchean sus géneros una sola vez
+    unicas = {pelicula.pk: pelicula for peliculas in carruseles.values() for pelicula in peliculas}
+    prefetch_related_objects(list(unicas.values()), 'generos')
+
+    resultado = []
+    for genero, peliculas in carruseles.items():
+        peliculas = [unicas[pelicula.pk] for pelicula in peliculas]
+        cursor_siguiente = None
+        if len(peliculas) > tamaño:
+            peliculas = peliculas[:tamaño]
+            cursor_siguiente = codificar_cursor([peliculas[-1].fecha_agregado, peliculas[-1].pk])
+        resultado.append((genero, peliculas, cursor_siguiente))
+    return resultado
+
+
+def pagina_genero(genero_id, cursor=None, tamaño=TAMAÑO_PAGINA):
+    return paginar(
+        Movie.objects.filter(generos=genero_id).exclude(enlace_estado=Movie.ENLACE_ROTO).prefetch_related('generos'),
+        ORDEN,
+        cursor,
+        tamaño,
+    )
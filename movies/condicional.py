@@ -0,0 +1,111 @@
+"""
+GET condicional (ETag / Last-Modified) para las páginas de lectura.
+
+El ETag de una vista combina la versión del espacio de `movies.cache` del que
+depende (generaciones de sus modelos y, si corresponde, del usuario), el
+usuario, la URL completa y si es una petición htmx; el Last-Modified es el
+último cambio conocido de esas dependencias. Ambos se calculan con un par de
+lecturas de la caché, así que un `If-None-Match` vigente se responde 304
+antes de ejecutar la vista: ni consultas ni plantillas.
+
+Lo que todavía no está en la base de datos (el progreso en el búfer de
+`movies.progreso`) no mueve las generaciones: la vista pasa `pendiente`, que
+devuelve la fecha de su último cambio sin escribir, y esa fecha entra en el
+ETag y en el Last-Modified.
+
+Las respuestas llevan `Cache-Control: private, no-cache` para que el
+navegador las guarde pero revalide en cada navegación. La versión del
+despliegue (fechas de plantillas y código) entra en el ETag para que un
+cambio de plantilla no deje páginas viejas en las cachés de los navegadores.
+"""
+import functools
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache
+
+
+def _version_despliegue():
+    directorios = [os.path.dirname(os.path.abspath(__file__))]
+    directorios += [str(directorio) for opciones in settings.TEMPLATES for directorio in opciones.get('DIRS', [])]
+    ultima = 0
+    for directorio in directorios:
+        for raiz, _, archivos in os.walk(directorio):
+            for archivo in archivos:
+                if archivo.endswith(('.py', '.html')):
+                    ultima = max(ultima, os.stat(os.path.join(raiz, archivo)).st_mtime_ns)
+    return str(ultima)
+
+
+VERSION_DESPLIEGUE = getattr(settings, 'VERSION_DESPLIEGUE', None) or _version_despliegue()
+
+
+def _usuario_id(request, espacio):
+    usuario_id = request.user.pk if request.user.is_authenticated else None
+    if cache.ESPACIOS[espacio].por_usuario and usuario_id is None:
+        return None, False
+    return usuario_id, True
+
+
+def _hay_mensajes(request):
+    # Un mensaje pendiente se muestra al renderizar: la versión cacheada no lo tendría
+    return len(get_messages(request)) > 0
+
+
+def condicional(espacio, pendiente=None):
+    """
+    Decorador de vistas GET: 304 si el cliente tiene la versión vigente del
+    `espacio`. `pendiente(request, *args, **kwargs)` devuelve el datetime del
+    último cambio aún no escrito que muestra la vista, o None.
+    """
+    def fecha_pendiente(request, *args, **kwargs):
+        return pendiente(request, *args, **kwargs) if pendiente is not None else None
+
+    def etag(request, *args, **kwargs):
+        usuario_id, valido = _usuario_id(request, espacio)
+        if not valido or _hay_mensajes(request):
+            return None
+        sin_escribir = fecha_pendiente(request, *args, **kwargs)
+        partes = [
+            VERSION_DESPLIEGUE,
+            espacio,
+            cache.version(espacio, usuario_id if cache.ESPACIOS[espacio].por_usuario else None),
+            str(usuario_id),
+            request.get_full_path(),
+            request.headers.get('HX-Request', ''),
+            sin_escribir.isoformat() if sin_escribir is not None else '',
+        ]
+        return hashlib.sha1('|'.join(partes).encode()).hexdigest()
+
+    def ultima_modificacion(request, *args, **kwargs):
+        usuario_id, valido = _usuario_id(request, espacio)
+        if not valido or _hay_mensajes(request):
+            return None
+        marca = cache.ultima_modificacion(espacio, usuario_id if cache.ESPACIOS[espacio].por_usuario else None)
+        sin_escribir = fecha_pendiente(request, *args, **kwargs)
+        if sin_escribir is not None:
+            marca = max(marca or 0, sin_escribir.timestamp())
+        # HTTP-date tiene resolución de segundos: con un cambio en el último segundo, otro
+        # cambio en ese mismo segundo no movería la fecha y se respondería 304 con datos viejos
+        if marca is None or time.time() - marca < 1:
+            return None
+        return datetime.fromtimestamp(marca, tz=timezone.utc)
+
+    def decorador(vista):
+        vista_condicional = condition(etag_func=etag, last_modified_func=ultima_modificacion)(vista)
+
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            respuesta = vista_condicional(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and respuesta.status_code in (200, 304):
+                patch_cache_control(respuesta, private=True, no_cache=True)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,307 @@
+"""
+Verificación de los enlaces de stream de las películas.
+
+Todas las URLs se comprueban en paralelo con asyncio sobre un cliente HTTP/1.1
+mínimo de la biblioteca estándar: concurrencia global acotada, un máximo de
+conexiones y un intervalo mínimo entre peticiones por host (para no saturar
+un mismo CDN), y conexiones keep-alive reutilizadas entre películas del mismo
+host. Primero se pide `HEAD`; si el servidor no lo admite o no informa el
+tamaño, `GET` con `Range: bytes=0-0`, que devuelve un solo byte.
+
+El resultado (estado, código, latencia, tamaño) queda en la película; el
+catálogo oculta las marcadas como rotas sin verificar nada al servir. Una
+película se marca rota tras `FALLOS_PARA_ROTO` verificaciones fallidas
+seguidas, para que un error pasajero no la esconda.
+"""
+import asyncio
+import os
+import ssl
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils._os import safe_join
+
+from . import cache
+from .models import Movie
+from .streaming import ruta_local
+
+CONCURRENCIA = 20
+POR_HOST = 4
+INTERVALO_HOST = 0.1
+TIMEOUT = 10.0
+MAX_REDIRECCIONES = 5
+FALLOS_PARA_ROTO = 2
+# Cuerpos más grandes que esto no se leen: se cierra la conexión en lugar de reutilizarla
+MAX_CUERPO_DESCARTABLE = 64 * 1024
+AGENTE = 'VivaStream-verificador/1.0'
+
+REDIRECCIONES = {301, 302, 303, 307, 308}
+
+
+class ErrorHTTP(Exception):
+    pass
+
+
+@dataclass
+class Resultado:
+    pelicula_id: int
+    ok: bool
+    codigo: int | None = None
+    latencia_ms: int | None = None
+    tamaño: int | None = None
+    error: str = ''
+
+
+@dataclass
+class Respuesta:
+    codigo: int
+    cabeceras: dict
+
+
+class Conexiones:
+    """Conexiones keep-alive libres por (esquema, host, puerto)."""
+
+    def __init__(self):
+        self._libres = defaultdict(list)
+        self._contexto_ssl = ssl.create_default_context()
+
+    async def obtener(self, esquema, host, puerto, nueva=False):
+        """(lector, escritor, reutilizada)."""
+        libres = self._libres[(esquema, host, puerto)]
+        while libres and not nueva:
+            lector, escritor = libres.pop()
+            if not escritor.is_closing() and not lector.at_eof():
+                return lector, escritor, True
+            escritor.close()
+        lector, escritor = await asyncio.open_connection(
+            host, puerto, ssl=self._contexto_ssl if esquema == 'https' else None,
+        )
+        return lector, escritor, False
+
+    def devolver(self, clave, lector, escritor):
+        self._libres[clave].append((lector, escritor))
+
+    async def cerrar(self):
+        for conexiones in self._libres.values():
+            for _, escritor in conexiones:
+                escritor.close()
+        self._libres.clear()
+
+
+async def _peticion(conexiones, metodo, url, cabeceras_extra=()):
+    partes = urlsplit(url)
+    esquema = partes.scheme.lower()
+    if esquema not in ('http', 'https') or not partes.hostname:
+        raise ErrorHTTP(f'URL no soportada: {url}')
+    puerto = partes.port or (443 if esquema == 'https' else 80)
+    clave = (esquema, partes.hostname, puerto)
+    ruta = (partes.path or '/') + (f'?{partes.query}' if partes.query else '')
+    host = partes.hostname if partes.port is None else f'{partes.hostname}:{partes.port}'
+
+    lineas = [f'{metodo} {ruta} HTTP/1.1', f'Host: {host}', f'User-Agent: {AGENTE}', 'Accept: */*']
+    lineas += [f'{nombre}: {valor}' for nombre, valor in cabeceras_extra]
+    peticion = ('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1')
+
+    lector, escritor, reutilizada = await conexiones.obtener(*clave)
+    reutilizable = False
+    try:
+        linea_estado = b''
+        try:
+            escritor.write(peticion)
+            await escritor.drain()
+            linea_estado = await lector.readline()
+        except OSError:
+            if not reutilizada:
+                raise
+        if not linea_estado and reutilizada:
+            # El servidor cerró la conexión keep-alive mientras estaba libre: se reintenta en una nueva
+            escritor.close()
+            lector, escritor, _ = await conexiones.obtener(*clave, nueva=True)
+            escritor.write(peticion)
+            await escritor.drain()
+            linea_estado = await lector.readline()
+
+        estado = linea_estado.decode('latin-1').split(None, 2)
+        if len(estado) < 2 or not estado[0].startswith('HTTP/') or not estado[1].isdigit():
+            raise ErrorHTTP('Respuesta HTTP inválida')
+        codigo = int(estado[1])
+        cabeceras = {}
+        while True:
+            linea = (await lector.readline()).decode('latin-1')
+            if linea in ('\r\n', '\n', ''):
+                break
+            nombre, _, valor = linea.partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        reutilizable = await _descartar_cuerpo(lector, metodo, codigo, cabeceras)
+        if cabeceras.get('connection', '').lower() == 'close' or estado[0] == 'HTTP/1.0':
+            reutilizable = False
+        return Respuesta(codigo, cabeceras)
+    finally:
+        if reutilizable:
+            conexiones.devolver(clave, lector, escritor)
+        else:
+            escritor.close()
+
+
+async def _descartar_cuerpo(lector, metodo, codigo, cabeceras):
+    """Consume el cuerpo para poder reutilizar la conexión. False si hay que cerrarla."""
+    if metodo == 'HEAD' or codigo in (204, 304) or 100 <= codigo < 200:
+        return True
+    if 'chunked' in cabeceras.get('transfer-encoding', '').lower():
+        leidos = 0
+        while True:
+            tamaño = int((await lector.readline()).split(b';')[0].strip() or b'0', 16)
+            leidos += tamaño
+            if leidos > MAX_CUERPO_DESCARTABLE:
+                return False
+            if tamaño == 0:
+                # Trailers hasta la línea vacía
+                while (await lector.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return True
+            await lector.readexactly(tamaño + 2)
+    largo = cabeceras.get('content-length')
+    if largo is None or not largo.isdigit() or int(largo) > MAX_CUERPO_DESCARTABLE:
+        return False
+    await lector.readexactly(int(largo))
+    return True
+
+
+def _tamaño(respuesta):
+    rango = respuesta.cabeceras.get('content-range', '')
+    if respuesta.codigo == 206 and '/' in rango:
+        total = rango.rsplit('/', 1)[1].strip()
+        return int(total) if total.isdigit() else None
+    largo = respuesta.cabeceras.get('content-length', '')
+    return int(largo) if respuesta.codigo == 200 and largo.isdigit() else None
+
+
+class Verificador:
+    def __init__(self, concurrencia=CONCURRENCIA, por_host=POR_HOST, intervalo_host=INTERVALO_HOST, timeout=TIMEOUT):
+        self.timeout = timeout
+        self.intervalo_host = intervalo_host
+        self._global = asyncio.Semaphore(concurrencia)
+        self._por_host = defaultdict(lambda: asyncio.Semaphore(por_host))
+        self._turnos = defaultdict(asyncio.Lock)
+        self._ultima_peticion = defaultdict(float)
+        self._conexiones = Conexiones()
+
+    async def verificar_todos(self, enlaces):
+        """[(pelicula_id, url), ...] -> [Resultado, ...] en el mismo orden."""
+        try:
+            return await asyncio.gather(*(self.verificar(pelicula_id, url) for pelicula_id, url in enlaces))
+        finally:
+            await self._conexiones.cerrar()
+
+    async def verificar(self, pelicula_id, url):
+        try:
+            respuesta, segundos = await self._sondear(url)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErrorHTTP, ValueError) as error:
+            return Resultado(pelicula_id, False, error=str(error) or error.__class__.__name__)
+        return Resultado(
+            pelicula_id,
+            respuesta.codigo in (200, 206),
+            codigo=respuesta.codigo,
+            latencia_ms=round(segundos * 1000),
+            tamaño=_tamaño(respuesta),
+        )
+
+    async def _sondear(self, url):
+        """(respuesta final, segundos de red sumando redirecciones y reintentos)."""
+        total = 0.0
+        for _ in range(MAX_REDIRECCIONES + 1):
+            respuesta, segundos = await self._limitada('HEAD', url)
+            total += segundos
+            if respuesta.codigo in (405, 501) or (respuesta.codigo == 200 and _tamaño(respuesta) is None):
+                # Sin HEAD o sin tamaño: un GET de un solo byte
+                respuesta, segundos = await self._limitada('GET', url, [('Range', 'bytes=0-0')])
+                total += segundos
+            if respuesta.codigo not in REDIRECCIONES or 'location' not in respuesta.cabeceras:
+                return respuesta, total
+            url = urljoin(url, respuesta.cabeceras['location'])
+        raise ErrorHTTP('Demasiadas redirecciones')
+
+    async def _limitada(self, metodo, url, cabeceras=()):
+        """
+        Petición respetando los límites del host y el global. El timeout y la
+        latencia cuentan solo desde que sale la petición, no la espera en cola.
+        """
+        host = (urlsplit(url).hostname or '').lower()
+        async with self._por_host[host]:
+            async with self._turnos[host]:
+                espera = self._ultima_peticion[host] + self.intervalo_host - time.monotonic()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                self._ultima_peticion[host] = time.monotonic()
+            async with self._global:
+                inicio = time.monotonic()
+                respuesta = await asyncio.wait_for(_peticion(self._conexiones, metodo, url, cabeceras), self.timeout)
+                return respuesta, time.monotonic() - inicio
+
+
+def verificar_local(pelicula_id, ruta):
+    """Los videos alojados en MEDIA_ROOT se comprueban en disco, sin pasar por HTTP."""
+    try:
+        tamaño = os.path.getsize(safe_join(settings.MEDIA_ROOT, ruta))
+    except (OSError, ValueError) as error:
+        return Resultado(pelicula_id, False, error=str(error))
+    return Resultado(pelicula_id, True, latencia_ms=0, tamaño=tamaño)
+
+
+def verificar(peliculas=None, **opciones):
+    """
+    Verifica los enlaces de `peliculas` (queryset; todas por defecto) y guarda
+    el resultado. Devuelve la lista de `Resultado`.
+    """
+    if peliculas is None:
+        peliculas = Movie.objects.all()
+    remotos, resultados = [], []
+    for pelicula_id, enlace in peliculas.values_list('pk', 'enlace_stream'):
+        ruta = ruta_local(enlace)
+        if ruta:
+            resultados.append(verificar_local(pelicula_id, ruta))
+        else:
+            remotos.append((pelicula_id, enlace))
+
+    if remotos:
+        resultados += asyncio.run(Verificador(**opciones).verificar_todos(remotos))
+    guardar(resultados)
+    return resultados
+
+
+def guardar(resultados):
+    ahora = timezone.now()
+    fallos = dict(Movie.objects.filter(pk__in=[r.pelicula_id for r in resultados]).values_list('pk', 'enlace_fallos'))
+    peliculas = []
+    for resultado in resultados:
+        if resultado.pelicula_id not in fallos:
+            continue
+        consecutivos = 0 if resultado.ok else fallos[resultado.pelicula_id] + 1
+        if resultado.ok:
+            estado = Movie.ENLACE_OK
+        elif consecutivos >= FALLOS_PARA_ROTO:
+            estado = Movie.ENLACE_ROTO
+        else:
+            # Primer fallo: se conserva el estado anterior hasta confirmarlo
+            estado = None
+        pelicula = Movie(
+            pk=resultado.pelicula_id,
+            enlace_codigo=resultado.codigo,
+            enlace_latencia_ms=resultado.latencia_ms,
+            enlace_tamaño=resultado.tamaño,
+            enlace_fallos=consecutivos,
+            enlace_verificado=ahora,
+        )
+        pelicula.enlace_estado = estado
+        peliculas.append(pelicula)
+
+    campos = ['enlace_codigo', 'enlace_latencia_ms', 'enlace_tamaño', 'enlace_fallos', 'enlace_verificado']
+    confirmadas = [pelicula for pelicula in peliculas if pelicula.enlace_estado is not None]
+    Movie.objects.bulk_update(peliculas, campos, batch_size=500)
+    Movie.objects.bulk_update(confirmadas, ['enlace_estado'], batch_size=500)
+    cache.invalidar(Movie)
@@ -0,0 +1,256 @@
+"""
+Cola de escritura con un único hilo escritor y commit agrupado.
+
+SQLite admite un solo escritor a la vez: con varios hilos de petición
+escribiendo, cada uno compite por el bloqueo y espera o reintenta. Aquí las
+vistas encolan la operación (una función que escribe con el ORM) y un único
+hilo toma todo lo pendiente, hasta `max_lote` operaciones, y lo ejecuta en una
+sola transacción: un commit (y un fsync) para muchas escrituras. Cada operación
+corre en su propio savepoint, así que la que falla no arrastra a las demás.
+
+Lo que las operaciones (o las señales que disparan) registran con
+`transaction.on_commit` no corre en el hilo escritor, que volvería a tomar la
+cola recién cuando terminara: tras el commit se pasa, en orden, a un segundo
+hilo. Cuando `ejecutar` devuelve, la escritura está confirmada pero esos
+callbacks pueden no haber corrido todavía.
+
+`ejecutar` espera el resultado (la escritura ya confirmada); `enviar` devuelve
+un `Future` que se puede ignorar. Si la cola está llena, quien está dentro de
+una transacción o el modo agrupado está desactivado, la operación corre en el
+hilo que la pide, como antes.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger('movies')
+
+# Latencias recientes que se conservan por operación para los percentiles
+MUESTRAS = 1000
+
+
+@dataclass
+class Operacion:
+    nombre: str
+    funcion: object
+    args: tuple
+    kwargs: dict
+    futuro: Future = field(default_factory=Future)
+    encolada: float = field(default_factory=time.monotonic)
+
+
+class Escritor:
+    def __init__(self, activo=True, max_cola=1000, max_lote=100, ventana=0.002, espera_cola=1.0):
+        self.activo = activo
+        self.max_lote = max_lote
+        # Tras la primera operación, cuánto esperar a que lleguen más para el mismo commit
+        self.ventana = ventana
+        self.espera_cola = espera_cola
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._hilo = None
+        self._hilo_lock = threading.Lock()
+        self._detener = threading.Event()
+        self._metricas_lock = threading.Lock()
+        self._contadores = Counter()
+        self._esperas = defaultdict(lambda: deque(maxlen=MUESTRAS))
+        self._totales = defaultdict(lambda: deque(maxlen=MUESTRAS))
+        self._lotes = deque(maxlen=MUESTRAS)
+        # Un solo hilo: los callbacks corren en el orden de los commits
+        self._tras_commit = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escritor-tras-commit')
+
+    def enviar(self, funcion, *args, nombre=None, **kwargs):
+        """Encola `funcion(*args, **kwargs)`. Devuelve un Future con su resultado tras el commit."""
+        operacion = Operacion(nombre or funcion.__name__, funcion, args, kwargs)
+        if not self.activo or self._detener.is_set() or self._en_hilo_escritor() or connection.in_atomic_block:
+            # Dentro de una transacción del llamador el escritor esperaría su bloqueo: se ejecuta aquí
+            self._ejecutar_directa(operacion)
+            return operacion.futuro
+
+        self._iniciar_hilo()
+        try:
+            self._cola.put(operacion, timeout=self.espera_cola)
+        except queue.Full:
+            logger.warning(f'Cola de escritura llena: {operacion.nombre} se ejecuta en el hilo de la petición')
+            self._contar(operacion.nombre, 'desbordes')
+            self._ejecutar_directa(operacion)
+        return operacion.futuro
+
+    def ejecutar(self, funcion, *args, nombre=None, timeout=None, **kwargs):
+        """Encola y espera: devuelve el resultado o relanza la excepción de la operación."""
+        return self.enviar(funcion, *args, nombre=nombre, **kwargs).result(timeout)
+
+    def estadisticas(self):
+        """Por operación: cantidad, errores, desbordes y latencias (espera en cola y total) en ms."""
+        with self._metricas_lock:
+            contadores = dict(self._contadores)
+            esperas = {nombre: sorted(valores) for nombre, valores in self._esperas.items()}
+            totales = {nombre: sorted(valores) for nombre, valores in self._totales.items()}
+            lotes = list(self._lotes)
+
+        operaciones = {}
+        for nombre in sorted(totales.keys() | {nombre for nombre, _ in contadores}):
+            operaciones[nombre] = {
+                'total': contadores.get((nombre, 'total'), 0),
+                'errores': contadores.get((nombre, 'errores'), 0),
+                'desbordes': contadores.get((nombre, 'desbordes'), 0),
+                'espera_ms': _percentiles(esperas.get(nombre, [])),
+                'latencia_ms': _percentiles(totales.get(nombre, [])),
+            }
+        return {
+            'operaciones': operaciones,
+            'lotes': {
+                'total': contadores.get(('*', 'lotes'), 0),
+                'tamaño_medio': round(sum(lotes) / len(lotes), 2) if lotes else None,
+                'tamaño_maximo': max(lotes, default=None),
+            },
+            'en_cola': self._cola.qsize(),
+            'errores_tras_commit': contadores.get(('*', 'errores_tras_commit'), 0),
+        }
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        if self._hilo is not None:
+            try:
+                self._cola.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._hilo.join(timeout=timeout)
+        self._tras_commit.shutdown(wait=True)
+
+    def _en_hilo_escritor(self):
+        return self._hilo is not None and threading.current_thread() is self._hilo
+
+    def _iniciar_hilo(self):
+        if self._hilo is not None:
+            return
+        with self._hilo_lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='escritor', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            lote = self._tomar_lote()
+            if lote is None:
+                return
+            close_old_connections()
+            try:
+                self._ejecutar_lote(lote)
+            except Exception:
+                logger.exception(f'Error en el hilo escritor con un lote de {len(lote)} operaciones')
+
+    def _tomar_lote(self):
+        operacion = self._cola.get()
+        if operacion is None:
+            return None
+        lote = [operacion]
+        limite = time.monotonic() + self.ventana
+        while len(lote) < self.max_lote:
+            try:
+                # Primero lo que ya está en cola; luego, hasta agotar la ventana
+                siguiente = self._cola.get(timeout=max(limite - time.monotonic(), 0)) if self._cola.empty() else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if siguiente is None:
+                self._cola.put(None)
+                break
+            lote.append(siguiente)
+        return lote
+
+    def _ejecutar_lote(self, lote):
+        inicio = time.monotonic()
+        resultados = []
+        callbacks = []
+        try:
+            with transaction.atomic():
+                for operacion in lote:
+                    try:
+                        with transaction.atomic():
+                            resultados.append((operacion, operacion.funcion(*operacion.args, **operacion.kwargs), None))
+                    except Exception as error:
+                        resultados.append((operacion, None, error))
+                # Los on_commit de los savepoints revertidos ya se descartaron: se
+                # toman los demás para que no corran aquí al salir del bloque
+                callbacks = [funcion for _, funcion, _ in connection.run_on_commit]
+                connection.run_on_commit = []
+        except Exception as error:
+            # Falló el commit: nada de lo ejecutado quedó escrito
+            resultados = [(operacion, None, error) for operacion in lote]
+            callbacks = []
+        if callbacks:
+            self._tras_commit.submit(self._ejecutar_callbacks, callbacks)
+
+        fin = time.monotonic()
+        with self._metricas_lock:
+            self._contadores[('*', 'lotes')] += 1
+            self._lotes.append(len(lote))
+            for operacion, _, error in resultados:
+                self._contadores[(operacion.nombre, 'total')] += 1
+                if error is not None:
+                    self._contadores[(operacion.nombre, 'errores')] += 1
+                self._esperas[operacion.nombre].append(inicio - operacion.encolada)
+                self._totales[operacion.nombre].append(fin - operacion.encolada)
+
+        for operacion, resultado, error in resultados:
+            if error is not None:
+                operacion.futuro.set_exception(error)
+            else:
+                operacion.futuro.set_result(resultado)
+
+    def _ejecutar_callbacks(self, callbacks):
+        try:
+            for funcion in callbacks:
+                try:
+                    funcion()
+                except Exception:
+                    # El commit ya está hecho: el error solo se registra, robust o no
+                    logger.exception(f'Error en un callback on_commit del escritor: {funcion!r}')
+                    self._contar('*', 'errores_tras_commit')
+        finally:
+            close_old_connections()
+
+    def _ejecutar_directa(self, operacion):
+        try:
+            with transaction.atomic():
+                resultado = operacion.funcion(*operacion.args, **operacion.kwargs)
+        except Exception as error:
+            self._contar(operacion.nombre, 'errores')
+            operacion.futuro.set_exception(error)
+        else:
+            operacion.futuro.set_result(resultado)
+        finally:
+            self._contar(operacion.nombre, 'total')
+            with self._metricas_lock:
+                self._totales[operacion.nombre].append(time.monotonic() - operacion.encolada)
+
+    def _contar(self, nombre, tipo):
+        with self._metricas_lock:
+            self._contadores[(nombre, tipo)] += 1
+
+
+def _percentiles(valores):
+    if not valores:
+        return None
+    return {
+        'p50': round(valores[len(valores) // 2] * 1000, 2),
+        'p95': round(valores[min(int(len(valores) * 0.95), len(valores) - 1)] * 1000, 2),
+        'max': round(valores[-1] * 1000, 2),
+    }
+
+
+_config = getattr(settings, 'ESCRITURA_AGRUPADA', {})
+escritor = Escritor(
+    activo=_config.get('ACTIVA', True),
+    max_cola=_config.get('MAX_COLA', 1000),
+    max_lote=_config.get('MAX_LOTE', 100),
+    ventana=_config.get('VENTANA', 0.002),
+)
+atexit.register(escritor.detener)
@@ -0,0 +1,196 @@
+"""
+Resumen por usuario de lo que ha visto, para la página de perfil.
+
+`actualizar` recalcula las filas de `EstadisticasUsuario` de un conjunto de
+usuarios con un número fijo de consultas agrupadas. Las señales lo llaman
+solo para los usuarios afectados cada vez que se escribe su historial, así
+que el perfil se sirve con una lectura por clave única en lugar de recorrer
+el historial. Los volcados del búfer de progreso (cada pocos segundos) no
+recalculan: `aplicar_progreso` suma a las filas existentes solo lo que
+cambió en el volcado.
+"""
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import EstadisticasUsuario, Movie, WatchHistory
+
+ULTIMAS = 5
+
+
+def actualizar(usuario_ids):
+    """Recalcula las estadísticas de `usuario_ids`. Devuelve cuántas filas guardó."""
+    # Los usuarios borrados (historial eliminado en cascada) ya no tienen fila que actualizar
+    usuario_ids = list(User.objects.filter(pk__in=set(usuario_ids)).values_list('pk', flat=True))
+    if not usuario_ids:
+        return 0
+
+    historial = WatchHistory.objects.filter(usuario_id__in=usuario_ids).order_by()
+    estadisticas = {usuario_id: EstadisticasUsuario(usuario_id=usuario_id) for usuario_id in usuario_ids}
+
+    totales = historial.values('usuario_id').annotate(
+        segundos=Sum('pelicula__duracion'),
+        completadas=Count('id', filter=Q(completado=True)),
+        en_progreso=Count('id', filter=Q(completado=False)),
+    )
+    for fila in totales:
+        resumen = estadisticas[fila['usuario_id']]
+        resumen.segundos_vistos = fila['segundos'] or 0
+        resumen.completadas = fila['completadas']
+        resumen.en_progreso = fila['en_progreso']
+
+    por_genero = (
+        historial.filter(pelicula__generos__isnull=False)
+        .values_list('usuario_id', 'pelicula__generos')
+        .annotate(vistas=Count('id'))
+    )
+    for usuario_id, genero_id, vistas in por_genero:
+        estadisticas[usuario_id].vistas_por_genero[str(genero_id)] = vistas
+    for resumen in estadisticas.values():
+        resumen.genero_mas_visto_id = _genero_mas_visto(resumen.vistas_por_genero)
+
+    ultimas = (
+        historial.annotate(fila=Window(
+            RowNumber(),
+            partition_by=F('usuario_id'),
+            order_by=F('ultima_visualizacion').desc(),
+        ))
+        .filter(fila__lte=ULTIMAS)
+        .values_list('usuario_id', 'pelicula_id')
+        .order_by('usuario_id', 'fila')
+    )
+    for usuario_id, pelicula_id in ultimas:
+        estadisticas[usuario_id].ultimas_peliculas.append(pelicula_id)
+
+    EstadisticasUsuario.objects.bulk_create(
+        estadisticas.values(),
+        update_conflicts=True,
+        unique_fields=['usuario'],
+        update_fields=[
+            'segundos_vistos', 'completadas', 'en_progreso', 'vistas_por_genero',
+            'genero_mas_visto', 'ultimas_peliculas', 'fecha_calculo',
+        ],
+    )
+    return len(estadisticas)
+
+
+def aplicar_progreso(cambios):
+    """
+    Suma a las estadísticas los `progreso.CambioHistorial` de un volcado: un
+    historial nuevo cuenta su duración, sus géneros y si está completado; uno
+    existente solo puede pasar de en progreso a completado o al revés. Las
+    películas del volcado pasan al frente de las últimas vistas. Los usuarios
+    que aún no tienen fila se recalculan enteros con `actualizar`.
+    """
+    if not cambios:
+        return 0
+    nuevas = {cambio.pelicula_id for cambio in cambios if cambio.completado_anterior is None}
+    duraciones = dict(Movie.objects.filter(pk__in=nuevas).values_list('pk', 'duracion')) if nuevas else {}
+    generos = defaultdict(list)
+    if nuevas:
+        relacion = Movie.generos.through.objects.filter(movie_id__in=nuevas).values_list('movie_id', 'genre_id')
+        for pelicula_id, genero_id in relacion:
+            generos[pelicula_id].append(genero_id)
+
+    por_usuario = defaultdict(list)
+    for cambio in cambios:
+        por_usuario[cambio.usuario_id].append(cambio)
+
+    # En la misma transacción que la lectura: otro volcado del mismo usuario espera
+    with transaction.atomic():
+        filas = {
+            fila.usuario_id: fila
+            for fila in EstadisticasUsuario.objects.select_for_update().filter(usuario_id__in=list(por_usuario))
+        }
+        ahora = timezone.now()
+        for usuario_id, fila in filas.items():
+            for cambio in por_usuario[usuario_id]:
+                _aplicar_cambio(fila, cambio, duraciones, generos)
+            fila.genero_mas_visto_id = _genero_mas_visto(fila.vistas_por_genero)
+            recientes = [
+                cambio.pelicula_id
+                for cambio in sorted(por_usuario[usuario_id], key=lambda c: c.ultima_visualizacion, reverse=True)
+            ]
+            fila.ultimas_peliculas = list(dict.fromkeys(recientes + fila.ultimas_peliculas))[:ULTIMAS]
+            fila.fecha_calculo = ahora
+        EstadisticasUsuario.objects.bulk_update(
+            filas.values(),
+            [
+                'segundos_vistos', 'completadas', 'en_progreso', 'vistas_por_genero',
+                'genero_mas_visto', 'ultimas_peliculas', 'fecha_calculo',
+            ],
+        )
+
+    sin_fila = set(por_usuario) - set(filas)
+    return len(filas) + (actualizar(sin_fila) if sin_fila else 0)
+
+
+def _aplicar_cambio(fila, cambio, duraciones, generos):
+    if cambio.completado_anterior is None:
+        fila.segundos_vistos += duraciones.get(cambio.pelicula_id, 0)
+        for genero_id in generos[cambio.pelicula_id]:
+            clave = str(genero_id)
+            fila.vistas_por_genero[clave] = fila.vistas_por_genero.get(clave, 0) + 1
+    elif cambio.completado_anterior == cambio.completado:
+        return
+    elif cambio.completado_anterior:
+        fila.completadas = max(fila.completadas - 1, 0)
+    else:
+        fila.en_progreso = max(fila.en_progreso - 1, 0)
+
+    if cambio.completado:
+        fila.completadas += 1
+    else:
+        fila.en_progreso += 1
+
+
+def _genero_mas_visto(vistas_por_genero):
+    if not vistas_por_genero:
+        return None
+    # Empates: gana el género de menor id, para que el resultado sea estable
+    return int(min(vistas_por_genero, key=lambda genero_id: (-vistas_por_genero[genero_id], int(genero_id))))
+
+
+def reconstruir(usuario_ids=None, lote=1000):
+    """Recalcula las estadísticas de todos los usuarios (o de `usuario_ids`) en lotes."""
+    if usuario_ids is None:
+        usuario_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    guardadas = 0
+    for inicio in range(0, len(usuario_ids), lote):
+        guardadas += actualizar(usuario_ids[inicio:inicio + lote])
+    return guardadas
+
+
+def usuarios_de_peliculas(pelicula_ids):
+    return set(
+        WatchHistory.objects.filter(pelicula_id__in=list(pelicula_ids))
+        .values_list('usuario_id', flat=True)
+        .distinct()
+    )
+
+
+def obtener(usuario):
+    """Estadísticas del usuario (con el género más visto cargado); las calcula si aún no existen."""
+    consulta = EstadisticasUsuario.objects.select_related('genero_mas_visto').filter(usuario=usuario)
+    estadisticas = consulta.first()
+    if estadisticas is None:
+        actualizar([usuario.pk])
+        estadisticas = consulta.first()
+    return estadisticas
+
+
+def ultimos_historiales(estadisticas):
+    """Historiales de las últimas películas vistas, en el orden guardado."""
+    ids = estadisticas.ultimas_peliculas
+    if not ids:
+        return []
+    historiales = {
+        historial.pelicula_id: historial
+        for historial in WatchHistory.objects.filter(usuario_id=estadisticas.usuario_id, pelicula_id__in=ids)
+        .select_related('pelicula')
+    }
+    return [historiales[pelicula_id] for pelicula_id in ids if pelicula_id in historiales]
@@ -0,0 +1,76 @@
+"""
+Consultas de la página de favoritos.
+
+Filtro por género, orden, totales y conteo por género se resuelven en SQL
+(joins y agregados) y la grilla se pagina por cursor, así que el coste no
+depende de cuántos favoritos tenga el usuario.
+"""
+from django.db.models import Count, F, Sum
+
+from . import cache
+from .models import Favorite, Genre
+from .paginacion import paginar
+
+TAMAÑO_PAGINA = 12
+
+ORDENES = {
+    '-fecha_agregado': ('-fecha_agregado', '-id'),
+    'fecha_agregado': ('fecha_agregado', 'id'),
+    'titulo': ('pelicula__titulo', 'id'),
+    '-titulo': ('-pelicula__titulo', '-id'),
+}
+ORDEN_POR_DEFECTO = '-fecha_agregado'
+
+
+def del_usuario(usuario, genero_id=None):
+    consulta = Favorite.objects.filter(usuario=usuario)
+    if genero_id is not None:
+        # (película, género) es único en la tabla intermedia: el join no duplica favoritos
+        consulta = consulta.filter(pelicula__generos=genero_id)
+    return consulta
+
+
+def pagina(usuario, genero_id=None, orden=ORDEN_POR_DEFECTO, cursor=None, tamaño=TAMAÑO_PAGINA):
+    """(películas, cursor_siguiente) de una página de favoritos con sus géneros precargados."""
+    consulta = del_usuario(usuario, genero_id).select_related('pelicula').prefetch_related('pelicula__generos')
+    pagina_favoritos, cursor_siguiente = paginar(consulta, ORDENES.get(orden, ORDENES[ORDEN_POR_DEFECTO]), cursor, tamaño)
+    return [favorito.pelicula for favorito in pagina_favoritos], cursor_siguiente
+
+
+@cache.memoizar('listas_usuario')
+def resumen(usuario, genero_id=None):
+    """
+    Total de favoritos, minutos acumulados (suma de los minutos de cada
+    película) y géneros con su cantidad de favoritos, en dos consultas.
+    """
+    consulta = del_usuario(usuario, genero_id)
+    totales = consulta.aggregate(
+        total=Count('id'),
+        minutos=Sum(F('pelicula__duracion') / 60),
+    )
+    generos = list(
+        Genre.objects
+        .filter(peliculas__favoritos__in=consulta.values('id'))
+        .annotate(cantidad=Count('peliculas__favoritos'))
+        .order_by('nombre')
+    )
+    return {
+        'total_favoritos': totales['total'],
+        'duracion_total': totales['minutos'] or 0,
+        'generos': generos,
+    }
+
+
+def generos_mas_frecuentes(generos, limite):
+    """[(nombre, cantidad), ...] de los `limite` géneros con más favoritos."""
+    ordenados = sorted(generos, key=lambda genero: (-genero.cantidad, genero.nombre))
+    return [(genero.nombre, genero.cantidad) for genero in ordenados[:limite]]
+
+
+def alternar(usuario_id, pelicula_id):
+    """Agrega o quita la película de los favoritos del usuario. Devuelve si quedó como favorita."""
+    borrados, _ = Favorite.objects.filter(usuario_id=usuario_id, pelicula_id=pelicula_id).delete()
+    if borrados:
+        return False
+    Favorite.objects.create(usuario_id=usuario_id, pelicula_id=pelicula_id)
+    return True
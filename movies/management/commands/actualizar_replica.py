@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from movies import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copia la base SQLite primaria sobre las réplicas de lectura SQLite. Pensado para ejecutarse periódicamente (cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', action='append', help='Réplica a actualizar (por defecto, todas las SQLite).')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('La base de datos por defecto no es SQLite.')
+
+        configuradas = replicas.configuracion()['ALIAS']
+        alias_replicas = options['alias'] or configuradas
+        for alias in alias_replicas:
+            if alias not in configuradas:
+                raise CommandError(f'{alias} no está en REPLICAS_LECTURA["ALIAS"].')
+            if connections[alias].vendor != 'sqlite':
+                self.stdout.write(f'{alias}: no es SQLite, se replica por su cuenta; se omite.')
+                continue
+            self._copiar(alias)
+
+    def _copiar(self, alias):
+        ruta = str(connections[alias].settings_dict['NAME'])
+        temporal = f'{ruta}.tmp'
+        # La copia refleja la primaria desde que empieza: esa es la fecha de la réplica
+        inicio = time.time()
+
+        connection.ensure_connection()
+        destino = sqlite3.connect(temporal)
+        try:
+            connection.connection.backup(destino)
+            # Un solo archivo, sin -wal ni -shm, para poder reemplazarlo entero
+            destino.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            destino.close()
+
+        connections[alias].close()
+        os.replace(temporal, ruta)
+        os.utime(ruta, (inicio, inicio))
+        self.stdout.write(self.style.SUCCESS(
+            f'{alias}: {os.path.getsize(ruta) / 1024:.0f} KB copiados en {time.time() - inicio:.2f} s.'
+        ))
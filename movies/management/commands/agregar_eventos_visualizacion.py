@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from movies import agregacion
+
+
+class Command(BaseCommand):
+    help = 'Agrega los eventos de visualización nuevos en los resúmenes por hora (película y género).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50000, help='Eventos agregados por transacción.')
+        parser.add_argument('--purgar-dias', type=int, help='Después de agregar, borra los eventos agregados con más de N días.')
+    
+    def handle(self, *args, **options):
+        procesados = agregacion.agregar(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{procesados} evento(s) agregados.'))
+        
+        if options['purgar_dias'] is not None:
+            borrados = agregacion.purgar(options['purgar_dias'])
+            self.stdout.write(self.style.SUCCESS(f'{borrados} evento(s) purgados.'))
@@ -0,0 +1,141 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+ESQUEMA = '''
+CREATE TABLE historial (
+    id INTEGER PRIMARY KEY,
+    usuario_id INTEGER NOT NULL,
+    pelicula_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    fecha REAL NOT NULL,
+    UNIQUE (usuario_id, pelicula_id)
+);
+CREATE INDEX historial_usuario_fecha ON historial (usuario_id, fecha);
+'''
+LECTURA = 'SELECT pelicula_id, timestamp FROM historial WHERE usuario_id = ? ORDER BY fecha DESC LIMIT 20'
+ESCRITURA = '''
+INSERT INTO historial (usuario_id, pelicula_id, timestamp, fecha) VALUES (?, ?, ?, ?)
+ON CONFLICT (usuario_id, pelicula_id) DO UPDATE SET timestamp = excluded.timestamp, fecha = excluded.fecha
+'''
+
+
+class Perfil:
+    """Cómo se conecta cada hilo: el perfil por defecto reconecta en cada operación, como con CONN_MAX_AGE=0."""
+
+    def __init__(self, nombre, pragmas, persistente, inicio_transaccion):
+        self.nombre = nombre
+        self.pragmas = pragmas
+        self.persistente = persistente
+        self.inicio_transaccion = inicio_transaccion
+
+    def conectar(self, ruta):
+        # Misma espera por defecto que el módulo sqlite3 si el perfil no fija busy_timeout
+        conexion = sqlite3.connect(ruta, timeout=5.0, isolation_level=None, check_same_thread=False)
+        for nombre, valor in self.pragmas.items():
+            conexion.execute(f'PRAGMA {nombre}={valor}')
+        return conexion
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento de lecturas y escrituras concurrentes en SQLite con el perfil por defecto y el de producción.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos concurrentes (peticiones simultáneas).')
+        parser.add_argument('--duracion', type=float, default=5.0, help='Segundos por perfil.')
+        parser.add_argument('--escrituras', type=float, default=0.2, help='Proporción de operaciones que escriben (0-1).')
+        parser.add_argument('--usuarios', type=int, default=1000, help='Usuarios distintos en los datos de prueba.')
+
+    def handle(self, *args, **options):
+        perfiles = [
+            Perfil('por defecto', {}, persistente=False, inicio_transaccion='BEGIN'),
+            Perfil('producción', getattr(settings, 'SQLITE_PRAGMAS', {}), persistente=True, inicio_transaccion='BEGIN IMMEDIATE'),
+        ]
+
+        self.stdout.write(
+            f"{options['hilos']} hilos, {options['duracion']:.0f} s por perfil, "
+            f"{options['escrituras']:.0%} escrituras, {options['usuarios']} usuarios"
+        )
+        self.stdout.write(f"{'perfil':<12} {'ops/s':>9} {'lect/s':>9} {'escr/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'bloqueos':>9}")
+
+        for perfil in perfiles:
+            with tempfile.TemporaryDirectory() as directorio:
+                ruta = os.path.join(directorio, 'benchmark.sqlite3')
+                self._preparar(ruta, perfil, options['usuarios'])
+                resultado = self._medir(ruta, perfil, options)
+
+            latencias = sorted(resultado['latencias'])
+            p50 = statistics.median(latencias) * 1000 if latencias else 0
+            p99 = latencias[int(len(latencias) * 0.99) - 1] * 1000 if latencias else 0
+            duracion = options['duracion']
+            self.stdout.write(
+                f"{perfil.nombre:<12} {(resultado['lecturas'] + resultado['escrituras']) / duracion:>9.0f} "
+                f"{resultado['lecturas'] / duracion:>9.0f} {resultado['escrituras'] / duracion:>9.0f} "
+                f"{p50:>8.2f} {p99:>8.2f} {resultado['bloqueos']:>9}"
+            )
+
+    def _preparar(self, ruta, perfil, usuarios):
+        conexion = perfil.conectar(ruta)
+        conexion.executescript(ESQUEMA)
+        ahora = time.time()
+        conexion.execute('BEGIN')
+        conexion.executemany(
+            'INSERT INTO historial (usuario_id, pelicula_id, timestamp, fecha) VALUES (?, ?, ?, ?)',
+            ((usuario, pelicula, 0, ahora) for usuario in range(usuarios) for pelicula in range(20)),
+        )
+        conexion.execute('COMMIT')
+        conexion.close()
+
+    def _medir(self, ruta, perfil, options):
+        resultado = {'lecturas': 0, 'escrituras': 0, 'bloqueos': 0, 'latencias': []}
+        lock = threading.Lock()
+        fin = time.monotonic() + options['duracion']
+
+        def trabajar(semilla):
+            azar = random.Random(semilla)
+            lecturas = escrituras = bloqueos = 0
+            latencias = []
+            conexion = perfil.conectar(ruta) if perfil.persistente else None
+            while time.monotonic() < fin:
+                usuario = azar.randrange(options['usuarios'])
+                escribe = azar.random() < options['escrituras']
+                inicio = time.monotonic()
+                actual = conexion or perfil.conectar(ruta)
+                try:
+                    if escribe:
+                        actual.execute(perfil.inicio_transaccion)
+                        actual.execute(ESCRITURA, (usuario, azar.randrange(50), azar.randrange(7200), time.time()))
+                        actual.execute('COMMIT')
+                        escrituras += 1
+                    else:
+                        actual.execute(LECTURA, (usuario,)).fetchall()
+                        lecturas += 1
+                    latencias.append(time.monotonic() - inicio)
+                except sqlite3.OperationalError:
+                    bloqueos += 1
+                    if actual.in_transaction:
+                        actual.execute('ROLLBACK')
+                finally:
+                    if conexion is None:
+                        actual.close()
+            if conexion is not None:
+                conexion.close()
+            with lock:
+                resultado['lecturas'] += lecturas
+                resultado['escrituras'] += escrituras
+                resultado['bloqueos'] += bloqueos
+                resultado['latencias'] += latencias
+
+        hilos = [threading.Thread(target=trabajar, args=(numero,)) for numero in range(options['hilos'])]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultado
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies import busqueda, cache, cache_inicio
+from movies.almacenamiento import almacenamiento, es_inmutable, ruta_por_contenido
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Mueve los pósters existentes al almacenamiento por contenido, unificando duplicados, y actualiza Movie.imagen.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--carpeta', default='posters', help='Carpeta dentro de MEDIA_ROOT a migrar.')
+        parser.add_argument('--simular', action='store_true', help='Solo informa qué haría, sin mover ni actualizar nada.')
+        parser.add_argument('--conservar', action='store_true', help='No borra los archivos originales.')
+    
+    def handle(self, *args, **options):
+        carpeta = options['carpeta'].strip('/')
+        _, archivos = almacenamiento.listdir(carpeta)
+        
+        nuevos = {}
+        bytes_duplicados = 0
+        for archivo in sorted(archivos):
+            nombre = f'{carpeta}/{archivo}'
+            if es_inmutable(nombre):
+                continue
+            with almacenamiento.open(nombre, 'rb') as contenido:
+                ruta = ruta_por_contenido(nombre, contenido)
+                if ruta in nuevos.values() or almacenamiento.exists(ruta):
+                    bytes_duplicados += contenido.size
+                if not options['simular']:
+                    ruta = almacenamiento.save(nombre, contenido)
+            nuevos[nombre] = ruta
+            self.stdout.write(f'{nombre} -> {ruta}')
+        
+        actualizadas = 0
+        if not options['simular']:
+            pelicula_ids = list(Movie.objects.filter(imagen__in=list(nuevos)).values_list('id', flat=True))
+            with transaction.atomic():
+                for viejo, nuevo in nuevos.items():
+                    actualizadas += Movie.objects.filter(imagen=viejo).update(imagen=nuevo)
+            # update() no emite señales: invalidar a mano lo que guarda la ruta
+            # vieja antes de borrar los archivos a los que apunta
+            cache.invalidar(Movie)
+            cache_inicio.invalidar(Movie)
+            busqueda.obtener_backend().indexar(pelicula_ids)
+            if not options['conservar']:
+                for viejo in nuevos:
+                    almacenamiento.delete(viejo)
+        
+        unicos = len(set(nuevos.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(nuevos)} archivo(s), {unicos} único(s), {bytes_duplicados / 1024:.0f} KB duplicados; '
+            f'{actualizadas} película(s) actualizada(s).'
+        ))
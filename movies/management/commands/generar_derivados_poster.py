@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from movies import cache, posters
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Genera los derivados (tamaños y formatos modernos), dimensiones y placeholder de los pósters de las películas.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--pelicula', type=int, action='append', help='ID de película a procesar (repetible).')
+        parser.add_argument('--forzar', action='store_true', help='Regenera aunque el póster no haya cambiado.')
+    
+    def handle(self, *args, **options):
+        peliculas = Movie.objects.exclude(imagen='').exclude(imagen__isnull=True).order_by('pk')
+        if options['pelicula']:
+            peliculas = peliculas.filter(pk__in=options['pelicula'])
+        
+        procesadas = errores = 0
+        for pelicula in peliculas.iterator():
+            try:
+                posters.generar(pelicula, forzar=options['forzar'])
+                procesadas += 1
+            except Exception as error:
+                errores += 1
+                self.stderr.write(f'{pelicula.pk} ({pelicula.titulo}): {error}')
+        if procesadas:
+            cache.invalidar(Movie)
+        
+        formatos = ', '.join(posters.formatos_disponibles()) or 'ninguno'
+        self.stdout.write(self.style.SUCCESS(
+            f'Derivados generados para {procesadas} película(s) en {formatos}; {errores} con error.'
+        ))
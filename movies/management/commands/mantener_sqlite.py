@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint del WAL y PRAGMA optimize de la base SQLite. Pensado para ejecutarse periódicamente (cron).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoint',
+            choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            default='TRUNCATE',
+            help='Modo de wal_checkpoint (TRUNCATE deja el archivo -wal en cero).',
+        )
+    
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('La base de datos por defecto no es SQLite.')
+        
+        archivo_wal = f"{connection.settings_dict['NAME']}-wal"
+        antes = os.path.getsize(archivo_wal) if os.path.exists(archivo_wal) else 0
+        
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            modo = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA wal_checkpoint({options['checkpoint']})")
+            bloqueado, paginas_wal, paginas_copiadas = cursor.fetchone()
+            cursor.execute('PRAGMA optimize')
+        
+        despues = os.path.getsize(archivo_wal) if os.path.exists(archivo_wal) else 0
+        if bloqueado:
+            self.stderr.write('El checkpoint no pudo completarse: había lectores o escritores activos.')
+        self.stdout.write(self.style.SUCCESS(
+            f'journal_mode={modo}; checkpoint {options["checkpoint"]}: {paginas_copiadas}/{paginas_wal} páginas, '
+            f'WAL {antes / 1024:.0f} KB -> {despues / 1024:.0f} KB; optimize ejecutado.'
+        ))
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from movies import recomendaciones
+
+
+class Command(BaseCommand):
+    help = 'Precalcula en lote las películas recomendadas para cada usuario activo.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Películas a guardar por usuario (por defecto 20).')
+        parser.add_argument('--lote', type=int, default=1000, help='Usuarios puntuados por producto matricial.')
+        parser.add_argument('--usuario', type=int, action='append', help='ID de usuario a recalcular (repetible).')
+    
+    def handle(self, *args, **options):
+        usuarios = User.objects.filter(is_active=True)
+        if options['usuario']:
+            usuarios = usuarios.filter(pk__in=options['usuario'])
+        usuario_ids = list(usuarios.order_by('pk').values_list('pk', flat=True))
+        
+        total = recomendaciones.precalcular(usuario_ids, n=options['top'], lote=options['lote'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Recomendaciones precalculadas para {total} usuario(s).'))
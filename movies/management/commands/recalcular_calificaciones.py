@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies import cache
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los agregados de calificaciones (suma, conteo, media e histograma) de cada película.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--pelicula', type=int, action='append', help='ID de película a recalcular (repetible).')
+    
+    def handle(self, *args, **options):
+        queryset = Movie.objects.all()
+        if options['pelicula']:
+            queryset = queryset.filter(pk__in=options['pelicula'])
+        
+        with transaction.atomic():
+            total = Movie.recalcular_calificaciones(queryset)
+        cache.invalidar(Movie)
+        
+        self.stdout.write(self.style.SUCCESS(f'Agregados recalculados para {total} película(s).'))
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from movies import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde el historial las estadísticas de visualización que muestra el perfil.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Usuarios recalculados por lote de consultas.')
+        parser.add_argument('--usuario', type=int, action='append', help='ID de usuario a recalcular (repetible).')
+    
+    def handle(self, *args, **options):
+        usuario_ids = None
+        if options['usuario']:
+            usuario_ids = list(User.objects.filter(pk__in=options['usuario']).order_by('pk').values_list('pk', flat=True))
+        
+        total = estadisticas.reconstruir(usuario_ids, lote=options['lote'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas para {total} usuario(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from movies import relacionadas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la tabla de películas relacionadas (géneros, calificaciones y año).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--pelicula', type=int, action='append', help='ID de película a recalcular (repetible).')
+        parser.add_argument('--top', type=int, default=relacionadas.TOP_K, help='Relacionadas a guardar por película.')
+    
+    def handle(self, *args, **options):
+        total = relacionadas.recalcular(options['pelicula'], top_k=options['top'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Relacionadas recalculadas para {total} película(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero el índice de búsqueda de texto completo.'
+    
+    def handle(self, *args, **options):
+        backend = busqueda.obtener_backend()
+        
+        with transaction.atomic():
+            backend.reconstruir()
+        
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido con {type(backend).__name__}.'))
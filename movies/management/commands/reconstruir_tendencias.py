@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from movies import tendencias
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de tendencias desde los resúmenes horarios y las calificaciones.'
+    
+    def handle(self, *args, **options):
+        tendencias.contador.volcar()
+        total = tendencias.reconstruir()
+        
+        self.stdout.write(self.style.SUCCESS(f'Tendencias recalculadas para {total} película(s).'))
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.enlaces import Verificador
+from movies.streaming import ruta_local
+
+TAMAÑO_VIDEO = 1234
+
+
+class Servidor(ThreadingHTTPServer):
+    """Servidor HTTP local con rutas que imitan a los CDN; anota lo que recibe."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), Manejador)
+        self.lock = threading.Lock()
+        self.peticiones = []
+        self.en_curso = 0
+        self.max_en_curso = 0
+
+    @property
+    def base(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self._responder('HEAD')
+
+    def do_GET(self):
+        self._responder('GET')
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, metodo):
+        servidor = self.server
+        ruta = self.path
+        with servidor.lock:
+            servidor.peticiones.append((metodo, ruta, self.headers.get('Range'), time.monotonic()))
+        if ruta == '/ok':
+            self._enviar(200, {'Content-Length': TAMAÑO_VIDEO}, metodo)
+        elif ruta in ('/sin-head', '/sin-tamano'):
+            if metodo == 'HEAD':
+                # Sin HEAD (405) o con HEAD pero sin Content-Length
+                codigo = 405 if ruta == '/sin-head' else 200
+                self._enviar(codigo, {'Content-Length': 0} if codigo == 405 else {'Transfer-Encoding': 'chunked'}, metodo)
+            elif self.headers.get('Range') == 'bytes=0-0':
+                self._enviar(206, {'Content-Range': f'bytes 0-0/{TAMAÑO_VIDEO}', 'Content-Length': 1}, metodo, b'x')
+            else:
+                self._enviar(400, {'Content-Length': 0}, metodo)
+        elif ruta == '/redirige':
+            self._enviar(302, {'Location': '/ok', 'Content-Length': 0}, metodo)
+        elif ruta == '/bucle':
+            self._enviar(302, {'Location': '/bucle', 'Content-Length': 0}, metodo)
+        elif ruta == '/lento':
+            time.sleep(1.0)
+            self._enviar(200, {'Content-Length': TAMAÑO_VIDEO}, metodo)
+        elif ruta.startswith('/concurrente'):
+            self._concurrente(metodo)
+        else:
+            self._enviar(404, {'Content-Length': 0}, metodo)
+
+    def _concurrente(self, metodo):
+        # Solo se cuentan estas: un /lento cortado por timeout puede seguir en curso
+        servidor = self.server
+        with servidor.lock:
+            servidor.en_curso += 1
+            servidor.max_en_curso = max(servidor.max_en_curso, servidor.en_curso)
+        try:
+            time.sleep(0.2)
+            self._enviar(200, {'Content-Length': TAMAÑO_VIDEO}, metodo)
+        finally:
+            with servidor.lock:
+                servidor.en_curso -= 1
+
+    def _enviar(self, codigo, cabeceras, metodo, cuerpo=b''):
+        try:
+            self.send_response(codigo)
+            for nombre, valor in cabeceras.items():
+                self.send_header(nombre, str(valor))
+            self.end_headers()
+            if metodo == 'GET' and cuerpo:
+                self.wfile.write(cuerpo)
+            elif metodo == 'GET' and cabeceras.get('Transfer-Encoding') == 'chunked':
+                self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            # El verificador cortó por timeout
+            self.close_connection = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Comprueba el verificador de enlaces contra un servidor HTTP local: HEAD, GET con Range cuando no hay '
+        'HEAD o tamaño, límite por host, timeouts y redirecciones. Falla si algún caso no da lo esperado.'
+    )
+
+    def handle(self, *args, **options):
+        servidor = Servidor()
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        try:
+            fallidos = [nombre for nombre, caso in self._casos() if not self._correr(nombre, caso, servidor)]
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+        if fallidos:
+            raise CommandError(f'{len(fallidos)} caso(s) fallido(s): {", ".join(fallidos)}.')
+        self.stdout.write(self.style.SUCCESS('El verificador de enlaces se comporta como se espera.'))
+
+    def _casos(self):
+        return [
+            ('HEAD con tamaño', self._caso_head),
+            ('sin HEAD: GET con Range', self._caso_sin_head),
+            ('HEAD sin tamaño: GET con Range', self._caso_sin_tamaño),
+            ('404', self._caso_roto),
+            ('redirección', self._caso_redireccion),
+            ('demasiadas redirecciones', self._caso_bucle),
+            ('timeout', self._caso_timeout),
+            ('límite por host', self._caso_por_host),
+            ('intervalo por host', self._caso_intervalo),
+            ('enlaces remotos bajo /media/', self._caso_ruta_local),
+        ]
+
+    def _correr(self, nombre, caso, servidor):
+        with servidor.lock:
+            servidor.peticiones.clear()
+            servidor.max_en_curso = 0
+        try:
+            error = caso(servidor)
+        except Exception as excepcion:
+            error = f'{excepcion.__class__.__name__}: {excepcion}'
+        if error:
+            self.stdout.write(self.style.ERROR(f'{nombre}: {error}'))
+            return False
+        self.stdout.write(f'{nombre}: ok')
+        return True
+
+    def _verificar(self, enlaces, **opciones):
+        opciones.setdefault('intervalo_host', 0)
+        return asyncio.run(Verificador(**opciones).verificar_todos(list(enumerate(enlaces))))
+
+    def _metodos(self, servidor):
+        return [(metodo, rango) for metodo, _, rango, _ in servidor.peticiones]
+
+    def _caso_head(self, servidor):
+        resultado, = self._verificar([f'{servidor.base}/ok'])
+        if not resultado.ok or resultado.codigo != 200 or resultado.tamaño != TAMAÑO_VIDEO:
+            return f'resultado inesperado {resultado}'
+        if self._metodos(servidor) != [('HEAD', None)]:
+            return f'peticiones {self._metodos(servidor)}; se esperaba solo HEAD'
+
+    def _caso_sin_head(self, servidor):
+        return self._caso_rango(servidor, '/sin-head')
+
+    def _caso_sin_tamaño(self, servidor):
+        return self._caso_rango(servidor, '/sin-tamano')
+
+    def _caso_rango(self, servidor, ruta):
+        resultado, = self._verificar([f'{servidor.base}{ruta}'])
+        if not resultado.ok or resultado.codigo != 206 or resultado.tamaño != TAMAÑO_VIDEO:
+            return f'resultado inesperado {resultado}'
+        if self._metodos(servidor) != [('HEAD', None), ('GET', 'bytes=0-0')]:
+            return f'peticiones {self._metodos(servidor)}; se esperaba HEAD y GET con Range'
+
+    def _caso_roto(self, servidor):
+        resultado, = self._verificar([f'{servidor.base}/no-existe'])
+        if resultado.ok or resultado.codigo != 404:
+            return f'resultado inesperado {resultado}'
+
+    def _caso_redireccion(self, servidor):
+        resultado, = self._verificar([f'{servidor.base}/redirige'])
+        if not resultado.ok or resultado.tamaño != TAMAÑO_VIDEO:
+            return f'resultado inesperado {resultado}'
+        rutas = [ruta for _, ruta, _, _ in servidor.peticiones]
+        if rutas != ['/redirige', '/ok']:
+            return f'rutas pedidas {rutas}'
+
+    def _caso_bucle(self, servidor):
+        resultado, = self._verificar([f'{servidor.base}/bucle'])
+        if resultado.ok or 'redirecciones' not in resultado.error:
+            return f'resultado inesperado {resultado}'
+
+    def _caso_timeout(self, servidor):
+        inicio = time.monotonic()
+        resultado, = self._verificar([f'{servidor.base}/lento'], timeout=0.3)
+        segundos = time.monotonic() - inicio
+        if resultado.ok or resultado.codigo is not None:
+            return f'resultado inesperado {resultado}'
+        if segundos > 0.9:
+            return f'tardó {segundos:.2f} s con timeout de 0.3 s'
+
+    def _caso_por_host(self, servidor):
+        enlaces = [f'{servidor.base}/concurrente/{numero}' for numero in range(6)]
+        resultados = self._verificar(enlaces, por_host=2)
+        if not all(resultado.ok for resultado in resultados):
+            return f'resultados inesperados {resultados}'
+        if servidor.max_en_curso != 2:
+            return f'{servidor.max_en_curso} peticiones simultáneas al host; se esperaban 2'
+
+    def _caso_intervalo(self, servidor):
+        enlaces = [f'{servidor.base}/ok' for _ in range(4)]
+        self._verificar(enlaces, intervalo_host=0.1)
+        llegadas = [momento for _, _, _, momento in servidor.peticiones]
+        separaciones = [despues - antes for antes, despues in zip(llegadas, llegadas[1:])]
+        # Margen por la resolución del reloj y el planificador
+        if len(llegadas) != 4 or min(separaciones) < 0.09:
+            return f'separaciones entre peticiones {[round(s, 3) for s in separaciones]}'
+
+    def _caso_ruta_local(self, servidor):
+        enlace = 'https://cdn.example.com/media/video.mp4'
+        if ruta_local(enlace) is not None:
+            return f'{enlace} se trataría como archivo local'
+        if ruta_local('/media/mi%20video.mp4') != 'mi video.mp4':
+            return 'no se decodifica la ruta de un enlace local'
@@ -0,0 +1,129 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import perfilado
+
+
+@dataclass(frozen=True)
+class Presupuesto:
+    consultas: int
+    # Ejecuciones de más de una misma forma de consulta (el síntoma de un N+1)
+    repetidas: int = 0
+
+
+# Por vista de movies.urls: (como usuario, como anónimo). Medido sin caché, así
+# que es el peor caso; incluye sesión, usuario y BEGIN/COMMIT. Una vista sin
+# presupuesto declarado hace fallar la verificación.
+PRESUPUESTOS = {
+    # Cada sección (continuar, géneros, tendencia, top, global) hace su propio prefetch de géneros
+    'home': (Presupuesto(24, repetidas=9), Presupuesto(4)),
+    'movies_catalog': (Presupuesto(6), Presupuesto(0)),
+    'catalog_page': (Presupuesto(7), Presupuesto(0)),
+    'movie_detail': (Presupuesto(12, repetidas=1), Presupuesto(0)),
+    'toggle_favorite': (Presupuesto(8), Presupuesto(0)),
+    'favorites_stats': (Presupuesto(6), Presupuesto(0)),
+    'register': (Presupuesto(4), Presupuesto(0)),
+    'login': (Presupuesto(4), Presupuesto(0)),
+    'logout': (Presupuesto(4), Presupuesto(0)),
+    'favorites': (Presupuesto(8), Presupuesto(0)),
+    'watch_movie': (Presupuesto(7), Presupuesto(0)),
+    'stream_video': (Presupuesto(5), Presupuesto(0)),
+    'update_progress': (Presupuesto(5), Presupuesto(0)),
+    'search': (Presupuesto(4), Presupuesto(0)),
+    'rate_movie': (Presupuesto(16), Presupuesto(0)),
+    # El usuario del enlace se carga aparte del de la sesión
+    'activate': (Presupuesto(5, repetidas=1), Presupuesto(9)),
+    'resend_activation': (Presupuesto(4), Presupuesto(0)),
+    'landing_page': (Presupuesto(8), Presupuesto(4)),
+    'password_reset': (Presupuesto(4), Presupuesto(0)),
+    'password_reset_done': (Presupuesto(4), Presupuesto(0)),
+    'password_reset_confirm': (Presupuesto(5, repetidas=1), Presupuesto(1)),
+    'change_password': (Presupuesto(5), Presupuesto(0)),
+    'confirm_change_password': (Presupuesto(5, repetidas=1), Presupuesto(1)),
+    'profile': (Presupuesto(16), Presupuesto(0)),
+    'home_cache_stats': (Presupuesto(4), Presupuesto(0)),
+    'write_queue_stats': (Presupuesto(4), Presupuesto(0)),
+    'replica_stats': (Presupuesto(4), Presupuesto(0)),
+}
+
+# Control de transacciones: se cuenta en el total pero no es una forma repetida
+CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+LISTA_PARAMETROS = re.compile(r'\((?:%s, )*%s\)')
+FILAS_VALORES = re.compile(r'(?:, )?\((?:%s, )*%s\)(?=,|$| ON| RETURNING)')
+# Trazas que se muestran por forma repetida
+TRAZAS_POR_FORMA = 3
+
+
+def forma(sql):
+    """SQL sin la cantidad de parámetros de `IN (...)` ni de filas de un INSERT múltiple."""
+    return FILAS_VALORES.sub(' (...)', LISTA_PARAMETROS.sub('(...)', sql))
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta cada vista de movies.urls (como usuario y como anónimo) contra una base de prueba sembrada '
+        'y falla si alguna supera su presupuesto de consultas o de consultas repetidas (N+1).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peliculas', type=int, default=300, help='Películas sembradas.')
+        parser.add_argument('--usuarios', type=int, default=50, help='Usuarios sembrados.')
+        parser.add_argument('--vista', action='append', help='Solo esta vista (repetible).')
+        parser.add_argument('--tabla', action='store_true', help='Muestra las consultas de todas las vistas, no solo las excedidas.')
+
+    def handle(self, *args, **options):
+        excedidas = 0
+        with perfilado.entorno_aislado():
+            semilla = perfilado.sembrar(peliculas=options['peliculas'], usuarios=options['usuarios'])
+            for peticion, autenticado, respuesta, consultas in perfilado.recorrer(semilla):
+                if options['vista'] and peticion.nombre not in options['vista']:
+                    continue
+                usuario = 'usuario' if autenticado else 'anónimo'
+                etiqueta = f'{peticion.metodo} {peticion.url} ({peticion.nombre}, {usuario}, {respuesta.status_code})'
+                if peticion.nombre not in PRESUPUESTOS:
+                    self.stdout.write(self.style.ERROR(f'{etiqueta}: sin presupuesto declarado en PRESUPUESTOS'))
+                    excedidas += 1
+                    continue
+
+                presupuesto = PRESUPUESTOS[peticion.nombre][0 if autenticado else 1]
+                repetidas = self._repetidas(consultas)
+                extra = sum(len(grupo) - 1 for grupo in repetidas.values())
+                resumen = f'{etiqueta}: {len(consultas)}/{presupuesto.consultas} consultas, {extra}/{presupuesto.repetidas} repetidas'
+                if len(consultas) > presupuesto.consultas or extra > presupuesto.repetidas:
+                    excedidas += 1
+                    self.stdout.write(self.style.ERROR(resumen))
+                    if extra > presupuesto.repetidas:
+                        self._informar_repetidas(repetidas)
+                    else:
+                        self._informar_todas(consultas)
+                elif options['tabla']:
+                    self.stdout.write(resumen)
+
+        if excedidas:
+            raise CommandError(f'{excedidas} vista(s) fuera de presupuesto.')
+        self.stdout.write(self.style.SUCCESS('Todas las vistas dentro de su presupuesto de consultas.'))
+
+    def _repetidas(self, consultas):
+        """{forma: [consultas]} de las formas ejecutadas más de una vez."""
+        por_forma = defaultdict(list)
+        for consulta in consultas:
+            if not consulta.sql.lstrip().upper().startswith(CONTROL):
+                por_forma[forma(consulta.sql)].append(consulta)
+        return {sql: grupo for sql, grupo in por_forma.items() if len(grupo) > 1}
+
+    def _informar_repetidas(self, repetidas):
+        for sql, grupo in sorted(repetidas.items(), key=lambda item: -len(item[1])):
+            self.stdout.write(f'  {len(grupo)} veces: {sql}')
+            for consulta in grupo[:TRAZAS_POR_FORMA]:
+                self.stdout.write(f'    params {consulta.params}')
+                for marco in consulta.traza:
+                    self.stdout.write(f'      desde {marco}')
+
+    def _informar_todas(self, consultas):
+        for numero, consulta in enumerate(consultas, 1):
+            self.stdout.write(f'  {numero}. {consulta.sql}')
+            if consulta.traza:
+                self.stdout.write(f'      desde {consulta.traza[-1]}')
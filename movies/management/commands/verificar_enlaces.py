@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from movies import enlaces
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Verifica en paralelo los enlaces de stream y guarda estado, latencia y tamaño. Pensado para ejecutarse periódicamente (cron).'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--pelicula', type=int, action='append', help='ID de película a verificar (repetible).')
+        parser.add_argument('--concurrencia', type=int, default=enlaces.CONCURRENCIA, help='Peticiones simultáneas en total.')
+        parser.add_argument('--por-host', type=int, default=enlaces.POR_HOST, help='Peticiones simultáneas por host.')
+        parser.add_argument('--intervalo-host', type=float, default=enlaces.INTERVALO_HOST, help='Segundos mínimos entre peticiones a un mismo host.')
+        parser.add_argument('--timeout', type=float, default=enlaces.TIMEOUT, help='Segundos máximos por enlace.')
+    
+    def handle(self, *args, **options):
+        peliculas = Movie.objects.all()
+        if options['pelicula']:
+            peliculas = peliculas.filter(pk__in=options['pelicula'])
+        
+        resultados = enlaces.verificar(
+            peliculas,
+            concurrencia=options['concurrencia'],
+            por_host=options['por_host'],
+            intervalo_host=options['intervalo_host'],
+            timeout=options['timeout'],
+        )
+        
+        fallidos = [resultado for resultado in resultados if not resultado.ok]
+        for resultado in fallidos:
+            detalle = resultado.error or f'HTTP {resultado.codigo}'
+            self.stderr.write(f'Película {resultado.pelicula_id}: {detalle}')
+        
+        rotas = Movie.objects.filter(enlace_estado=Movie.ENLACE_ROTO).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(resultados)} enlace(s) verificado(s): {len(resultados) - len(fallidos)} disponible(s), '
+            f'{len(fallidos)} con fallo; {rotas} película(s) ocultas por enlace roto.'
+        ))
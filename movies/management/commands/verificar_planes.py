@@ -0,0 +1,86 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from movies import perfilado
+
+# Tablas que se pueden recorrer enteras: pocas filas y se listan completas
+TABLAS_PEQUEÑAS = {
+    'movies_genre': 'decenas de géneros; el catálogo y los filtros los listan todos',
+}
+# (vista, tabla) cuyo recorrido completo es inherente a la consulta
+ESCANEOS_PERMITIDOS = {
+    ('home', 'movies_tendenciapelicula'): 'las listas de tendencias se arman en memoria con todas las filas (y se reutilizan)',
+}
+
+ESCANEO = re.compile(r'^SCAN (\w+)$')
+INDICE_AUTOMATICO = re.compile(r'^SEARCH (\w+) USING AUTOMATIC (?:COVERING |PARTIAL )*INDEX')
+ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([A-Z]\d+)"?(?=[\s),])')
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta cada vista de movies.urls contra una base de prueba sembrada, corre EXPLAIN QUERY PLAN '
+        'sobre cada consulta y falla si alguna recorre una tabla entera o necesita un índice automático.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peliculas', type=int, default=300, help='Películas sembradas.')
+        parser.add_argument('--usuarios', type=int, default=50, help='Usuarios sembrados.')
+        parser.add_argument('--planes', action='store_true', help='Muestra el plan de todas las consultas, no solo las que fallan.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN solo está disponible con SQLite.')
+
+        with perfilado.entorno_aislado():
+            semilla = perfilado.sembrar(peliculas=options['peliculas'], usuarios=options['usuarios'])
+            tablas = set(connection.introspection.table_names())
+            problemas = 0
+            consultas_revisadas = 0
+            for peticion, autenticado, _, consultas in perfilado.recorrer(semilla):
+                for consulta in consultas:
+                    if not consulta.sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                        continue
+                    consultas_revisadas += 1
+                    plan = self._plan(consulta)
+                    escaneos = self._escaneos(peticion.nombre, consulta.sql, plan, tablas)
+                    if escaneos or options['planes']:
+                        self._informar(peticion, autenticado, consulta, plan, escaneos)
+                    problemas += len(escaneos)
+
+        if problemas:
+            raise CommandError(f'{problemas} recorrido(s) de tabla completa en {consultas_revisadas} consultas.')
+        self.stdout.write(self.style.SUCCESS(f'{consultas_revisadas} consultas revisadas: todas usan índices.'))
+
+    def _plan(self, consulta):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {consulta.sql}', consulta.params)
+            return [fila[3] for fila in cursor.fetchall()]
+
+    def _escaneos(self, vista, sql, plan, tablas):
+        """Tablas que el plan recorre enteras (o para las que crea un índice al vuelo), sin las permitidas."""
+        alias = {nombre_alias: tabla for tabla, nombre_alias in ALIAS.findall(sql)}
+        escaneos = []
+        for detalle in plan:
+            coincidencia = ESCANEO.match(detalle) or INDICE_AUTOMATICO.match(detalle)
+            if not coincidencia:
+                continue
+            tabla = alias.get(coincidencia.group(1), coincidencia.group(1))
+            if tabla in tablas and tabla not in TABLAS_PEQUEÑAS and (vista, tabla) not in ESCANEOS_PERMITIDOS:
+                escaneos.append(tabla)
+        return escaneos
+
+    def _informar(self, peticion, autenticado, consulta, plan, escaneos):
+        usuario = 'autenticado' if autenticado else 'anónimo'
+        estilo = self.style.ERROR if escaneos else self.style.NOTICE
+        titulo = f'{peticion.nombre} ({peticion.url}, {usuario})'
+        if escaneos:
+            titulo += f": recorre {', '.join(escaneos)}"
+        self.stdout.write(estilo(titulo))
+        self.stdout.write(f'  {consulta.sql}')
+        for detalle in plan:
+            self.stdout.write(f'    {detalle}')
+        for marco in consulta.traza:
+            self.stdout.write(f'  desde {marco}')
@@ -0,0 +1,75 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:52
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def poblar_agregados(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    conteos = {
+        f'estrellas_{estrellas}': Count('calificaciones', filter=Q(calificaciones__puntuacion=estrellas))
+        for estrellas in range(1, 6)
+    }
+    peliculas = Movie.objects.order_by().annotate(
+        suma=Sum('calificaciones__puntuacion'),
+        conteo=Count('calificaciones'),
+        **{f'_{campo}': expresion for campo, expresion in conteos.items()},
+    ).filter(conteo__gt=0)
+    for pelicula in peliculas:
+        Movie.objects.filter(pk=pelicula.pk).update(
+            calificacion_suma=pelicula.suma,
+            calificacion_conteo=pelicula.conteo,
+            calificacion_media=pelicula.suma / pelicula.conteo,
+            **{campo: getattr(pelicula, f'_{campo}') for campo in conteos},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movie_año_publicacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='calificacion_conteo',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='calificacion_media',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='calificacion_suma',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='estrellas_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='estrellas_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='estrellas_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='estrellas_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='estrellas_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_agregados, migrations.RunPython.noop),
+    ]
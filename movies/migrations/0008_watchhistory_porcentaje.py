@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def poblar_porcentajes(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    WatchHistory = apps.get_model('movies', 'WatchHistory')
+    for pelicula_id, duracion in Movie.objects.filter(duracion__gt=0).values_list('id', 'duracion'):
+        WatchHistory.objects.filter(pelicula_id=pelicula_id).update(
+            porcentaje=F('timestamp') * 100.0 / duracion
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_movie_agregados_calificacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchhistory',
+            name='porcentaje',
+            field=models.FloatField(default=0, editable=False, help_text='Progreso en porcentaje, calculado al guardar el timestamp'),
+        ),
+        migrations.RunPython(poblar_porcentajes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='watchhistory',
+            index=models.Index(condition=models.Q(('completado', False), ('porcentaje__gte', 5), ('porcentaje__lt', 95)), fields=['usuario', '-ultima_visualizacion'], name='historial_continuar_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_recomendacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeliculaRelacionada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('puntuacion', models.FloatField(help_text='Similitud combinada: géneros, calificaciones y año')),
+                ('pelicula', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionadas', to='movies.movie')),
+                ('relacionada', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+            ],
+            options={
+                'verbose_name': 'Película relacionada',
+                'verbose_name_plural': 'Películas relacionadas',
+                'ordering': ['pelicula', 'posicion'],
+                'unique_together': {('pelicula', 'posicion')},
+            },
+        ),
+    ]
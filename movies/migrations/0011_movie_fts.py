@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:20
+
+from django.db import migrations
+
+
+def crear_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    
+    Movie = apps.get_model('movies', 'Movie')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS movies_movie_fts USING fts5('
+        'titulo, descripcion, generos, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    for pelicula in Movie.objects.prefetch_related('generos'):
+        schema_editor.execute(
+            'INSERT INTO movies_movie_fts (rowid, titulo, descripcion, generos) VALUES (%s, %s, %s, %s)',
+            [pelicula.pk, pelicula.titulo, pelicula.descripcion, ' '.join(g.nombre for g in pelicula.generos.all())],
+        )
+
+
+def eliminar_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS movies_movie_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_pelicularelacionada'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_fts, eliminar_indice_fts),
+    ]
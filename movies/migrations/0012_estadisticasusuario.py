@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_movie_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticasUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segundos_vistos', models.PositiveBigIntegerField(default=0, help_text='Suma de la duración de las películas del historial')),
+                ('completadas', models.PositiveIntegerField(default=0)),
+                ('en_progreso', models.PositiveIntegerField(default=0)),
+                ('vistas_por_genero', models.JSONField(default=dict, help_text='{genero_id: películas vistas de ese género}')),
+                ('ultimas_peliculas', models.JSONField(default=list, help_text='IDs de las últimas películas vistas, de la más reciente a la más antigua')),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+                ('genero_mas_visto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='movies.genre')),
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de usuario',
+                'verbose_name_plural': 'Estadísticas de usuarios',
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_estadisticasusuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAgregacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('fecha', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de agregación',
+                'verbose_name_plural': 'Marcas de agregación',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoVisualizacion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('tipo', models.PositiveSmallIntegerField(choices=[(1, 'Inicio de sesión'), (2, 'Progreso'), (3, 'Completada')])),
+                ('posicion', models.PositiveIntegerField(help_text='Segundo de la película en el latido')),
+                ('porcentaje', models.PositiveSmallIntegerField()),
+                ('segundos', models.PositiveIntegerField(default=0, help_text='Segundos vistos desde el latido anterior de la sesión')),
+                ('pelicula', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='movies.movie')),
+                ('usuario', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento de visualización',
+                'verbose_name_plural': 'Eventos de visualización',
+                'indexes': [models.Index(fields=['fecha'], name='evento_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenHorarioGenero',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('vistas', models.PositiveIntegerField(default=0)),
+                ('completadas', models.PositiveIntegerField(default=0)),
+                ('segundos_vistos', models.PositiveBigIntegerField(default=0)),
+                ('genero', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_horarios', to='movies.genre')),
+            ],
+            options={
+                'verbose_name': 'Resumen horario por género',
+                'verbose_name_plural': 'Resúmenes horarios por género',
+                'unique_together': {('hora', 'genero')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenHorarioPelicula',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('vistas', models.PositiveIntegerField(default=0, help_text='Sesiones de visualización iniciadas')),
+                ('completadas', models.PositiveIntegerField(default=0)),
+                ('segundos_vistos', models.PositiveBigIntegerField(default=0)),
+                ('curva', models.JSONField(default=list, help_text='Latidos por decil de la película: curva de abandono')),
+                ('pelicula', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_horarios', to='movies.movie')),
+            ],
+            options={
+                'verbose_name': 'Resumen horario por película',
+                'verbose_name_plural': 'Resúmenes horarios por película',
+                'indexes': [models.Index(fields=['pelicula', 'hora'], name='resumen_pelicula_hora_idx')],
+                'unique_together': {('hora', 'pelicula')},
+            },
+        ),
+    ]
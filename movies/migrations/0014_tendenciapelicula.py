@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_eventos_visualizacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TendenciaPelicula',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horas', models.JSONField(default=list, help_text='Anillo de 24 ranuras: ranura = hora desde epoch % 24')),
+                ('ultima_hora', models.BigIntegerField(help_text='Hora (desde epoch) de la ranura más reciente del anillo')),
+                ('dias', models.JSONField(default=list, help_text='Anillo de 7 ranuras: ranura = día desde epoch % 7')),
+                ('ultimo_dia', models.BigIntegerField()),
+                ('total', models.FloatField(default=0)),
+                ('puntuacion', models.FloatField(default=0, help_text='Puntuación con decaimiento, válida en puntuacion_fecha')),
+                ('puntuacion_fecha', models.DateTimeField()),
+                ('pelicula', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tendencia', to='movies.movie')),
+            ],
+            options={
+                'verbose_name': 'Tendencia de película',
+                'verbose_name_plural': 'Tendencias de películas',
+            },
+        ),
+    ]
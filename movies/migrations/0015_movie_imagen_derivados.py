@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0014_tendenciapelicula'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='imagen_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones reducidas del póster por formato, generadas por movies.posters'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_movie_imagen_derivados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='imagen_alto',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='imagen_lqip',
+            field=models.TextField(blank=True, editable=False, help_text='Miniatura borrosa del póster como data URI, para mostrar mientras carga el original'),
+        ),
+    ]
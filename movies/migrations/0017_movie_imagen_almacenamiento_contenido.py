@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:12
+
+import movies.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0016_movie_imagen_dimensiones_lqip'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movie',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=movies.almacenamiento.almacenamiento_posters, upload_to='posters/'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_movie_imagen_almacenamiento_contenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='enlace_codigo',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, help_text='Código HTTP de la última verificación', null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='enlace_estado',
+            field=models.CharField(blank=True, choices=[('', 'Sin verificar'), ('ok', 'Disponible'), ('roto', 'Roto')], default='', editable=False, max_length=4),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='enlace_fallos',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Verificaciones fallidas consecutivas'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='enlace_latencia_ms',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='enlace_tamaño',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Bytes del video según el servidor', null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='enlace_verificado',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
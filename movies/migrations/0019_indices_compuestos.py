@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 01:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0018_movie_estado_enlace'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['usuario', '-fecha_agregado'], name='favorito_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['fecha_agregado', 'id'], name='pelicula_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-calificacion_media', '-calificacion_conteo'], name='pelicula_calificacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['usuario', '-fecha_creacion'], name='calificacion_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['pelicula', 'puntuacion'], name='calificacion_pelicula_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchhistory',
+            index=models.Index(fields=['usuario', '-ultima_visualizacion'], name='historial_usuario_fecha_idx'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import Case, Count, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 
+from .almacenamiento import almacenamiento_posters
+
 class Genre(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     
@@ -14,12 +18,37 @@ class Genre(models.Model):
 
 
 class Movie(models.Model):
+    ENLACE_SIN_VERIFICAR = ''
+    ENLACE_OK = 'ok'
+    ENLACE_ROTO = 'roto'
+    ESTADOS_ENLACE = [(ENLACE_SIN_VERIFICAR, 'Sin verificar'), (ENLACE_OK, 'Disponible'), (ENLACE_ROTO, 'Roto')]
+    
     titulo = models.CharField(max_length=200)
     descripcion = models.TextField()
     duracion = models.IntegerField(help_text="Duración en segundos (ej: 5430 = 1:30:30)")
     año_publicacion = models.IntegerField(null=True, blank=True, help_text="Año de publicación de la película")
-    imagen = models.ImageField(upload_to='posters/', blank=True, null=True)
+    imagen = models.ImageField(upload_to='posters/', storage=almacenamiento_posters, blank=True, null=True)
+    imagen_derivados = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Versiones reducidas del póster por formato, generadas por movies.posters"
+    )
+    imagen_ancho = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    imagen_alto = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    imagen_lqip = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Miniatura borrosa del póster como data URI, para mostrar mientras carga el original"
+    )
     enlace_stream = models.URLField(max_length=500)
+    # Resultado de la última verificación de `enlace_stream` (movies.enlaces)
+    enlace_estado = models.CharField(max_length=4, choices=ESTADOS_ENLACE, blank=True, default=ENLACE_SIN_VERIFICAR, editable=False)
+    enlace_codigo = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, help_text="Código HTTP de la última verificación")
+    enlace_latencia_ms = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    enlace_tamaño = models.BigIntegerField(null=True, blank=True, editable=False, help_text="Bytes del video según el servidor")
+    enlace_fallos = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Verificaciones fallidas consecutivas")
+    enlace_verificado = models.DateTimeField(null=True, blank=True, editable=False)
     generos = models.ManyToManyField(
         Genre,
         related_name='peliculas',
@@ -28,14 +57,58 @@ class Movie(models.Model):
     )
     fecha_agregado = models.DateTimeField(auto_now_add=True)
     
+    # Agregados de calificaciones mantenidos por las señales de Rating
+    calificacion_suma = models.PositiveIntegerField(default=0, editable=False)
+    calificacion_conteo = models.PositiveIntegerField(default=0, editable=False)
+    calificacion_media = models.FloatField(default=0, editable=False)
+    estrellas_1 = models.PositiveIntegerField(default=0, editable=False)
+    estrellas_2 = models.PositiveIntegerField(default=0, editable=False)
+    estrellas_3 = models.PositiveIntegerField(default=0, editable=False)
+    estrellas_4 = models.PositiveIntegerField(default=0, editable=False)
+    estrellas_5 = models.PositiveIntegerField(default=0, editable=False)
+    
     class Meta:
         verbose_name = "Película"
         verbose_name_plural = "Películas"
         ordering = ['-fecha_agregado']
+        indexes = [
+            # Orden por defecto y desempate del catálogo (fecha, id)
+            models.Index(fields=['fecha_agregado', 'id'], name='pelicula_fecha_idx'),
+            # Destacadas: mejor calificadas sin ordenar todo el catálogo
+            models.Index(fields=['-calificacion_media', '-calificacion_conteo'], name='pelicula_calificacion_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Póster persistido, para regenerar derivados solo si cambia
+        instance._imagen_original = instance.__dict__.get('imagen')
+        # Duración persistida: de ella dependen el historial y las estadísticas
+        instance._duracion_original = instance.__dict__.get('duracion')
+        # Año persistido: entra en la similitud de las relacionadas
+        instance._año_original = instance.__dict__.get('año_publicacion')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Después de las señales post_save, que comparan con el valor anterior
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'duracion' in update_fields:
+            self._duracion_original = self.duracion
+        if update_fields is None or 'año_publicacion' in update_fields:
+            self._año_original = self.año_publicacion
+    
+    def duracion_cambiada(self):
+        """Si la duración difiere de la guardada (siempre True si la instancia no se leyó de la base)."""
+        return getattr(self, '_duracion_original', None) != self.duracion
+    
+    def año_cambiado(self):
+        # El año admite None: sin valor original se considera cambiado
+        return not hasattr(self, '_año_original') or self._año_original != self.año_publicacion
+    
     def duracion_minutos(self):
         return self.duracion // 60
     
@@ -50,14 +123,59 @@ class Movie(models.Model):
             return f"{minutos}:{segundos:02d}"
     
     def calificacion_promedio(self):
-        calificaciones = self.calificaciones.all()  # type: ignore[attr-defined]
-        if calificaciones.exists():
-            suma = sum(c.puntuacion for c in calificaciones)
-            return round(suma / calificaciones.count(), 1)
+        if self.calificacion_conteo:
+            return round(self.calificacion_media, 1)
         return 0
     
     def total_calificaciones(self):
-        return self.calificaciones.count()  # type: ignore[attr-defined]
+        return self.calificacion_conteo
+    
+    def distribucion_calificaciones(self):
+        """Lista de (estrellas, cantidad, porcentaje) de 5 a 1 estrellas."""
+        distribucion = []
+        for estrellas in range(5, 0, -1):
+            cantidad = getattr(self, f'estrellas_{estrellas}')
+            porcentaje = round(cantidad * 100 / self.calificacion_conteo, 1) if self.calificacion_conteo else 0
+            distribucion.append((estrellas, cantidad, porcentaje))
+        return distribucion
+    
+    @classmethod
+    def aplicar_calificacion(cls, pelicula_id, puntuacion, delta):
+        """Suma (delta=1) o resta (delta=-1) una calificación a los agregados en un solo UPDATE."""
+        suma = F('calificacion_suma') + puntuacion * delta
+        conteo = F('calificacion_conteo') + delta
+        cls.objects.filter(pk=pelicula_id).update(
+            calificacion_suma=suma,
+            calificacion_conteo=conteo,
+            calificacion_media=Case(
+                When(calificacion_conteo__lte=-delta, then=Value(0.0)),
+                default=ExpressionWrapper(suma * 1.0 / conteo, output_field=models.FloatField()),
+            ),
+            **{f'estrellas_{puntuacion}': F(f'estrellas_{puntuacion}') + delta},
+        )
+    
+    @classmethod
+    def recalcular_calificaciones(cls, queryset=None):
+        """Reconstruye desde cero los agregados de calificaciones. Devuelve las películas actualizadas."""
+        queryset = queryset if queryset is not None else cls.objects.all()
+        conteos = {
+            f'estrellas_{estrellas}': Count('calificaciones', filter=Q(calificaciones__puntuacion=estrellas))
+            for estrellas in range(1, 6)
+        }
+        peliculas = list(queryset.order_by().annotate(
+            suma=Coalesce(Sum('calificaciones__puntuacion'), 0),
+            conteo=Count('calificaciones'),
+            **{f'_{campo}': expresion for campo, expresion in conteos.items()},
+        ))
+        for pelicula in peliculas:
+            pelicula.calificacion_suma = pelicula.suma
+            pelicula.calificacion_conteo = pelicula.conteo
+            pelicula.calificacion_media = pelicula.suma / pelicula.conteo if pelicula.conteo else 0
+            for campo in conteos:
+                setattr(pelicula, campo, getattr(pelicula, f'_{campo}'))
+        campos = ['calificacion_suma', 'calificacion_conteo', 'calificacion_media', *conteos]
+        cls.objects.bulk_update(peliculas, campos, batch_size=500)
+        return len(peliculas)
 
 
 class Favorite(models.Model):
@@ -78,11 +196,17 @@ class Favorite(models.Model):
         verbose_name_plural = "Favoritos"
         unique_together = ['usuario', 'pelicula']
         ordering = ['-fecha_agregado']
+        indexes = [models.Index(fields=['usuario', '-fecha_agregado'], name='favorito_usuario_fecha_idx')]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.pelicula.titulo}"
 
 
+# Rango de progreso (%) en el que una película aparece en "Continuar viendo"
+CONTINUAR_MIN = 5
+CONTINUAR_MAX = 95
+
+
 class WatchHistory(models.Model):
     usuario = models.ForeignKey(
         User, 
@@ -100,22 +224,55 @@ class WatchHistory(models.Model):
     )
     ultima_visualizacion = models.DateTimeField(auto_now=True)
     completado = models.BooleanField(default=False)
+    porcentaje = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Progreso en porcentaje, calculado al guardar el timestamp"
+    )
     
     class Meta:
         verbose_name = "Historial de Visualización"
         verbose_name_plural = "Historiales de Visualización"
         unique_together = ['usuario', 'pelicula']
         ordering = ['-ultima_visualizacion']
+        indexes = [
+            models.Index(fields=['usuario', '-ultima_visualizacion'], name='historial_usuario_fecha_idx'),
+            models.Index(
+                fields=['usuario', '-ultima_visualizacion'],
+                condition=Q(completado=False, porcentaje__gte=CONTINUAR_MIN, porcentaje__lt=CONTINUAR_MAX),
+                name='historial_continuar_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} viendo {self.pelicula.titulo}"
     
-    def progreso_porcentaje(self):
-        if self.pelicula.duracion > 0:
-            porcentaje = (self.timestamp / self.pelicula.duracion) * 100
-            return round(porcentaje, 1)
+    def save(self, *args, **kwargs):
+        self.porcentaje = self.calcular_porcentaje(self.timestamp, self.pelicula.duracion)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'timestamp' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'porcentaje'}
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def calcular_porcentaje(timestamp, duracion):
+        if duracion > 0:
+            return (timestamp / duracion) * 100
         return 0
     
+    @classmethod
+    def continuar_viendo(cls, usuario, limite=6):
+        """Historiales a medio ver del usuario, servidos por el índice parcial historial_continuar_idx."""
+        return cls.objects.filter(
+            usuario=usuario,
+            completado=False,
+            porcentaje__gte=CONTINUAR_MIN,
+            porcentaje__lt=CONTINUAR_MAX,
+        ).select_related('pelicula').order_by('-ultima_visualizacion')[:limite]
+    
+    def progreso_porcentaje(self):
+        return round(self.porcentaje, 1)
+    
 class Rating(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calificaciones')
     pelicula = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='calificaciones')
@@ -139,6 +296,169 @@ class Rating(models.Model):
         verbose_name_plural = "Calificaciones"
         unique_together = ['usuario', 'pelicula']
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['usuario', '-fecha_creacion'], name='calificacion_usuario_fecha_idx'),
+            # Promedios por película (y por género) sin leer la fila de cada calificación
+            models.Index(fields=['pelicula', 'puntuacion'], name='calificacion_pelicula_idx'),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.pelicula.titulo}: {self.puntuacion}⭐"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._guardar_estado_original()
+        return instance
+    
+    def _guardar_estado_original(self):
+        # Valores persistidos, para que las señales apliquen solo la diferencia
+        self._puntuacion_original = self.__dict__.get('puntuacion')
+        self._pelicula_id_original = self.__dict__.get('pelicula_id')
+
+
+class Recomendacion(models.Model):
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recomendacion')
+    peliculas = models.JSONField(default=list, help_text="IDs de películas recomendadas, de mejor a peor")
+    fecha_calculo = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Recomendación"
+        verbose_name_plural = "Recomendaciones"
+    
+    def __str__(self):
+        return f"Recomendaciones de {self.usuario.username}"
+
+
+class PeliculaRelacionada(models.Model):
+    pelicula = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='relacionadas')
+    relacionada = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    posicion = models.PositiveSmallIntegerField()
+    puntuacion = models.FloatField(help_text="Similitud combinada: géneros, calificaciones y año")
+    
+    class Meta:
+        verbose_name = "Película relacionada"
+        verbose_name_plural = "Películas relacionadas"
+        unique_together = ['pelicula', 'posicion']
+        ordering = ['pelicula', 'posicion']
+    
+    def __str__(self):
+        return f"{self.pelicula_id} → {self.relacionada_id} (#{self.posicion})"
+
+
+class EstadisticasUsuario(models.Model):
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='estadisticas')
+    segundos_vistos = models.PositiveBigIntegerField(default=0, help_text="Suma de la duración de las películas del historial")
+    completadas = models.PositiveIntegerField(default=0)
+    en_progreso = models.PositiveIntegerField(default=0)
+    vistas_por_genero = models.JSONField(default=dict, help_text="{genero_id: películas vistas de ese género}")
+    genero_mas_visto = models.ForeignKey(Genre, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    ultimas_peliculas = models.JSONField(default=list, help_text="IDs de las últimas películas vistas, de la más reciente a la más antigua")
+    fecha_calculo = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Estadísticas de usuario"
+        verbose_name_plural = "Estadísticas de usuarios"
+    
+    def __str__(self):
+        return f"Estadísticas de {self.usuario.username}"
+    
+    def horas_vistas(self):
+        return self.segundos_vistos // 3600
+
+
+class EventoVisualizacion(models.Model):
+    """Latido del reproductor. Registro de solo inserción; se agrega por hora en `ResumenHorario*`."""
+    INICIO = 1
+    PROGRESO = 2
+    FIN = 3
+    TIPOS = [(INICIO, 'Inicio de sesión'), (PROGRESO, 'Progreso'), (FIN, 'Completada')]
+    
+    id = models.BigAutoField(primary_key=True)
+    fecha = models.DateTimeField()
+    # Sin restricciones de clave foránea: borrar un usuario o una película no recorre el registro
+    usuario = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    pelicula = models.ForeignKey(Movie, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    tipo = models.PositiveSmallIntegerField(choices=TIPOS)
+    posicion = models.PositiveIntegerField(help_text="Segundo de la película en el latido")
+    porcentaje = models.PositiveSmallIntegerField()
+    segundos = models.PositiveIntegerField(default=0, help_text="Segundos vistos desde el latido anterior de la sesión")
+    
+    class Meta:
+        verbose_name = "Evento de visualización"
+        verbose_name_plural = "Eventos de visualización"
+        indexes = [models.Index(fields=['fecha'], name='evento_fecha_idx')]
+    
+    def __str__(self):
+        return f"{self.usuario_id} · {self.pelicula_id} · {self.get_tipo_display()} ({self.fecha:%Y-%m-%d %H:%M})"
+
+
+class ResumenHorarioPelicula(models.Model):
+    hora = models.DateTimeField()
+    pelicula = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='resumenes_horarios')
+    vistas = models.PositiveIntegerField(default=0, help_text="Sesiones de visualización iniciadas")
+    completadas = models.PositiveIntegerField(default=0)
+    segundos_vistos = models.PositiveBigIntegerField(default=0)
+    curva = models.JSONField(default=list, help_text="Latidos por decil de la película: curva de abandono")
+    
+    class Meta:
+        verbose_name = "Resumen horario por película"
+        verbose_name_plural = "Resúmenes horarios por película"
+        unique_together = ['hora', 'pelicula']
+        indexes = [models.Index(fields=['pelicula', 'hora'], name='resumen_pelicula_hora_idx')]
+    
+    def __str__(self):
+        return f"{self.pelicula_id} @ {self.hora:%Y-%m-%d %H:00}"
+
+
+class ResumenHorarioGenero(models.Model):
+    hora = models.DateTimeField()
+    genero = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='resumenes_horarios')
+    vistas = models.PositiveIntegerField(default=0)
+    completadas = models.PositiveIntegerField(default=0)
+    segundos_vistos = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Resumen horario por género"
+        verbose_name_plural = "Resúmenes horarios por género"
+        unique_together = ['hora', 'genero']
+    
+    def __str__(self):
+        return f"{self.genero_id} @ {self.hora:%Y-%m-%d %H:00}"
+
+
+class MarcaAgregacion(models.Model):
+    """Último evento ya agregado por cada etapa de agregación."""
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    fecha = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Marca de agregación"
+        verbose_name_plural = "Marcas de agregación"
+    
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_id}"
+
+
+class TendenciaPelicula(models.Model):
+    """
+    Contadores de popularidad de una película: anillos de 24 horas y 7 días,
+    total histórico y una puntuación con decaimiento exponencial. Los mantiene
+    `movies.tendencias`.
+    """
+    pelicula = models.OneToOneField(Movie, on_delete=models.CASCADE, related_name='tendencia')
+    horas = models.JSONField(default=list, help_text="Anillo de 24 ranuras: ranura = hora desde epoch % 24")
+    ultima_hora = models.BigIntegerField(help_text="Hora (desde epoch) de la ranura más reciente del anillo")
+    dias = models.JSONField(default=list, help_text="Anillo de 7 ranuras: ranura = día desde epoch % 7")
+    ultimo_dia = models.BigIntegerField()
+    total = models.FloatField(default=0)
+    puntuacion = models.FloatField(default=0, help_text="Puntuación con decaimiento, válida en puntuacion_fecha")
+    puntuacion_fecha = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Tendencia de película"
+        verbose_name_plural = "Tendencias de películas"
+    
+    def __str__(self):
+        return f"Tendencia de {self.pelicula_id}"
@@ -0,0 +1,73 @@
+"""
+Paginación por cursor (keyset).
+
+En lugar de OFFSET, cada página continúa a partir de los valores de orden de
+la última fila mostrada: `WHERE (a, b) > (:a, :b)` expresado como una
+condición lexicográfica, que un índice sobre esos campos resuelve como un
+rango. El coste de la página N es el mismo que el de la primera.
+
+El cursor va firmado, así que un cliente no puede inyectar valores
+arbitrarios en la condición.
+"""
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+SAL = 'movies.paginacion'
+
+
+def codificar_cursor(valores):
+    return signing.dumps(
+        [valor.isoformat() if isinstance(valor, datetime) else valor for valor in valores],
+        salt=SAL,
+        compress=True,
+    )
+
+
+def decodificar_cursor(cursor, orden):
+    """Valores del cursor; ValueError si la firma no es válida o no corresponde al orden."""
+    try:
+        valores = signing.loads(cursor, salt=SAL)
+    except signing.BadSignature as error:
+        raise ValueError('Cursor inválido') from error
+    if not isinstance(valores, list) or len(valores) != len(orden):
+        raise ValueError('Cursor inválido')
+    return valores
+
+
+def paginar(queryset, orden, cursor=None, tamaño=20):
+    """
+    Página de `queryset` ordenada por `orden` (p. ej. ``('-fecha_agregado', '-id')``,
+    el último campo debe ser único) que empieza después de `cursor`.
+    Devuelve (objetos, cursor_siguiente o None).
+    """
+    queryset = queryset.order_by(*orden)
+    if cursor:
+        queryset = queryset.filter(_despues_de(orden, decodificar_cursor(cursor, orden)))
+
+    objetos = list(queryset[:tamaño + 1])
+    if len(objetos) <= tamaño:
+        return objetos, None
+
+    objetos = objetos[:tamaño]
+    ultimo = objetos[-1]
+    return objetos, codificar_cursor([_valor(ultimo, campo.lstrip('-')) for campo in orden])
+
+
+def _despues_de(orden, valores):
+    # (a > x) OR (a = x AND b > y) OR ... respetando la dirección de cada campo
+    condicion, iguales = None, Q()
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        paso = iguales & Q(**{f'{nombre}__{operador}': valor})
+        condicion = paso if condicion is None else condicion | paso
+        iguales &= Q(**{nombre: valor})
+    return condicion
+
+
+def _valor(objeto, campo):
+    for parte in campo.split('__'):
+        objeto = getattr(objeto, parte)
+    return objeto
@@ -0,0 +1,226 @@
+"""
+Entorno aislado para medir las consultas SQL de las vistas.
+
+`entorno_aislado` crea una base de datos de prueba temporal (nunca toca la
+real) y desactiva lo que oculta o desvía consultas: la caché (DummyCache, así
+se mide el peor caso), las réplicas y la cola de escritura, de modo que todo
+corre en el hilo de la petición. `sembrar` la llena con un catálogo y usuarios
+con actividad, `peticiones` arma una petición por cada URL de movies.urls con
+argumentos tomados de esos datos y `recorrer` las ejecuta como usuario y
+como anónimo, con las consultas de cada una y la línea del proyecto que
+originó cada consulta.
+
+Lo usan los comandos `verificar_planes` y `verificar_consultas`.
+"""
+import random
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from . import urls
+from .escritura import escritor
+from .models import Favorite, Genre, Movie, Rating, WatchHistory
+
+# Comandos que reconstruyen lo derivado (agregados, búsqueda, relacionadas...) tras sembrar
+COMANDOS_DERIVADOS = [
+    'recalcular_calificaciones',
+    'reconstruir_indice_busqueda',
+    'recalcular_relacionadas',
+    'precalcular_recomendaciones',
+    'recalcular_estadisticas_usuario',
+    'reconstruir_tendencias',
+]
+
+# Vistas que solo aceptan POST, con los datos que se les envían
+DATOS_POST = {
+    'toggle_favorite': {},
+    'update_progress': {'timestamp': 600},
+    'rate_movie': {'puntuacion': 4},
+}
+
+
+@dataclass
+class Semilla:
+    """Objetos de referencia de los datos sembrados."""
+    usuario: User
+    pelicula: Movie
+    genero: Genre
+
+
+@dataclass
+class Peticion:
+    nombre: str
+    url: str
+    metodo: str = 'GET'
+    datos: dict = field(default_factory=dict)
+
+
+@dataclass
+class Consulta:
+    sql: str
+    params: tuple
+    traza: list
+
+
+@contextmanager
+def entorno_aislado():
+    nombre_original = connection.settings_dict['NAME']
+    activo = escritor.activo
+    setup_test_environment()
+    try:
+        with override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            REPLICAS_LECTURA={'ALIAS': []},
+        ):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            escritor.activo = False
+            try:
+                yield
+            finally:
+                escritor.activo = activo
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+    finally:
+        teardown_test_environment()
+
+
+def sembrar(peliculas=300, usuarios=50, generos=12, por_usuario=20, semilla=0):
+    """Catálogo y usuarios con favoritos, historial y calificaciones. Devuelve la `Semilla`."""
+    azar = random.Random(semilla)
+    Genre.objects.bulk_create(Genre(nombre=f'Género {numero}') for numero in range(generos))
+    Movie.objects.bulk_create(
+        Movie(
+            titulo=f'Película {numero}',
+            descripcion=f'Descripción de la película {numero}',
+            duracion=azar.randrange(3600, 9000),
+            año_publicacion=azar.randrange(1950, 2026),
+            enlace_stream=f'https://cdn.example.com/videos/{numero}.mp4',
+        )
+        for numero in range(peliculas)
+    )
+    genero_ids = list(Genre.objects.values_list('pk', flat=True))
+    duraciones = dict(Movie.objects.values_list('pk', 'duracion'))
+    pelicula_ids = list(duraciones)
+    Movie.generos.through.objects.bulk_create(
+        Movie.generos.through(movie_id=pelicula_id, genre_id=genero_id)
+        for pelicula_id in pelicula_ids
+        for genero_id in azar.sample(genero_ids, azar.randint(1, 3))
+    )
+
+    clave = make_password('vivastream')
+    User.objects.bulk_create(
+        User(username=f'usuario{numero}', email=f'usuario{numero}@example.com', password=clave)
+        for numero in range(usuarios)
+    )
+    favoritos, historial, calificaciones = [], [], []
+    for usuario_id in User.objects.values_list('pk', flat=True):
+        for pelicula_id in azar.sample(pelicula_ids, por_usuario):
+            favoritos.append(Favorite(usuario_id=usuario_id, pelicula_id=pelicula_id))
+        for pelicula_id in azar.sample(pelicula_ids, por_usuario):
+            timestamp = azar.randrange(duraciones[pelicula_id])
+            historial.append(WatchHistory(
+                usuario_id=usuario_id,
+                pelicula_id=pelicula_id,
+                timestamp=timestamp,
+                porcentaje=WatchHistory.calcular_porcentaje(timestamp, duraciones[pelicula_id]),
+                completado=azar.random() < 0.3,
+            ))
+        for pelicula_id in azar.sample(pelicula_ids, por_usuario):
+            calificaciones.append(Rating(usuario_id=usuario_id, pelicula_id=pelicula_id, puntuacion=azar.randint(1, 5)))
+    Favorite.objects.bulk_create(favoritos)
+    WatchHistory.objects.bulk_create(historial)
+    Rating.objects.bulk_create(calificaciones)
+
+    for comando in COMANDOS_DERIVADOS:
+        call_command(comando, stdout=StringIO(), stderr=StringIO())
+
+    return Semilla(
+        usuario=User.objects.earliest('pk'),
+        pelicula=Movie.objects.earliest('pk'),
+        genero=Genre.objects.earliest('pk'),
+    )
+
+
+def peticiones(semilla):
+    """Una petición por cada URL de movies.urls (GET, o POST si está en `DATOS_POST`), con los argumentos tomados de `semilla`."""
+    valores = {
+        'movie_id': semilla.pelicula.pk,
+        'genero_id': semilla.genero.pk,
+        'uidb64': urlsafe_base64_encode(force_bytes(semilla.usuario.pk)),
+        'token': default_token_generator.make_token(semilla.usuario),
+    }
+    resultado = []
+    for patron in urls.urlpatterns:
+        argumentos = {nombre: valores[nombre] for nombre in patron.pattern.converters}
+        url = reverse(f'{urls.app_name}:{patron.name}', kwargs=argumentos)
+        if patron.name in DATOS_POST:
+            resultado.append(Peticion(patron.name, url, 'POST', DATOS_POST[patron.name]))
+        else:
+            resultado.append(Peticion(patron.name, url))
+    return resultado
+
+
+def recorrer(semilla):
+    """
+    Ejecuta cada petición de `peticiones` como el usuario de `semilla` y como
+    anónimo. Genera (peticion, autenticado, respuesta, consultas).
+    """
+    for autenticado in (True, False):
+        for peticion in peticiones(semilla):
+            # Cliente nuevo en cada una: alguna vista abre o cierra la sesión (activate, logout)
+            cliente = Client()
+            if autenticado:
+                cliente.force_login(semilla.usuario)
+            respuesta, consultas = capturar(cliente, peticion)
+            yield peticion, autenticado, respuesta, consultas
+
+
+def capturar(cliente, peticion):
+    """(respuesta, [Consulta, ...]) de ejecutar `peticion` con `cliente`."""
+    consultas = []
+
+    def registrar(execute, sql, params, many, context):
+        consultas.append(Consulta(sql, tuple(params or ()), _traza()))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(registrar):
+        respuesta = getattr(cliente, peticion.metodo.lower())(peticion.url, peticion.datos)
+    return respuesta, consultas
+
+
+def _traza():
+    """
+    Marcos del proyecto (sin Django ni el código que mide) que llevaron a la
+    consulta, más la línea de plantilla si la originó un template.
+    """
+    raiz = str(Path(settings.BASE_DIR).resolve())
+    marcos = []
+    con_plantilla = False
+    # Desde quien ejecutó la consulta (sin _traza ni registrar) hasta `capturar`
+    marco = sys._getframe(2)
+    while marco is not None and marco.f_code.co_filename != __file__:
+        codigo = marco.f_code
+        if codigo.co_name == 'render_annotated' and not con_plantilla:
+            # El nodo de plantilla más interno que se estaba renderizando
+            nodo = marco.f_locals.get('self')
+            origen, token = getattr(nodo, 'origin', None), getattr(nodo, 'token', None)
+            if origen is not None and token is not None:
+                marcos.append(f'{origen.template_name}:{token.lineno} en {{% {token.contents[:60]} %}}')
+                con_plantilla = True
+        elif codigo.co_filename.startswith(raiz):
+            marcos.append(f'{Path(codigo.co_filename).relative_to(raiz)}:{marco.f_lineno} en {codigo.co_name}')
+        marco = marco.f_back
+    return marcos[::-1]
@@ -0,0 +1,116 @@
+"""
+Derivados de los pósters en tamaños y formatos modernos.
+
+De cada póster se generan versiones de `ANCHOS` píxeles (sin ampliar) en WebP
+y, si Pillow lo soporta, AVIF. Se guardan bajo `posters/derivados/<hash>/`,
+donde el hash es el del contenido del original: subir de nuevo la misma imagen
+reutiliza los archivos y una imagen distinta nunca pisa una URL ya cacheada.
+La lista resultante queda en `Movie.imagen_derivados`, de donde la etiqueta
+`{% poster %}` arma el `srcset` sin tocar el almacenamiento.
+
+En la misma pasada se guardan el ancho y alto del original y una versión de
+`ANCHO_LQIP` píxeles como data URI: la etiqueta la usa de fondo del `<img>`
+y le fija las dimensiones, así la página no salta mientras cargan los pósters.
+"""
+import base64
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import cache
+from .almacenamiento import hash_contenido
+from .models import Movie
+
+logger = logging.getLogger('movies')
+
+ANCHOS = (160, 342, 500, 780, 1280)
+# Orden de preferencia en <picture>: el navegador toma la primera fuente que soporte
+FORMATOS = {
+    'avif': {'quality': 50},
+    'webp': {'quality': 80, 'method': 6},
+}
+TIPOS_MIME = {'avif': 'image/avif', 'webp': 'image/webp'}
+DIRECTORIO = 'posters/derivados'
+ANCHO_LQIP = 20
+CALIDAD_LQIP = 30
+
+
+def formatos_disponibles():
+    return [formato for formato in FORMATOS if features.check(formato)]
+
+
+def generar(pelicula, forzar=False):
+    """
+    Genera (o reutiliza) los derivados, dimensiones y placeholder del póster de
+    `pelicula` y los guarda en la película. Devuelve los derivados. No invalida
+    la caché de Movie: quien la llama lo hace una vez por lote.
+    """
+    campos = {'imagen_derivados': {}, 'imagen_ancho': None, 'imagen_alto': None, 'imagen_lqip': ''}
+    if pelicula.imagen:
+        with pelicula.imagen.open('rb') as archivo:
+            huella = hash_contenido(archivo)[:32]
+            if not forzar and pelicula.imagen_derivados.get('hash') == huella and pelicula.imagen_lqip:
+                return pelicula.imagen_derivados
+            campos = _generar_desde(archivo, huella)
+
+    Movie.objects.filter(pk=pelicula.pk).update(**campos)
+    for campo, valor in campos.items():
+        setattr(pelicula, campo, valor)
+    return pelicula.imagen_derivados
+
+
+def _generar_desde(archivo, huella):
+    with Image.open(archivo) as original:
+        imagen = ImageOps.exif_transpose(original)
+        imagen = imagen.convert('RGBA' if imagen.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        ancho_original = imagen.width
+    lqip = _lqip(imagen)
+
+    anchos = [ancho for ancho in ANCHOS if ancho < ancho_original] or [ancho_original]
+    if ancho_original < ANCHOS[-1] and ancho_original not in anchos:
+        anchos.append(ancho_original)
+
+    fuentes = {}
+    for formato in formatos_disponibles():
+        fuentes[formato] = []
+        for ancho in anchos:
+            ruta = f'{DIRECTORIO}/{huella}/{ancho}.{formato}'
+            if not default_storage.exists(ruta):
+                reducida = imagen if ancho == imagen.width else imagen.resize(
+                    (ancho, round(imagen.height * ancho / imagen.width)),
+                    Image.Resampling.LANCZOS,
+                )
+                contenido = BytesIO()
+                reducida.save(contenido, format=formato.upper(), **FORMATOS[formato])
+                ruta = default_storage.save(ruta, ContentFile(contenido.getvalue()))
+            fuentes[formato].append([ancho, ruta])
+
+    return {
+        'imagen_derivados': {'hash': huella, 'fuentes': fuentes},
+        'imagen_ancho': imagen.width,
+        'imagen_alto': imagen.height,
+        'imagen_lqip': lqip,
+    }
+
+
+def _lqip(imagen):
+    alto = max(round(imagen.height * ANCHO_LQIP / imagen.width), 1)
+    contenido = BytesIO()
+    imagen.resize((ANCHO_LQIP, alto), Image.Resampling.BILINEAR).save(contenido, format='WEBP', quality=CALIDAD_LQIP)
+    return 'data:image/webp;base64,' + base64.b64encode(contenido.getvalue()).decode('ascii')
+
+
+def generar_tras_guardar(pelicula_id):
+    """Para `transaction.on_commit`: un póster ilegible no debe romper el guardado de la película."""
+    pelicula = Movie.objects.filter(pk=pelicula_id).first()
+    if pelicula is None:
+        return
+    try:
+        generar(pelicula)
+    except Exception:
+        logger.exception(f'Error al generar los derivados del póster de la película {pelicula_id}')
+    else:
+        cache.invalidar(Movie)
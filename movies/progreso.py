@@ -0,0 +1,331 @@
+"""
+Buffer de escritura diferida para el progreso de reproducción.
+
+Los reproductores envían un latido cada pocos segundos. En lugar de escribir
+una fila por latido, el buffer guarda en memoria solo el último timestamp por
+(usuario, película) y los vuelca con un único upsert cada cierto intervalo o
+al superar un número de entradas pendientes. El buffer es por proceso: las
+lecturas que necesiten el valor más reciente deben pasar por `obtener` o
+`vaciar(usuario_id=...)`.
+
+Cada latido además se anota como `EventoVisualizacion` (inicio de sesión,
+progreso o completada, con los segundos vistos desde el latido anterior) y
+los eventos se insertan en lote en el mismo volcado. Las sesiones se detectan
+con el último latido visto por este proceso: si un reproductor alterna entre
+procesos, puede contarse una sesión de más.
+"""
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .escritura import escritor
+from .models import EventoVisualizacion, Movie, WatchHistory
+
+logger = logging.getLogger('movies')
+
+PORCENTAJE_COMPLETADO = 90
+# Segundos sin latidos tras los que el siguiente abre una sesión nueva
+PAUSA_SESION = 300
+# Duraciones en memoria: se descartan al subir esta generación (un cambio de
+# duración en cualquier proceso) o, con una caché no compartida, tras el TTL
+CLAVE_DURACIONES = 'progreso:duraciones:gen'
+TTL_DURACIONES = 300
+
+# Enviada tras cada volcado con `usuarios_ids` (set), `nuevos` (historiales creados),
+# `cambios` (un CambioHistorial por historial escrito) y `eventos` (los
+# EventoVisualizacion insertados)
+progreso_volcado = Signal()
+
+
+@dataclass
+class ProgresoPendiente:
+    timestamp: int
+    porcentaje: float
+    completado: bool
+    ultima_visualizacion: datetime
+
+
+@dataclass
+class CambioHistorial:
+    usuario_id: int
+    pelicula_id: int
+    completado: bool
+    # None si el historial no existía antes del volcado
+    completado_anterior: bool | None
+    ultima_visualizacion: datetime
+
+
+@dataclass
+class Latido:
+    fecha: datetime
+    posicion: int
+    porcentaje: float
+
+
+def clasificar_latido(anterior, fecha, posicion, porcentaje):
+    """(tipo, segundos vistos) de un latido según el latido anterior de la misma sesión."""
+    if anterior is None or (fecha - anterior.fecha).total_seconds() > PAUSA_SESION:
+        return EventoVisualizacion.INICIO, 0
+    # Solo cuenta lo reproducido: un salto hacia adelante no suma más que el tiempo transcurrido
+    transcurrido = (fecha - anterior.fecha).total_seconds()
+    segundos = int(max(0, min(posicion - anterior.posicion, transcurrido)))
+    if anterior.porcentaje < PORCENTAJE_COMPLETADO <= porcentaje:
+        return EventoVisualizacion.FIN, segundos
+    return EventoVisualizacion.PROGRESO, segundos
+
+
+class BufferProgreso:
+    def __init__(self, intervalo=5.0, max_pendientes=500):
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        self._pendientes = {}
+        self._eventos = []
+        self._latidos = {}
+        self._lock = threading.Lock()
+        self._vaciado_lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def registrar(self, usuario_id, pelicula_id, timestamp, duracion):
+        porcentaje = WatchHistory.calcular_porcentaje(timestamp, duracion)
+        ahora = timezone.now()
+        clave = (usuario_id, pelicula_id)
+        with self._lock:
+            self._pendientes[clave] = ProgresoPendiente(
+                timestamp=timestamp,
+                porcentaje=porcentaje,
+                completado=porcentaje >= PORCENTAJE_COMPLETADO,
+                ultima_visualizacion=ahora,
+            )
+            tipo, segundos = clasificar_latido(self._latidos.get(clave), ahora, timestamp, porcentaje)
+            self._latidos[clave] = Latido(fecha=ahora, posicion=timestamp, porcentaje=porcentaje)
+            self._eventos.append(EventoVisualizacion(
+                fecha=ahora,
+                usuario_id=usuario_id,
+                pelicula_id=pelicula_id,
+                tipo=tipo,
+                posicion=max(timestamp, 0),
+                porcentaje=min(max(round(porcentaje), 0), 100),
+                segundos=segundos,
+            ))
+            lleno = len(self._pendientes) >= self.max_pendientes or len(self._eventos) >= self.max_pendientes
+
+        self._iniciar_hilo()
+        if lleno:
+            self._despertar.set()
+
+    def obtener(self, usuario_id, pelicula_id):
+        with self._lock:
+            return self._pendientes.get((usuario_id, pelicula_id))
+
+    def vaciar(self, usuario_id=None):
+        """
+        Escribe las entradas pendientes (todas o solo las de un usuario) y,
+        en el volcado completo, los eventos. Devuelve cuántos progresos escribió.
+        """
+        # Se toma el lote con el turno de volcado ya adquirido: un lote más
+        # viejo no puede escribirse después de uno más nuevo de la misma clave
+        with self._vaciado_lock:
+            with self._lock:
+                if usuario_id is None:
+                    lote, self._pendientes = self._pendientes, {}
+                    eventos, self._eventos = self._eventos, []
+                    self._olvidar_latidos()
+                else:
+                    claves = [clave for clave in self._pendientes if clave[0] == usuario_id]
+                    lote = {clave: self._pendientes.pop(clave) for clave in claves}
+                    eventos = []
+
+            if not lote and not eventos:
+                return 0
+
+            try:
+                cambios = self._volcar_reintentando(lote, eventos)
+            except IntegrityError:
+                # Falla siempre: reencolarlo haría fallar también cada volcado siguiente.
+                # Los eventos no tienen restricciones de clave foránea y se conservan
+                logger.exception(f'Se descartan {len(lote)} progresos que violan una restricción')
+                self._reencolar({}, eventos)
+                return 0
+            except Exception:
+                logger.exception(f'Error al volcar {len(lote)} progresos y {len(eventos)} eventos de reproducción')
+                self._reencolar(lote, eventos)
+                return 0
+
+        if cambios or eventos:
+            # Lo escrito ya está confirmado: un receptor que falla no debe reencolarlo ni detener el hilo
+            respuestas = progreso_volcado.send_robust(
+                sender=WatchHistory,
+                usuarios_ids={cambio.usuario_id for cambio in cambios},
+                nuevos=sum(cambio.completado_anterior is None for cambio in cambios),
+                cambios=cambios,
+                eventos=eventos,
+            )
+            for receptor, respuesta in respuestas:
+                if isinstance(respuesta, Exception):
+                    logger.error(f'Error en {receptor.__name__} tras volcar progresos', exc_info=respuesta)
+        return len(cambios)
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=self.intervalo * 2)
+        self.vaciar()
+
+    def _volcar_reintentando(self, lote, eventos):
+        try:
+            return escritor.ejecutar(self._volcar, lote, eventos, nombre='volcar_progreso')
+        except IntegrityError:
+            # Un usuario o una película se borró entre la comprobación y el commit (las
+            # claves foráneas se verifican al confirmar): al reintentar ya no pasa el filtro
+            logger.warning(f'Volcado de {len(lote)} progresos rechazado por integridad: se reintenta')
+            return escritor.ejecutar(self._volcar, lote, eventos, nombre='volcar_progreso')
+
+    def _volcar(self, lote, eventos):
+        EventoVisualizacion.objects.bulk_create(eventos, batch_size=1000)
+        return self._escribir(lote)
+
+    def _escribir(self, lote):
+        """Upsert del lote en WatchHistory. Devuelve un `CambioHistorial` por historial escrito."""
+        if not lote:
+            return []
+        # Usuarios o películas borrados mientras su progreso esperaba en el búfer. Las filas
+        # quedan bloqueadas hasta el commit (en SQLite ya lo está toda la base)
+        usuarios_existentes = set(
+            User.objects.select_for_update(no_key=True)
+            .filter(pk__in={usuario_id for usuario_id, _ in lote}).values_list('pk', flat=True)
+        )
+        peliculas_existentes = set(
+            Movie.objects.select_for_update(no_key=True)
+            .filter(pk__in={pelicula_id for _, pelicula_id in lote}).values_list('pk', flat=True)
+        )
+        historiales = [
+            WatchHistory(
+                usuario_id=usuario_id,
+                pelicula_id=pelicula_id,
+                timestamp=pendiente.timestamp,
+                porcentaje=pendiente.porcentaje,
+                completado=pendiente.completado,
+                ultima_visualizacion=pendiente.ultima_visualizacion,
+            )
+            for (usuario_id, pelicula_id), pendiente in lote.items()
+            if usuario_id in usuarios_existentes and pelicula_id in peliculas_existentes
+        ]
+        usuarios_ids = {historial.usuario_id for historial in historiales}
+        completados = {
+            (usuario_id, pelicula_id): completado
+            for usuario_id, pelicula_id, completado in WatchHistory.objects.filter(
+                usuario_id__in=usuarios_ids,
+                pelicula_id__in=peliculas_existentes,
+            ).values_list('usuario_id', 'pelicula_id', 'completado')
+        }
+        WatchHistory.objects.bulk_create(
+            historiales,
+            update_conflicts=True,
+            unique_fields=['usuario', 'pelicula'],
+            update_fields=['timestamp', 'porcentaje', 'completado', 'ultima_visualizacion'],
+        )
+        return [
+            CambioHistorial(
+                usuario_id=h.usuario_id,
+                pelicula_id=h.pelicula_id,
+                completado=h.completado,
+                completado_anterior=completados.get((h.usuario_id, h.pelicula_id)),
+                ultima_visualizacion=h.ultima_visualizacion,
+            )
+            for h in historiales
+        ]
+
+    def _reencolar(self, lote, eventos=()):
+        # Lo registrado después del fallo es más reciente y tiene prioridad
+        with self._lock:
+            for clave, pendiente in lote.items():
+                self._pendientes.setdefault(clave, pendiente)
+            self._eventos[:0] = eventos
+
+    def _olvidar_latidos(self):
+        limite = timezone.now() - timedelta(seconds=PAUSA_SESION)
+        self._latidos = {clave: latido for clave, latido in self._latidos.items() if latido.fecha >= limite}
+
+    def _iniciar_hilo(self):
+        if self._hilo is not None or self._detener.is_set():
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='buffer-progreso', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self.vaciar()
+            close_old_connections()
+
+
+def duracion_pelicula(pelicula_id):
+    """Duración en segundos de la película, o None si no existe."""
+    global _generacion_duraciones
+    generacion = cache.get(CLAVE_DURACIONES)
+    ahora = time.monotonic()
+    if generacion != _generacion_duraciones:
+        _duraciones.clear()
+        _generacion_duraciones = generacion
+
+    guardada = _duraciones.get(pelicula_id)
+    if guardada is not None and ahora - guardada[1] < TTL_DURACIONES:
+        return guardada[0]
+    duracion = Movie.objects.filter(pk=pelicula_id).values_list('duracion', flat=True).first()
+    if duracion is None:
+        _duraciones.pop(pelicula_id, None)
+        return None
+    _duraciones[pelicula_id] = (duracion, ahora)
+    return duracion
+
+
+def olvidar_duracion(pelicula_id):
+    """La duración cambió: la descarta aquí y, vía la caché compartida, en los demás procesos."""
+    _duraciones.pop(pelicula_id, None)
+    cache.set(CLAVE_DURACIONES, time.time_ns(), None)
+
+
+def historial_actual(usuario, pelicula):
+    """WatchHistory del usuario para la película, con el progreso pendiente del buffer aplicado."""
+    historial = WatchHistory.objects.filter(usuario=usuario, pelicula=pelicula).first()
+    if historial is not None:
+        historial.pelicula = pelicula
+    pendiente = buffer_progreso.obtener(usuario.pk, pelicula.pk)
+
+    if pendiente is not None:
+        if historial is None:
+            historial = WatchHistory(usuario=usuario, pelicula=pelicula)
+        historial.timestamp = pendiente.timestamp
+        historial.porcentaje = pendiente.porcentaje
+        historial.completado = pendiente.completado
+        historial.ultima_visualizacion = pendiente.ultima_visualizacion
+
+    return historial
+
+
+# {pelicula_id: (duración, momento de la lectura)}
+_duraciones = {}
+_generacion_duraciones = None
+
+_config = getattr(settings, 'PROGRESO_BUFFER', {})
+buffer_progreso = BufferProgreso(
+    intervalo=_config.get('INTERVALO', 5.0),
+    max_pendientes=_config.get('MAX_PENDIENTES', 500),
+)
+atexit.register(buffer_progreso.detener)
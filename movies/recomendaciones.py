@@ -0,0 +1,232 @@
+"""
+Recomendador basado en contenido.
+
+El catálogo se representa como una matriz película × género (filas
+normalizadas) y cada usuario como un vector de afinidad por género construido
+a partir de sus favoritos, historial y calificaciones. La puntuación de todas
+las películas candidatas es un único producto matriz-vector; las ya vistas se
+descartan con una máscara booleana y el top-N sale de `argpartition`.
+
+Las recomendaciones pueden precalcularse en lote para todos los usuarios con
+`manage.py precalcular_recomendaciones`; los usuarios sin lista precalculada
+(p. ej. recién registrados) se calculan en línea.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import cache
+
+from .models import Favorite, Movie, Rating, Recomendacion, WatchHistory
+
+PESO_FAVORITO = 3.0
+PESO_VISTO = 1.0
+PESO_COMPLETADO = 1.0
+PESO_POPULARIDAD = 0.1
+# Calificaciones bayesianas: cuántos votos "virtuales" con la media global se suman
+VOTOS_PREVIOS = 5
+
+CLAVE_GENERACION = 'recomendaciones:catalogo:gen'
+# Las calificaciones cambian la popularidad sin invalidar el catálogo: se refresca cada tanto
+TTL_CATALOGO = 600
+
+
+@dataclass
+class Catalogo:
+    pelicula_ids: np.ndarray
+    indice_pelicula: dict
+    indice_genero: dict
+    generos: np.ndarray
+    popularidad: np.ndarray
+    generacion: object
+    construido: float
+
+    @property
+    def vacio(self):
+        return len(self.pelicula_ids) == 0
+
+
+def construir_catalogo(generacion=None):
+    peliculas = list(
+        Movie.objects.order_by('fecha_agregado', 'id').values_list(
+            'id', 'calificacion_suma', 'calificacion_conteo'
+        )
+    )
+    relaciones = list(Movie.generos.through.objects.values_list('movie_id', 'genre_id'))
+
+    pelicula_ids = np.array([pelicula_id for pelicula_id, _, _ in peliculas], dtype=np.int64)
+    indice_pelicula = {pelicula_id: i for i, pelicula_id in enumerate(pelicula_ids.tolist())}
+    indice_genero = {genero_id: j for j, genero_id in enumerate(sorted({g for _, g in relaciones}))}
+
+    generos = np.zeros((len(pelicula_ids), len(indice_genero)), dtype=np.float32)
+    for pelicula_id, genero_id in relaciones:
+        if pelicula_id in indice_pelicula:
+            generos[indice_pelicula[pelicula_id], indice_genero[genero_id]] = 1.0
+    normas = np.linalg.norm(generos, axis=1, keepdims=True)
+    np.divide(generos, normas, out=generos, where=normas > 0)
+
+    sumas = np.array([suma for _, suma, _ in peliculas], dtype=np.float32)
+    conteos = np.array([conteo for _, _, conteo in peliculas], dtype=np.float32)
+    media_global = sumas.sum() / conteos.sum() if conteos.sum() else 0.0
+    bayesiana = (VOTOS_PREVIOS * media_global + sumas) / (VOTOS_PREVIOS + conteos)
+    # Las más recientes ganan los empates (las películas están ordenadas por fecha_agregado)
+    recencia = np.linspace(0, 1e-3, num=len(pelicula_ids), dtype=np.float32)
+    popularidad = bayesiana / 5.0 + recencia if len(pelicula_ids) else bayesiana
+
+    return Catalogo(
+        pelicula_ids=pelicula_ids,
+        indice_pelicula=indice_pelicula,
+        indice_genero=indice_genero,
+        generos=generos,
+        popularidad=popularidad.astype(np.float32),
+        generacion=generacion,
+        construido=time.monotonic(),
+    )
+
+
+def obtener_catalogo():
+    """Catálogo en memoria del proceso, reconstruido cuando otra réplica lo invalida."""
+    global _catalogo
+    generacion = cache.get(CLAVE_GENERACION)
+    with _catalogo_lock:
+        if (
+            _catalogo is None
+            or _catalogo.generacion != generacion
+            or time.monotonic() - _catalogo.construido > TTL_CATALOGO
+        ):
+            _catalogo = construir_catalogo(generacion)
+        return _catalogo
+
+
+def invalidar_catalogo():
+    global _catalogo
+    with _catalogo_lock:
+        _catalogo = None
+    cache.set(CLAVE_GENERACION, time.time_ns(), None)
+
+
+def interacciones(usuario_ids):
+    """
+    Devuelve {usuario_id: [(pelicula_id, peso), ...]} combinando
+    favoritos, historial y calificaciones en tres consultas.
+    """
+    resultado = {usuario_id: [] for usuario_id in usuario_ids}
+
+    favoritos = Favorite.objects.filter(usuario_id__in=usuario_ids).values_list('usuario_id', 'pelicula_id')
+    for usuario_id, pelicula_id in favoritos:
+        resultado[usuario_id].append((pelicula_id, PESO_FAVORITO))
+
+    historial = WatchHistory.objects.filter(usuario_id__in=usuario_ids).values_list(
+        'usuario_id', 'pelicula_id', 'completado'
+    )
+    for usuario_id, pelicula_id, completado in historial:
+        peso = PESO_VISTO + (PESO_COMPLETADO if completado else 0.0)
+        resultado[usuario_id].append((pelicula_id, peso))
+
+    calificaciones = Rating.objects.filter(usuario_id__in=usuario_ids).values_list(
+        'usuario_id', 'pelicula_id', 'puntuacion'
+    )
+    for usuario_id, pelicula_id, puntuacion in calificaciones:
+        # 3 estrellas es neutral; por debajo resta afinidad al género
+        resultado[usuario_id].append((pelicula_id, float(puntuacion - 3)))
+
+    return resultado
+
+
+def matriz_usuarios(catalogo, interacciones_por_usuario, usuario_ids):
+    """
+    Matrices de afinidad usuario × género y de películas vistas usuario × película.
+    Cualquier interacción (favorito, historial o calificación) cuenta como vista.
+    """
+    filas, columnas, pesos = [], [], []
+    for fila, usuario_id in enumerate(usuario_ids):
+        for pelicula_id, peso in interacciones_por_usuario.get(usuario_id, ()):
+            indice = catalogo.indice_pelicula.get(pelicula_id)
+            if indice is not None:
+                filas.append(fila)
+                columnas.append(indice)
+                pesos.append(peso)
+
+    interaccion = np.zeros((len(usuario_ids), len(catalogo.pelicula_ids)), dtype=np.float32)
+    np.add.at(interaccion, (filas, columnas), pesos)
+    vistas = np.zeros(interaccion.shape, dtype=bool)
+    vistas[filas, columnas] = True
+
+    afinidad = interaccion @ catalogo.generos
+    normas = np.linalg.norm(afinidad, axis=1, keepdims=True)
+    np.divide(afinidad, normas, out=afinidad, where=normas > 0)
+    return afinidad, vistas
+
+
+def puntuar(catalogo, afinidad, vistas):
+    """Puntuaciones usuario × película; las vistas quedan en -inf."""
+    puntuaciones = afinidad @ catalogo.generos.T + PESO_POPULARIDAD * catalogo.popularidad
+    puntuaciones[vistas] = -np.inf
+    return puntuaciones
+
+
+def top_n(puntuaciones, n):
+    """Índices de las n mejores puntuaciones finitas de un vector, en orden descendente."""
+    n = min(n, len(puntuaciones))
+    if n == 0:
+        return np.array([], dtype=np.int64)
+    candidatos = np.argpartition(-puntuaciones, n - 1)[:n]
+    candidatos = candidatos[np.argsort(-puntuaciones[candidatos], kind='stable')]
+    return candidatos[np.isfinite(puntuaciones[candidatos])]
+
+
+def recomendar_en_linea(usuario_id, n=10):
+    catalogo = obtener_catalogo()
+    if catalogo.vacio:
+        return []
+    afinidad, vistas = matriz_usuarios(catalogo, interacciones([usuario_id]), [usuario_id])
+    puntuaciones = puntuar(catalogo, afinidad, vistas)[0]
+    return catalogo.pelicula_ids[top_n(puntuaciones, n)].tolist()
+
+
+def recomendar(usuario, n=10):
+    """IDs de películas recomendadas, de la lista precalculada si existe o en línea si no."""
+    precalculada = Recomendacion.objects.filter(usuario=usuario).values_list('peliculas', flat=True).first()
+    if precalculada:
+        vistas = set(Favorite.objects.filter(usuario=usuario).values_list('pelicula_id', flat=True))
+        vistas.update(WatchHistory.objects.filter(usuario=usuario).values_list('pelicula_id', flat=True))
+        vistas.update(Rating.objects.filter(usuario=usuario).values_list('pelicula_id', flat=True))
+        pendientes = [pelicula_id for pelicula_id in precalculada if pelicula_id not in vistas]
+        if len(pendientes) >= n:
+            return pendientes[:n]
+
+    return recomendar_en_linea(usuario.pk, n)
+
+
+def precalcular(usuario_ids, n=20, lote=1000):
+    """Calcula y guarda las recomendaciones de `usuario_ids` en lotes. Devuelve cuántas guardó."""
+    catalogo = construir_catalogo()
+    if catalogo.vacio:
+        return 0
+
+    guardadas = 0
+    for inicio in range(0, len(usuario_ids), lote):
+        ids = usuario_ids[inicio:inicio + lote]
+        afinidad, vistas = matriz_usuarios(catalogo, interacciones(ids), ids)
+        puntuaciones = puntuar(catalogo, afinidad, vistas)
+
+        Recomendacion.objects.bulk_create(
+            [
+                Recomendacion(
+                    usuario_id=usuario_id,
+                    peliculas=catalogo.pelicula_ids[top_n(puntuaciones[fila], n)].tolist(),
+                )
+                for fila, usuario_id in enumerate(ids)
+            ],
+            update_conflicts=True,
+            unique_fields=['usuario'],
+            update_fields=['peliculas', 'fecha_calculo'],
+        )
+        guardadas += len(ids)
+
+    return guardadas
+
+
+_catalogo = None
+_catalogo_lock = threading.Lock()
@@ -0,0 +1,121 @@
+"""
+Tabla precalculada de películas relacionadas.
+
+La similitud entre dos películas combina la coincidencia de géneros
+(Jaccard), la co-ocurrencia de calificaciones (usuarios que calificaron
+ambas, normalizada como coseno) y la cercanía del año de publicación. Para
+cada película se guardan las `TOP_K` más similares en `PeliculaRelacionada`,
+de modo que la página de detalle las lee con una sola consulta indexada.
+
+`recalcular` acepta un subconjunto de películas: cuando cambian los géneros
+de una película solo se recalculan las listas de las películas que comparten
+alguno de los géneros afectados.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from . import cache
+from .models import Movie, PeliculaRelacionada, Rating
+
+TOP_K = 12
+PESO_GENEROS = 0.6
+PESO_CALIFICACIONES = 0.3
+PESO_AÑO = 0.1
+# Años de diferencia a los que la cercanía por año cae a 1/e
+ESCALA_AÑOS = 5.0
+
+
+def recalcular(pelicula_ids=None, top_k=TOP_K, bloque=500):
+    """Recalcula las relacionadas de `pelicula_ids` (todas si es None). Devuelve cuántas películas procesó."""
+    peliculas = list(Movie.objects.order_by('id').values_list('id', 'año_publicacion', 'calificacion_conteo'))
+    if not peliculas:
+        return 0
+
+    ids = np.array([pelicula_id for pelicula_id, _, _ in peliculas], dtype=np.int64)
+    indice = {pelicula_id: i for i, pelicula_id in enumerate(ids.tolist())}
+    años = np.array([año if año is not None else np.nan for _, año, _ in peliculas], dtype=np.float32)
+    conteos = np.array([conteo for _, _, conteo in peliculas], dtype=np.float32)
+
+    relaciones = list(Movie.generos.through.objects.values_list('movie_id', 'genre_id'))
+    indice_genero = {genero_id: j for j, genero_id in enumerate(sorted({g for _, g in relaciones}))}
+    generos = np.zeros((len(ids), len(indice_genero)), dtype=np.float32)
+    for pelicula_id, genero_id in relaciones:
+        generos[indice[pelicula_id], indice_genero[genero_id]] = 1.0
+    tamaños = generos.sum(axis=1)
+
+    if pelicula_ids is None:
+        objetivo = np.arange(len(ids))
+    else:
+        objetivo = np.array(sorted(indice[p] for p in set(pelicula_ids) if p in indice), dtype=np.int64)
+
+    for inicio in range(0, len(objetivo), bloque):
+        filas = objetivo[inicio:inicio + bloque]
+
+        # Jaccard de géneros: |A ∩ B| / |A ∪ B|
+        interseccion = generos[filas] @ generos.T
+        union = tamaños[filas][:, None] + tamaños[None, :] - interseccion
+        jaccard = np.divide(interseccion, union, out=np.zeros_like(interseccion), where=union > 0)
+
+        coocurrencia = _coocurrencia_calificaciones(ids, indice, conteos, filas)
+
+        diferencia = np.abs(años[filas][:, None] - años[None, :])
+        cercania = np.where(np.isnan(diferencia), 0.0, np.exp(-np.nan_to_num(diferencia) / ESCALA_AÑOS))
+
+        puntuaciones = PESO_GENEROS * jaccard + PESO_CALIFICACIONES * coocurrencia + PESO_AÑO * cercania
+        # Solo cuentan como relacionadas las que comparten género o público
+        puntuaciones[(jaccard == 0) & (coocurrencia == 0)] = -np.inf
+        puntuaciones[np.arange(len(filas)), filas] = -np.inf
+
+        _guardar(ids, filas, puntuaciones, top_k)
+
+    cache.invalidar(PeliculaRelacionada)
+    return len(objetivo)
+
+
+def peliculas_afectadas(genero_ids=(), pelicula_ids=()):
+    """Películas cuyas listas pueden cambiar al modificarse los géneros indicados."""
+    afectadas = set(pelicula_ids)
+    afectadas.update(
+        Movie.generos.through.objects.filter(genre_id__in=genero_ids).values_list('movie_id', flat=True)
+    )
+    return afectadas
+
+
+def _guardar(ids, filas, puntuaciones, top_k):
+    k = min(top_k, puntuaciones.shape[1])
+    relacionadas = []
+    for fila, i in enumerate(filas):
+        candidatos = np.argpartition(-puntuaciones[fila], k - 1)[:k]
+        candidatos = candidatos[np.argsort(-puntuaciones[fila, candidatos], kind='stable')]
+        for posicion, j in enumerate(candidatos[np.isfinite(puntuaciones[fila, candidatos])]):
+            relacionadas.append(PeliculaRelacionada(
+                pelicula_id=int(ids[i]),
+                relacionada_id=int(ids[j]),
+                posicion=posicion,
+                puntuacion=float(puntuaciones[fila, j]),
+            ))
+
+    with transaction.atomic():
+        PeliculaRelacionada.objects.filter(pelicula_id__in=ids[filas].tolist()).delete()
+        PeliculaRelacionada.objects.bulk_create(relacionadas, batch_size=1000)
+
+
+def _coocurrencia_calificaciones(ids, indice, conteos, filas):
+    """Coseno de co-calificación entre las películas de `filas` y todo el catálogo."""
+    coocurrencia = np.zeros((len(filas), len(ids)), dtype=np.float32)
+    fila_de = {int(ids[i]): fila for fila, i in enumerate(filas)}
+
+    pares = (
+        Rating.objects
+        .filter(usuario__calificaciones__pelicula_id__in=list(fila_de))
+        .values_list('usuario__calificaciones__pelicula_id', 'pelicula_id')
+        .annotate(usuarios=Count('usuario', distinct=True))
+        .order_by()
+    )
+    for objetivo_id, pelicula_id, usuarios in pares:
+        if pelicula_id in indice:
+            coocurrencia[fila_de[objetivo_id], indice[pelicula_id]] = usuarios
+
+    normas = np.sqrt(conteos[filas][:, None] * conteos[None, :])
+    return np.divide(coocurrencia, normas, out=np.zeros_like(coocurrencia), where=normas > 0)
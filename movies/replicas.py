@@ -0,0 +1,222 @@
+"""
+Lecturas de las vistas pesadas en réplicas de la base de datos.
+
+Las vistas marcadas con `en_replica` (y los listados del admin) leen de una
+de las réplicas de `REPLICAS_LECTURA['ALIAS']`; todo lo demás, y toda
+escritura, va a `default`. Sirve tanto una copia SQLite que se renueva con
+`manage.py actualizar_replica` como una réplica de Postgres.
+
+Una réplica solo se usa para un modelo si está al día con su último cambio
+conocido (la fecha que deja `movies.cache.invalidar`); si ese cambio no se
+conoce, si su retraso no supera `MAX_RETRASO`. Así lo que se lee de la réplica
+no queda guardado en la caché bajo una generación más nueva que los datos.
+Además, tras una escritura propia (un POST) el cliente lleva durante
+`VENTANA_PRIMARIA` segundos una cookie que manda todas sus lecturas a la
+primaria, y dentro de una misma petición nada se lee de la réplica después
+de escribir.
+"""
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import cache
+
+CONFIGURACION = {
+    'ALIAS': [],
+    # Solo los modelos de estas apps se leen de réplica (nunca sesiones ni usuarios)
+    'APPS': ['movies'],
+    'MAX_RETRASO': 300,
+    'VENTANA_PRIMARIA': 10,
+    'COOKIE': 'vs_primaria',
+}
+# Cada cuánto se vuelve a medir el retraso de una réplica
+INTERVALO_MEDICION = 1.0
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+SQL_FECHA_POSTGRES = '''
+SELECT EXTRACT(EPOCH FROM CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN now()
+    ELSE pg_last_xact_replay_timestamp()
+END)
+'''
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, 'REPLICAS_LECTURA', {})}
+
+
+@dataclass
+class Estado:
+    """Lo que el router sabe de la petición en curso."""
+    replica: bool = False
+    primaria: bool = False
+    escribio: bool = False
+    cambios: dict = field(default_factory=dict)
+
+
+_estado = ContextVar('estado_replicas', default=None)
+_contadores = Counter()
+_contadores_lock = threading.Lock()
+_fechas = {}
+_turno = itertools.count()
+
+
+def _contar(alias, motivo):
+    with _contadores_lock:
+        _contadores[(alias, motivo)] += 1
+
+
+def fecha_replica(alias):
+    """Hasta qué momento tiene datos la réplica `alias`, o None si no está disponible."""
+    medida = _fechas.get(alias)
+    ahora = time.monotonic()
+    if medida is not None and ahora - medida[0] < INTERVALO_MEDICION:
+        return medida[1]
+
+    fecha = None
+    conexion = connections[alias]
+    try:
+        if conexion.vendor == 'sqlite':
+            # `actualizar_replica` deja como fecha de modificación el inicio de la copia
+            fecha = os.path.getmtime(conexion.settings_dict['NAME'])
+        elif conexion.vendor == 'postgresql':
+            with conexion.cursor() as cursor:
+                cursor.execute(SQL_FECHA_POSTGRES)
+                fila = cursor.fetchone()
+            fecha = float(fila[0]) if fila and fila[0] is not None else None
+    except (OSError, DatabaseError):
+        _contar(alias, 'errores')
+    _fechas[alias] = (ahora, fecha)
+    return fecha
+
+
+def _fecha_cambio(modelo, estado):
+    etiqueta = modelo._meta.label_lower
+    if etiqueta not in estado.cambios:
+        modelos = [modelo]
+        if modelo._meta.auto_created:
+            # Tabla intermedia de un ManyToMany: cambia con los modelos que une
+            modelos = [campo.related_model for campo in modelo._meta.concrete_fields if campo.is_relation]
+        fechas = [cache.fecha_cambio(relacionado) for relacionado in modelos]
+        conocidas = [fecha for fecha in fechas if fecha is not None]
+        # (último cambio conocido, si falta la fecha de alguno)
+        estado.cambios[etiqueta] = (max(conocidas, default=None), len(conocidas) < len(fechas))
+    return estado.cambios[etiqueta]
+
+
+def _al_dia(alias, cambio, max_retraso):
+    fecha = fecha_replica(alias)
+    if fecha is None:
+        return False
+    ultimo, desconocido = cambio
+    if ultimo is not None and fecha < ultimo:
+        return False
+    return not desconocido or time.time() - fecha <= max_retraso
+
+
+class RouterReplicas:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        config = configuracion()
+        if estado is None or not estado.replica or not config['ALIAS'] or model._meta.app_label not in config['APPS']:
+            return DEFAULT_DB_ALIAS
+        if estado.primaria or estado.escribio:
+            _contar(DEFAULT_DB_ALIAS, 'escritura_reciente')
+            return DEFAULT_DB_ALIAS
+
+        cambio = _fecha_cambio(model, estado)
+        alias_replicas = config['ALIAS']
+        inicio = next(_turno)
+        for desplazamiento in range(len(alias_replicas)):
+            alias = alias_replicas[(inicio + desplazamiento) % len(alias_replicas)]
+            if _al_dia(alias, cambio, config['MAX_RETRASO']):
+                _contar(alias, 'lecturas')
+                return alias
+        _contar(DEFAULT_DB_ALIAS, 'replica_desactualizada')
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None and model._meta.app_label in configuracion()['APPS']:
+            estado.escribio = True
+        # Explícito: un objeto leído de una réplica se guarda igual en la primaria
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, *configuracion()['ALIAS']}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas copian el esquema de la primaria
+        if db in configuracion()['ALIAS']:
+            return False
+        return None
+
+
+class PrimariaTrasEscrituraMiddleware:
+    """Prepara el estado del router y marca con una cookie a quien acaba de escribir."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = configuracion()
+        estado = Estado(primaria=config['COOKIE'] in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        if request.method not in METODOS_SEGUROS or estado.escribio:
+            response.set_cookie(
+                config['COOKIE'], '1', max_age=config['VENTANA_PRIMARIA'], httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def en_replica(vista):
+    """Decorador de vistas de solo lectura: sus consultas pueden ir a una réplica."""
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        estado = _estado.get()
+        if estado is None:
+            return vista(request, *args, **kwargs)
+        anterior = estado.replica
+        estado.replica = True
+        try:
+            respuesta = vista(request, *args, **kwargs)
+            # Las TemplateResponse consultan al renderizar: tiene que ser aquí dentro
+            if hasattr(respuesta, 'render') and not respuesta.is_rendered:
+                respuesta.render()
+            return respuesta
+        finally:
+            estado.replica = anterior
+    return envoltura
+
+
+def estadisticas():
+    """Consultas enrutadas por destino y motivo en este proceso, y retraso de cada réplica."""
+    with _contadores_lock:
+        contadores = dict(_contadores)
+
+    rutas = {f'{alias}:{motivo}': cantidad for (alias, motivo), cantidad in sorted(contadores.items())}
+    replicas = {}
+    for alias in configuracion()['ALIAS']:
+        fecha = fecha_replica(alias)
+        replicas[alias] = {
+            'retraso_s': round(time.time() - fecha, 1) if fecha is not None else None,
+            'lecturas': contadores.get((alias, 'lecturas'), 0),
+            'errores': contadores.get((alias, 'errores'), 0),
+        }
+    return {'replicas': replicas, 'rutas': rutas}
@@ -0,0 +1,232 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import busqueda, cache, cache_inicio, estadisticas, posters, progreso, recomendaciones, relacionadas, tendencias
+from .models import Favorite, Genre, Movie, Rating, WatchHistory
+
+
+@receiver(post_save, sender=Rating)
+def actualizar_agregados_calificacion(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    
+    puntuacion_original = getattr(instance, '_puntuacion_original', None)
+    pelicula_id_original = getattr(instance, '_pelicula_id_original', None)
+    
+    with transaction.atomic():
+        if not created and puntuacion_original is not None:
+            if (puntuacion_original, pelicula_id_original) == (instance.puntuacion, instance.pelicula_id):
+                return
+            Movie.aplicar_calificacion(pelicula_id_original, puntuacion_original, -1)
+        Movie.aplicar_calificacion(instance.pelicula_id, instance.puntuacion, 1)
+    # update() no emite señales: los agregados de Movie cambiaron (y la fecha
+    # de cambio de Movie decide si una réplica está al día)
+    cache.invalidar(Movie)
+    
+    instance._guardar_estado_original()
+
+
+@receiver(post_delete, sender=Rating)
+def descontar_agregados_calificacion(sender, instance, **kwargs):
+    puntuacion = getattr(instance, '_puntuacion_original', None) or instance.puntuacion
+    pelicula_id = getattr(instance, '_pelicula_id_original', None) or instance.pelicula_id
+    Movie.aplicar_calificacion(pelicula_id, puntuacion, -1)
+    cache.invalidar(Movie)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidar_duracion_pelicula(sender, instance, created=False, **kwargs):
+    # Al guardar, solo si cambió la duración; al borrar, siempre
+    if kwargs['signal'] is post_save and (created or not instance.duracion_cambiada()):
+        return
+    progreso.olvidar_duracion(instance.pk)
+
+
+@receiver(post_save, sender=Movie)
+def recalcular_porcentajes_historial(sender, instance, created, raw=False, **kwargs):
+    # El porcentaje guardado en el historial depende de la duración
+    if created or raw or instance.duracion <= 0 or not instance.duracion_cambiada():
+        return
+    WatchHistory.objects.filter(pelicula_id=instance.pk).update(
+        porcentaje=F('timestamp') * 100.0 / instance.duracion
+    )
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(m2m_changed, sender=Movie.generos.through)
+def invalidar_inicio_pelicula(sender, **kwargs):
+    cache_inicio.invalidar(Movie)
+    recomendaciones.invalidar_catalogo()
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=WatchHistory)
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=WatchHistory)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Favorite)
+def invalidar_cache_modelo(sender, instance, **kwargs):
+    cache.invalidar(sender, usuario_id=getattr(instance, 'usuario_id', None))
+
+
+@receiver(m2m_changed, sender=Movie.generos.through)
+def invalidar_cache_generos(sender, **kwargs):
+    cache.invalidar(Movie)
+    cache.invalidar(Genre)
+
+
+@receiver(post_save, sender=WatchHistory)
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=WatchHistory)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Favorite)
+def invalidar_inicio_usuario(sender, instance, created=None, **kwargs):
+    # Actualizar el timestamp de un historial no cambia los conteos globales
+    globales = not (sender is WatchHistory and created is False)
+    cache_inicio.invalidar(sender, usuario_id=instance.usuario_id, globales=globales)
+
+
+@receiver(progreso.progreso_volcado)
+def invalidar_cache_progreso(sender, usuarios_ids, **kwargs):
+    for usuario_id in usuarios_ids:
+        cache.invalidar(WatchHistory, usuario_id=usuario_id)
+
+
+@receiver(progreso.progreso_volcado)
+def invalidar_inicio_progreso(sender, usuarios_ids, nuevos, **kwargs):
+    for usuario_id in usuarios_ids:
+        cache_inicio.invalidar(WatchHistory, usuario_id=usuario_id, globales=False)
+    if nuevos:
+        cache_inicio.invalidar(WatchHistory, personales=False)
+
+
+@receiver(post_save, sender=WatchHistory)
+@receiver(post_delete, sender=WatchHistory)
+def actualizar_estadisticas_historial(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    usuario_id = instance.usuario_id
+    transaction.on_commit(lambda: estadisticas.actualizar([usuario_id]))
+
+
+@receiver(progreso.progreso_volcado)
+def actualizar_estadisticas_progreso(sender, cambios=(), **kwargs):
+    estadisticas.aplicar_progreso(cambios)
+
+
+@receiver(progreso.progreso_volcado)
+def contar_tendencias_progreso(sender, eventos=(), **kwargs):
+    tendencias.contador.registrar_eventos(eventos)
+
+
+@receiver(post_save, sender=Rating)
+def contar_tendencias_calificacion(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        pelicula_id, peso = instance.pelicula_id, tendencias.PESO_CALIFICACION * instance.puntuacion / 5
+        # Una calificación revertida no cuenta
+        transaction.on_commit(lambda: tendencias.contador.registrar(pelicula_id, peso))
+
+
+@receiver(post_save, sender=Movie)
+def actualizar_estadisticas_pelicula(sender, instance, created, raw=False, **kwargs):
+    # La duración afecta las horas vistas de quienes la vieron
+    if created or raw or not instance.duracion_cambiada():
+        return
+    pelicula_id = instance.pk
+    transaction.on_commit(lambda: estadisticas.actualizar(estadisticas.usuarios_de_peliculas([pelicula_id])))
+
+
+@receiver(post_save, sender=Movie)
+def generar_derivados_poster(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    imagen = instance.imagen.name or ''
+    if not created and imagen == str(getattr(instance, '_imagen_original', None) or ''):
+        return
+    instance._imagen_original = imagen
+    pelicula_id = instance.pk
+    transaction.on_commit(lambda: posters.generar_tras_guardar(pelicula_id))
+
+
+@receiver(post_save, sender=Movie)
+def recalcular_relacionadas_pelicula(sender, instance, created, raw=False, **kwargs):
+    # Los cambios de géneros los cubre actualizar_por_cambio_generos; aquí solo
+    # una película nueva o un año distinto cambian la similitud
+    if raw or not (created or instance.año_cambiado()):
+        return
+    pelicula_id = instance.pk
+    transaction.on_commit(lambda: relacionadas.recalcular([pelicula_id]))
+
+
+def _relacion_generos(sender, instance, action, reverse, pk_set):
+    """(genero_ids, pelicula_ids) tocados por un cambio en Movie.generos, o None si no es un post_*."""
+    if action == 'pre_clear':
+        # Tras el clear no llega pk_set: guardar qué relaciones había
+        if reverse:
+            instance._relacion_previa = set(sender.objects.filter(genre_id=instance.pk).values_list('movie_id', flat=True))
+        else:
+            instance._relacion_previa = set(sender.objects.filter(movie_id=instance.pk).values_list('genre_id', flat=True))
+        return None
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+    
+    relacion = pk_set if pk_set is not None else getattr(instance, '_relacion_previa', set())
+    if reverse:
+        return {instance.pk}, set(relacion)
+    return set(relacion), {instance.pk}
+
+
+@receiver(m2m_changed, sender=Movie.generos.through)
+def actualizar_por_cambio_generos(sender, instance, action, reverse, pk_set, **kwargs):
+    relacion = _relacion_generos(sender, instance, action, reverse, pk_set)
+    if relacion is None:
+        return
+    genero_ids, pelicula_ids = relacion
+    
+    transaction.on_commit(lambda: busqueda.obtener_backend().indexar(pelicula_ids))
+    transaction.on_commit(
+        lambda: relacionadas.recalcular(relacionadas.peliculas_afectadas(genero_ids, pelicula_ids))
+    )
+    transaction.on_commit(lambda: estadisticas.actualizar(estadisticas.usuarios_de_peliculas(pelicula_ids)))
+
+
+@receiver(post_save, sender=Movie)
+def indexar_pelicula(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: busqueda.obtener_backend().indexar([instance.pk]))
+
+
+@receiver(post_delete, sender=Movie)
+def desindexar_pelicula(sender, instance, **kwargs):
+    busqueda.obtener_backend().eliminar([instance.pk])
+
+
+@receiver(post_save, sender=Genre)
+def reindexar_genero(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    pelicula_ids = list(instance.peliculas.values_list('id', flat=True))
+    transaction.on_commit(lambda: busqueda.obtener_backend().indexar(pelicula_ids))
+
+
+@receiver(pre_delete, sender=Genre)
+def recordar_peliculas_genero(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no emite m2m_changed
+    instance._peliculas_previas = list(instance.peliculas.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def reindexar_genero_eliminado(sender, instance, **kwargs):
+    pelicula_ids = getattr(instance, '_peliculas_previas', [])
+    transaction.on_commit(lambda: busqueda.obtener_backend().indexar(pelicula_ids))
+    transaction.on_commit(lambda: estadisticas.actualizar(estadisticas.usuarios_de_peliculas(pelicula_ids)))
@@ -0,0 +1,257 @@
+"""
+Entrega de videos alojados bajo `MEDIA_ROOT` con soporte de rangos HTTP.
+
+Las peticiones `Range` (uno o varios rangos) responden 206 leyendo solo los
+bytes pedidos, en bloques de `TAMAÑO_BLOQUE`: la memoria por reproducción es
+constante y saltar a cualquier punto del video no descarga lo anterior. Con un
+solo rango el archivo se entrega por `FileResponse`, que los servidores WSGI
+con `wsgi.file_wrapper` (gunicorn) envían con `sendfile`, sin copiar a Python.
+
+Con `VIDEO_ENTREGA['MODO']` en 'x-accel-redirect' (nginx) o 'x-sendfile'
+(Apache, lighttpd) Django solo autoriza y el proxy sirve el archivo, rangos
+incluidos.
+"""
+import mimetypes
+import os
+import re
+import secrets
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.http.request import split_domain_port, validate_host
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+TAMAÑO_BLOQUE = 64 * 1024
+# Más rangos que esto en una petición se unifican en uno solo (defensa ante abusos)
+MAX_RANGOS = 16
+
+RANGO = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+CONFIGURACION = {
+    'MODO': 'django',
+    'PREFIJO_INTERNO': '/protegido/media/',
+}
+
+
+def configuracion():
+    return {**CONFIGURACION, **getattr(settings, 'VIDEO_ENTREGA', {})}
+
+
+def ruta_local(enlace):
+    """
+    Ruta relativa a `MEDIA_ROOT` si `enlace` apunta a un archivo de `MEDIA_URL`
+    de este sitio (sin host o con uno de `ALLOWED_HOSTS`); si no, None.
+    """
+    partes = urlparse(enlace)
+    if partes.scheme not in ('', 'http', 'https'):
+        return None
+    if partes.netloc and not _host_propio(partes.netloc):
+        return None
+    prefijo = urlparse(settings.MEDIA_URL).path
+    ruta = unquote(partes.path)
+    if not ruta.startswith(prefijo):
+        return None
+    return ruta[len(prefijo):] or None
+
+
+def _host_propio(netloc):
+    """Si `netloc` es un host de este sitio. El comodín '*' no cuenta: no dice dónde vive el archivo."""
+    dominio, _ = split_domain_port(netloc.rpartition('@')[2].lower())
+    permitidos = [host for host in settings.ALLOWED_HOSTS if host != '*']
+    if settings.DEBUG and not settings.ALLOWED_HOSTS:
+        # Lo mismo que acepta Django en desarrollo con ALLOWED_HOSTS vacío
+        permitidos = ['.localhost', '127.0.0.1', '[::1]']
+    return bool(dominio) and validate_host(dominio, permitidos)
+
+
+def parsear_rangos(cabecera, tamaño):
+    """
+    [(inicio, fin), ...] inclusivos de una cabecera `Range: bytes=...`.
+    None si la cabecera no es válida (se ignora y se responde el archivo
+    completo); lista vacía si ningún rango es satisfacible (416).
+    """
+    unidad, _, especificacion = cabecera.partition('=')
+    if unidad.strip().lower() != 'bytes' or not especificacion:
+        return None
+
+    rangos = []
+    for parte in especificacion.split(','):
+        coincidencia = RANGO.match(parte)
+        if not coincidencia or coincidencia.groups() == ('', ''):
+            return None
+        inicio, fin = coincidencia.groups()
+        if inicio == '':
+            # Sufijo: los últimos N bytes
+            largo = int(fin)
+            if largo == 0:
+                continue
+            rangos.append((max(tamaño - largo, 0), tamaño - 1))
+            continue
+        inicio = int(inicio)
+        if fin != '' and int(fin) < inicio:
+            return None
+        fin = tamaño - 1 if fin == '' else min(int(fin), tamaño - 1)
+        if inicio < tamaño:
+            rangos.append((inicio, fin))
+
+    if len(rangos) > MAX_RANGOS:
+        rangos = [(min(inicio for inicio, _ in rangos), max(fin for _, fin in rangos))]
+    return rangos
+
+
+class SegmentoArchivo:
+    """
+    Vista de solo lectura de los bytes [inicio, inicio + largo) de un archivo.
+    Expone `fileno()` con el descriptor ya posicionado, para que `sendfile`
+    empiece en el lugar correcto y `Content-Length` lo limite.
+    """
+
+    def __init__(self, archivo, inicio, largo):
+        self.archivo = archivo
+        self.inicio = inicio
+        self.largo = largo
+        self.posicion = 0
+        archivo.seek(inicio)
+
+    def read(self, tamaño=-1):
+        restante = self.largo - self.posicion
+        if tamaño is None or tamaño < 0 or tamaño > restante:
+            tamaño = restante
+        datos = self.archivo.read(tamaño) if tamaño else b''
+        self.posicion += len(datos)
+        return datos
+
+    def seek(self, desplazamiento, desde=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.posicion, os.SEEK_END: self.largo}[desde]
+        self.posicion = min(max(base + desplazamiento, 0), self.largo)
+        self.archivo.seek(self.inicio + self.posicion)
+        return self.posicion
+
+    def tell(self):
+        return self.posicion
+
+    def seekable(self):
+        return True
+
+    def fileno(self):
+        return self.archivo.fileno()
+
+    def close(self):
+        self.archivo.close()
+
+
+def _etag(estado):
+    return quote_etag(f'{estado.st_mtime_ns:x}-{estado.st_size:x}')
+
+
+def _if_range_vigente(request, etag, ultima_modificacion):
+    """If-Range ausente o coincidente: se aplican los rangos. Si no, archivo completo."""
+    valor = request.headers.get('If-Range')
+    if not valor:
+        return True
+    if valor.startswith(('"', 'W/')):
+        # If-Range exige comparación fuerte
+        return valor == etag
+    fecha = parse_http_date_safe(valor)
+    return fecha is not None and fecha == int(ultima_modificacion)
+
+
+def servir_video(request, ruta_relativa):
+    """Respuesta para GET/HEAD del video en `MEDIA_ROOT/ruta_relativa`; FileNotFoundError si no existe."""
+    ruta = safe_join(settings.MEDIA_ROOT, ruta_relativa)
+    if not os.path.isfile(ruta):
+        raise FileNotFoundError(ruta)
+    estado = os.stat(ruta)
+
+    tipo = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    etag = _etag(estado)
+    ultima_modificacion = estado.st_mtime
+    tamaño = estado.st_size
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=int(ultima_modificacion))
+    if respuesta is None:
+        respuesta = _respuesta_video(request, ruta, ruta_relativa, tipo, tamaño, etag, ultima_modificacion)
+
+    respuesta.headers.setdefault('ETag', etag)
+    respuesta.headers.setdefault('Last-Modified', http_date(ultima_modificacion))
+    respuesta.headers['Accept-Ranges'] = 'bytes'
+    # Detrás de login: ninguna caché compartida debe guardarlo
+    respuesta.headers['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return respuesta
+
+
+def _respuesta_video(request, ruta, ruta_relativa, tipo, tamaño, etag, ultima_modificacion):
+    modo = configuracion()['MODO']
+    if modo == 'x-accel-redirect':
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta.headers['X-Accel-Redirect'] = configuracion()['PREFIJO_INTERNO'] + ruta_relativa
+        return respuesta
+    if modo == 'x-sendfile':
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta.headers['X-Sendfile'] = ruta
+        return respuesta
+
+    rangos = None
+    cabecera = request.headers.get('Range')
+    if cabecera and _if_range_vigente(request, etag, ultima_modificacion):
+        rangos = parsear_rangos(cabecera, tamaño)
+
+    if rangos == []:
+        respuesta = HttpResponse(status=416)
+        respuesta.headers['Content-Range'] = f'bytes */{tamaño}'
+        return respuesta
+
+    if not rangos:
+        return _respuesta_segmento(request, ruta, tipo, 0, tamaño, status=200)
+
+    if len(rangos) == 1:
+        inicio, fin = rangos[0]
+        respuesta = _respuesta_segmento(request, ruta, tipo, inicio, fin - inicio + 1, status=206)
+        respuesta.headers['Content-Range'] = f'bytes {inicio}-{fin}/{tamaño}'
+        return respuesta
+
+    return _respuesta_multiparte(request, ruta, tipo, tamaño, rangos)
+
+
+def _respuesta_segmento(request, ruta, tipo, inicio, largo, status):
+    if request.method == 'HEAD':
+        respuesta = HttpResponse(content_type=tipo, status=status)
+    else:
+        respuesta = FileResponse(SegmentoArchivo(open(ruta, 'rb'), inicio, largo), content_type=tipo, status=status)
+        respuesta.block_size = TAMAÑO_BLOQUE
+    respuesta.headers['Content-Length'] = largo
+    return respuesta
+
+
+def _respuesta_multiparte(request, ruta, tipo, tamaño, rangos):
+    separador = secrets.token_hex(16)
+    encabezados = [
+        (
+            f'--{separador}\r\nContent-Type: {tipo}\r\nContent-Range: bytes {inicio}-{fin}/{tamaño}\r\n\r\n'.encode(),
+            inicio,
+            fin,
+        )
+        for inicio, fin in rangos
+    ]
+    cierre = f'\r\n--{separador}--\r\n'.encode()
+    largo = sum(len(encabezado) + fin - inicio + 1 for encabezado, inicio, fin in encabezados)
+    largo += 2 * (len(encabezados) - 1) + len(cierre)
+
+    def partes():
+        with open(ruta, 'rb') as archivo:
+            for numero, (encabezado, inicio, fin) in enumerate(encabezados):
+                yield (b'\r\n' if numero else b'') + encabezado
+                segmento = SegmentoArchivo(archivo, inicio, fin - inicio + 1)
+                yield from iter(lambda: segmento.read(TAMAÑO_BLOQUE), b'')
+            yield cierre
+
+    contenido_tipo = f'multipart/byteranges; boundary={separador}'
+    if request.method == 'HEAD':
+        respuesta = HttpResponse(content_type=contenido_tipo, status=206)
+    else:
+        respuesta = StreamingHttpResponse(partes(), content_type=contenido_tipo, status=206)
+    respuesta.headers['Content-Length'] = largo
+    return respuesta
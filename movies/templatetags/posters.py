@@ -0,0 +1,51 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from movies.posters import TIPOS_MIME
+
+register = template.Library()
+
+# Ancho con el que se muestra el póster según dónde aparece, para que el navegador elija del srcset
+TAMAÑOS = {
+    'miniatura': '48px',
+    'tarjeta': '(min-width: 1024px) 20vw, (min-width: 768px) 33vw, 50vw',
+    'portada': '(min-width: 1024px) 40vw, 100vw',
+}
+
+
+@register.simple_tag
+def poster(pelicula, uso='tarjeta', clase='', carga='lazy'):
+    """
+    <picture> con un <source> por formato derivado (AVIF, WebP) y el póster
+    original como respaldo, con sus dimensiones y la miniatura borrosa de fondo
+    mientras carga. Sin derivados generados, solo el <img> original.
+    """
+    atributos = ''
+    if pelicula.imagen_ancho and pelicula.imagen_alto:
+        # Con las dimensiones el navegador reserva el espacio antes de descargar el póster
+        atributos = format_html(' width="{}" height="{}"', pelicula.imagen_ancho, pelicula.imagen_alto)
+    if pelicula.imagen_lqip:
+        atributos += format_html(
+            ' style="background-image: url({}); background-size: cover; background-position: center"',
+            pelicula.imagen_lqip,
+        )
+    imagen = format_html(
+        '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async"{}>',
+        pelicula.imagen.url, pelicula.titulo, clase, carga, atributos,
+    )
+    fuentes = (pelicula.imagen_derivados or {}).get('fuentes')
+    if not fuentes:
+        return imagen
+
+    tamaños = TAMAÑOS.get(uso, uso)
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (TIPOS_MIME[formato], ', '.join(f'{default_storage.url(ruta)} {ancho}w' for ancho, ruta in lista), tamaños)
+            for formato, lista in fuentes.items()
+            if formato in TIPOS_MIME and lista
+        ),
+    )
+    return format_html('<picture style="display: contents">{}{}</picture>', sources, imagen)
@@ -0,0 +1,300 @@
+"""
+Tendencias: qué se está viendo ahora, en el día, en la semana y desde siempre.
+
+Cada película tiene en `TendenciaPelicula` dos anillos de contadores (24
+ranuras horarias y 7 diarias, indexadas por período desde epoch módulo el
+tamaño del anillo), un total histórico y una puntuación con decaimiento
+exponencial de vida media `VIDA_MEDIA_HORAS`.
+
+Los eventos (inicios y finales de visualización del registro de eventos,
+calificaciones nuevas) se acumulan en memoria del proceso y se suman a la
+base de datos cada `INTERVALO_VOLCADO` segundos, dentro de una transacción con
+las filas bloqueadas: varios procesos pueden volcar sin pisarse y un reinicio
+solo pierde lo acumulado desde el último volcado.
+
+Las listas ordenadas se precalculan por proceso a partir de la tabla y se
+reconstruyen cuando algún proceso vuelca (generación en la caché compartida) o
+cada `REFRESCO_LISTAS` segundos, porque el paso del tiempo también las cambia.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import EventoVisualizacion, Movie, Rating, ResumenHorarioPelicula, TendenciaPelicula, WatchHistory
+
+logger = logging.getLogger('movies')
+
+HORAS = 24
+DIAS = 7
+VIDA_MEDIA_HORAS = 6.0
+PESO_VISTA = 1.0
+PESO_COMPLETADA = 0.5
+# Una calificación de 5 estrellas suma esto; las demás, en proporción
+PESO_CALIFICACION = 0.5
+
+INTERVALO_VOLCADO = 60
+REFRESCO_LISTAS = 60
+TAMAÑO_LISTAS = 50
+LISTAS = ('ahora', 'dia', 'semana', 'historico')
+
+CLAVE_GENERACION = 'tendencias:gen'
+
+
+def hora_epoch(fecha):
+    return int(fecha.timestamp() // 3600)
+
+
+def rotar(ranuras, ultimo, actual):
+    """Avanza un anillo del período `ultimo` al `actual`, poniendo a cero las ranuras que caducan."""
+    tamaño = len(ranuras)
+    if actual - ultimo >= tamaño:
+        return [0.0] * tamaño
+    ranuras = list(ranuras)
+    for periodo in range(ultimo + 1, actual + 1):
+        ranuras[periodo % tamaño] = 0.0
+    return ranuras
+
+
+def decaer(puntuacion, horas):
+    return puntuacion * math.pow(0.5, horas / VIDA_MEDIA_HORAS)
+
+
+def avanzar(tendencia, ahora):
+    """Lleva anillos y puntuación de la tendencia a `ahora`."""
+    hora = hora_epoch(ahora)
+    if hora > tendencia.ultima_hora:
+        tendencia.horas = rotar(tendencia.horas, tendencia.ultima_hora, hora)
+        tendencia.ultima_hora = hora
+    if hora // HORAS > tendencia.ultimo_dia:
+        tendencia.dias = rotar(tendencia.dias, tendencia.ultimo_dia, hora // HORAS)
+        tendencia.ultimo_dia = hora // HORAS
+    horas = (ahora - tendencia.puntuacion_fecha).total_seconds() / 3600
+    if horas > 0:
+        tendencia.puntuacion = decaer(tendencia.puntuacion, horas)
+        tendencia.puntuacion_fecha = ahora
+
+
+def sumar(tendencia, hora, peso, ahora):
+    """Suma `peso` ocurrido en `hora` (desde epoch) a una tendencia ya avanzada a `ahora`."""
+    if tendencia.ultima_hora - hora < HORAS:
+        tendencia.horas[hora % HORAS] += peso
+    if tendencia.ultimo_dia - hora // HORAS < DIAS:
+        tendencia.dias[(hora // HORAS) % DIAS] += peso
+    tendencia.total += peso
+    # Se toma la mitad de la hora como momento del evento
+    tendencia.puntuacion += decaer(peso, max((ahora.timestamp() / 3600) - (hora + 0.5), 0))
+
+
+def nueva(pelicula_id, ahora):
+    hora = hora_epoch(ahora)
+    return TendenciaPelicula(
+        pelicula_id=pelicula_id,
+        horas=[0.0] * HORAS,
+        ultima_hora=hora,
+        dias=[0.0] * DIAS,
+        ultimo_dia=hora // HORAS,
+        puntuacion_fecha=ahora,
+    )
+
+
+class Tendencias:
+    def __init__(self, intervalo_volcado=INTERVALO_VOLCADO, refresco=REFRESCO_LISTAS):
+        self.intervalo_volcado = intervalo_volcado
+        self.refresco = refresco
+        self._pendientes = defaultdict(float)
+        self._lock = threading.Lock()
+        self._volcado_lock = threading.Lock()
+        self._listas = None
+        self._listas_lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def registrar(self, pelicula_id, peso, fecha=None):
+        hora = hora_epoch(fecha or timezone.now())
+        with self._lock:
+            self._pendientes[(pelicula_id, hora)] += peso
+        self._iniciar_hilo()
+
+    def registrar_eventos(self, eventos):
+        pesos = {EventoVisualizacion.INICIO: PESO_VISTA, EventoVisualizacion.FIN: PESO_COMPLETADA}
+        for evento in eventos:
+            if evento.tipo in pesos:
+                self.registrar(evento.pelicula_id, pesos[evento.tipo], evento.fecha)
+
+    def volcar(self):
+        """Suma lo acumulado en memoria a `TendenciaPelicula`. Devuelve cuántas películas actualizó."""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, defaultdict(float)
+        if not pendientes:
+            return 0
+
+        por_pelicula = defaultdict(list)
+        for (pelicula_id, hora), peso in pendientes.items():
+            por_pelicula[pelicula_id].append((hora, peso))
+
+        try:
+            with self._volcado_lock, transaction.atomic():
+                actualizadas = self._escribir(por_pelicula, timezone.now())
+        except Exception:
+            logger.exception(f'Error al volcar tendencias de {len(por_pelicula)} películas')
+            with self._lock:
+                for clave, peso in pendientes.items():
+                    self._pendientes[clave] += peso
+            return 0
+
+        # Si se volcó dentro de una transacción ajena, los demás procesos reconstruyen tras su commit
+        transaction.on_commit(lambda: cache.set(CLAVE_GENERACION, time.time_ns(), None))
+        return actualizadas
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=self.intervalo_volcado * 2)
+        self.volcar()
+
+    def listas(self):
+        """{'ahora'|'dia'|'semana'|'historico': [pelicula_id, ...]} de mayor a menor."""
+        generacion = cache.get(CLAVE_GENERACION)
+        with self._listas_lock:
+            if (
+                self._listas is None
+                or self._listas['generacion'] != generacion
+                or time.monotonic() - self._listas['construidas'] > self.refresco
+            ):
+                self._listas = self._construir_listas(generacion)
+            return self._listas
+
+    def top(self, lista, n=10):
+        return self.listas()[lista][:n]
+
+    def _escribir(self, por_pelicula, ahora):
+        vigentes = set(Movie.objects.filter(pk__in=list(por_pelicula)).values_list('pk', flat=True))
+        existentes = {
+            tendencia.pelicula_id: tendencia
+            for tendencia in TendenciaPelicula.objects.select_for_update().filter(pelicula_id__in=vigentes)
+        }
+        nuevas = []
+        for pelicula_id in vigentes:
+            tendencia = existentes.get(pelicula_id)
+            if tendencia is None:
+                tendencia = nueva(pelicula_id, ahora)
+                nuevas.append(tendencia)
+            avanzar(tendencia, ahora)
+            for hora, peso in por_pelicula[pelicula_id]:
+                sumar(tendencia, hora, peso, ahora)
+
+        TendenciaPelicula.objects.bulk_create(nuevas)
+        TendenciaPelicula.objects.bulk_update(
+            existentes.values(),
+            ['horas', 'ultima_hora', 'dias', 'ultimo_dia', 'total', 'puntuacion', 'puntuacion_fecha'],
+            batch_size=500,
+        )
+        return len(vigentes)
+
+    def _iniciar_hilo(self):
+        if self._hilo is not None or self._detener.is_set():
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='volcado-tendencias', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        # El volcado no depende de que llegue otro evento después del intervalo
+        while not self._detener.wait(self.intervalo_volcado):
+            self.volcar()
+            close_old_connections()
+
+    def _construir_listas(self, generacion):
+        ahora = timezone.now()
+        hora = hora_epoch(ahora)
+        puntuaciones = {lista: [] for lista in LISTAS}
+        filas = TendenciaPelicula.objects.values_list(
+            'pelicula_id', 'horas', 'ultima_hora', 'dias', 'ultimo_dia', 'total', 'puntuacion', 'puntuacion_fecha'
+        )
+        for pelicula_id, horas, ultima_hora, dias, ultimo_dia, total, puntuacion, puntuacion_fecha in filas:
+            antiguedad = max((ahora - puntuacion_fecha).total_seconds() / 3600, 0)
+            puntuaciones['ahora'].append((decaer(puntuacion, antiguedad), pelicula_id))
+            puntuaciones['dia'].append((sum(rotar(horas, ultima_hora, hora)), pelicula_id))
+            puntuaciones['semana'].append((sum(rotar(dias, ultimo_dia, hora // HORAS)), pelicula_id))
+            puntuaciones['historico'].append((total, pelicula_id))
+
+        listas = {
+            lista: [pelicula_id for valor, pelicula_id in sorted(valores, key=lambda par: (-par[0], -par[1])) if valor > 0][:TAMAÑO_LISTAS]
+            for lista, valores in puntuaciones.items()
+        }
+        listas.update(generacion=generacion, construidas=time.monotonic())
+        return listas
+
+
+def reconstruir():
+    """
+    Recalcula todas las tendencias desde los resúmenes horarios (inicios y
+    finales) y las calificaciones. Las películas sin resúmenes toman como total
+    histórico la cantidad de usuarios que las vieron. Devuelve cuántas guardó.
+    """
+    ahora = timezone.now()
+    desde = ahora - timedelta(days=DIAS)
+    tendencias = {}
+
+    def obtener(pelicula_id):
+        if pelicula_id not in tendencias:
+            tendencias[pelicula_id] = nueva(pelicula_id, ahora)
+        return tendencias[pelicula_id]
+
+    recientes = (
+        ResumenHorarioPelicula.objects.filter(hora__gte=desde)
+        .annotate(peso=F('vistas') * PESO_VISTA + F('completadas') * PESO_COMPLETADA)
+        .values_list('pelicula_id', 'hora', 'peso')
+    )
+    for pelicula_id, hora, peso in recientes:
+        sumar(obtener(pelicula_id), hora_epoch(hora), peso, ahora)
+
+    calificaciones = (
+        Rating.objects.filter(fecha_creacion__gte=desde)
+        .annotate(hora=Trunc('fecha_creacion', 'hour'))
+        .values_list('pelicula_id', 'hora')
+        .annotate(estrellas=Sum('puntuacion'))
+        .order_by()
+    )
+    for pelicula_id, hora, estrellas in calificaciones:
+        sumar(obtener(pelicula_id), hora_epoch(hora), PESO_CALIFICACION * estrellas / 5, ahora)
+
+    # Los totales históricos se reemplazan por los acumulados de toda la historia
+    for tendencia in tendencias.values():
+        tendencia.total = 0.0
+    historicos = (
+        ResumenHorarioPelicula.objects.values('pelicula_id')
+        .annotate(vistas=Sum('vistas'), completadas=Sum('completadas'))
+        .order_by()
+    )
+    con_resumenes = set()
+    for fila in historicos:
+        obtener(fila['pelicula_id']).total += fila['vistas'] * PESO_VISTA + fila['completadas'] * PESO_COMPLETADA
+        con_resumenes.add(fila['pelicula_id'])
+    vistas = WatchHistory.objects.values('pelicula_id').annotate(usuarios=Count('usuario')).order_by()
+    for fila in vistas:
+        if fila['pelicula_id'] not in con_resumenes:
+            obtener(fila['pelicula_id']).total += fila['usuarios'] * PESO_VISTA
+    for fila in Rating.objects.values('pelicula_id').annotate(estrellas=Sum('puntuacion')).order_by():
+        obtener(fila['pelicula_id']).total += PESO_CALIFICACION * fila['estrellas'] / 5
+
+    with transaction.atomic():
+        TendenciaPelicula.objects.all().delete()
+        TendenciaPelicula.objects.bulk_create(tendencias.values(), batch_size=500)
+    cache.set(CLAVE_GENERACION, time.time_ns(), None)
+    return len(tendencias)
+
+
+contador = Tendencias()
+atexit.register(contador.detener)
@@ -0,0 +1,171 @@
+"""
+Índice de trigramas en memoria para la búsqueda mientras se escribe.
+
+Los textos se normalizan (casefold y sin tildes, de modo que "accion"
+encuentra "Acción") y cada palabra de los títulos y géneros se indexa por sus
+trigramas. Una consulta reúne candidatos por trigramas compartidos y los
+ordena por distancia de edición, lo que tolera errores de tipeo.
+"""
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+PESO_TITULO = 1.0
+PESO_GENERO = 0.7
+MAX_CANDIDATOS = 200
+
+
+def normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto.casefold())
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ''.join(c if c.isalnum() else ' ' for c in sin_tildes)
+
+
+def palabras(texto):
+    return normalizar(texto).split()
+
+
+def trigramas(palabra):
+    relleno = f'${palabra}$'
+    if len(relleno) < 3:
+        return {relleno}
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def errores_permitidos(token):
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 6:
+        return 1
+    return 2
+
+
+def distancia_edicion(a, b, limite):
+    """
+    Distancia de Damerau-Levenshtein (una transposición cuenta como un error),
+    acotada: devuelve limite + 1 en cuanto se sabe que lo supera.
+    """
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    previa, anterior = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            costo = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb))
+            if previa is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                costo = min(costo, previa[j - 2] + 1)
+            actual.append(costo)
+        if min(actual) > limite:
+            return limite + 1
+        previa, anterior = anterior, actual
+    return anterior[-1]
+
+
+def similitud(token, palabra):
+    """1.0 si la palabra empieza por el token; menos cuantos más errores; 0 si excede los permitidos."""
+    if palabra.startswith(token):
+        return 1.0
+    limite = errores_permitidos(token)
+    if limite == 0:
+        return 0.0
+    # Comparar también con el prefijo de la misma longitud: el usuario aún está escribiendo
+    distancia = min(
+        distancia_edicion(token, palabra, limite),
+        distancia_edicion(token, palabra[:len(token)], limite),
+    )
+    if distancia > limite:
+        return 0.0
+    return 1.0 - distancia / (limite + 1)
+
+
+class IndiceTrigramas:
+    """
+    Los trigramas apuntan a palabras del vocabulario y cada palabra a los
+    documentos que la contienen, así la distancia de edición se calcula una
+    sola vez por palabra distinta y no por documento.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._documentos = {}
+        self._palabras_por_trigrama = defaultdict(set)
+        self._documentos_por_palabra = defaultdict(dict)
+
+    def __len__(self):
+        return len(self._documentos)
+
+    def agregar(self, doc_id, titulo, generos=()):
+        pesos = {p: PESO_GENERO for genero in generos for p in palabras(genero)}
+        pesos.update((p, PESO_TITULO) for p in palabras(titulo))
+        with self._lock:
+            self._quitar(doc_id)
+            self._documentos[doc_id] = (tuple(pesos), len(titulo))
+            for palabra, peso in pesos.items():
+                if palabra not in self._documentos_por_palabra:
+                    for trigrama in trigramas(palabra):
+                        self._palabras_por_trigrama[trigrama].add(palabra)
+                self._documentos_por_palabra[palabra][doc_id] = peso
+
+    def quitar(self, doc_id):
+        with self._lock:
+            self._quitar(doc_id)
+
+    def buscar(self, consulta, limite=15):
+        tokens = palabras(consulta)
+        if not tokens:
+            return []
+
+        with self._lock:
+            puntuaciones = None
+            for token in tokens:
+                por_token = self._puntuar_token(token)
+                if puntuaciones is None:
+                    puntuaciones = por_token
+                else:
+                    # Todas las palabras de la consulta deben coincidir
+                    puntuaciones = {
+                        doc_id: puntuaciones[doc_id] + puntuacion
+                        for doc_id, puntuacion in por_token.items()
+                        if doc_id in puntuaciones
+                    }
+                if not puntuaciones:
+                    return []
+
+            largo_titulo = {doc_id: self._documentos[doc_id][1] for doc_id in puntuaciones}
+
+        ordenados = sorted(puntuaciones, key=lambda doc_id: (-puntuaciones[doc_id], largo_titulo[doc_id], doc_id))
+        return ordenados[:limite]
+
+    def _puntuar_token(self, token):
+        compartidos = Counter()
+        for trigrama in trigramas(token):
+            compartidos.update(self._palabras_por_trigrama.get(trigrama, ()))
+
+        puntuaciones = {}
+        for palabra, _ in compartidos.most_common(MAX_CANDIDATOS):
+            parecido = similitud(token, palabra)
+            if not parecido:
+                continue
+            for doc_id, peso in self._documentos_por_palabra[palabra].items():
+                puntuacion = parecido * peso
+                if puntuacion > puntuaciones.get(doc_id, 0.0):
+                    puntuaciones[doc_id] = puntuacion
+        return puntuaciones
+
+    def _quitar(self, doc_id):
+        documento = self._documentos.pop(doc_id, None)
+        if documento is None:
+            return
+        for palabra in documento[0]:
+            documentos = self._documentos_por_palabra[palabra]
+            documentos.pop(doc_id, None)
+            if documentos:
+                continue
+            # Última aparición de la palabra: sale del vocabulario
+            del self._documentos_por_palabra[palabra]
+            for trigrama in trigramas(palabra):
+                vocabulario = self._palabras_por_trigrama.get(trigrama)
+                if vocabulario is not None:
+                    vocabulario.discard(palabra)
+                    if not vocabulario:
+                        del self._palabras_por_trigrama[trigrama]
@@ -6,6 +6,7 @@ app_name = 'movies'
 urlpatterns = [
     path('', views.home, name='home'),
     path('peliculas/', views.movies_catalog, name='movies_catalog'),
+    path('peliculas/genero/<int:genero_id>/', views.movies_catalog_page, name='catalog_page'),
     path('pelicula/<int:movie_id>/', views.movie_detail, name='movie_detail'),
     path('favorito/toggle/<int:movie_id>/', views.toggle_favorite, name='toggle_favorite'),
     path('mis-favoritos/stats/', views.favorites_stats, name='favorites_stats'),
@@ -14,6 +15,7 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('mis-favoritos/', views.favorites_view, name='favorites'),
     path('ver/<int:movie_id>/', views.watch_movie, name='watch_movie'),
+    path('ver/<int:movie_id>/video/', views.stream_video, name='stream_video'),
     path('progreso/<int:movie_id>/', views.update_watch_progress, name='update_progress'),
     path('buscar/', views.search_movies, name='search'),
     path('calificar/<int:movie_id>/', views.rate_movie, name='rate_movie'),
@@ -26,4 +28,7 @@ urlpatterns = [
     path('cambiar-contrasena/', views.change_password_request, name='change_password'),
     path('cambiar-contrasena/confirmar/<uidb64>/<token>/', views.confirm_change_password, name='confirm_change_password'),
     path('mi-perfil/', views.user_profile, name='profile'),
+    path('estadisticas/cache-inicio/', views.home_cache_stats, name='home_cache_stats'),
+    path('estadisticas/escritura/', views.write_queue_stats, name='write_queue_stats'),
+    path('estadisticas/replicas/', views.replica_stats, name='replica_stats'),
 ]
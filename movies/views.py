@@ -1,5 +1,6 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login, logout
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.models import User
@@ -12,9 +13,13 @@ from django.utils.encoding import force_bytes, force_str
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 from django_ratelimit.decorators import ratelimit
 from django.contrib import messages
-from django.http import HttpResponse
-from django.views.decorators.http import require_POST
-from .models import Movie, Genre, Favorite, WatchHistory, Rating
+from django.http import HttpResponse, Http404, JsonResponse
+from django.views.decorators.http import require_POST, require_safe
+from .models import Movie, Genre, Favorite, WatchHistory, Rating, PeliculaRelacionada
+from . import busqueda, cache, cache_inicio, catalogo, estadisticas, favoritos, recomendaciones, replicas, streaming, tendencias
+from .condicional import condicional
+from .escritura import escritor
+from .progreso import buffer_progreso, duracion_pelicula, historial_actual
 from django.db.models import Q, Avg, Count
 from django.utils.html import escape
 import re
@@ -28,86 +33,69 @@ security_logger = logging.getLogger('django.security')
 
 def get_movie_suggestion(user):
     try:
-        generos_favoritos = Genre.objects.filter(
-            peliculas__favoritos__usuario=user
-        ).distinct()
-        
-        if not generos_favoritos.exists():
-            generos_favoritos = Genre.objects.filter(
-                peliculas__visualizaciones__usuario=user
-            ).distinct()
-        
-        peliculas_vistas = Movie.objects.filter(
-            Q(visualizaciones__usuario=user) | Q(favoritos__usuario=user)
-        ).distinct()
-        
-        sugerencias = Movie.objects.filter(
-            generos__in=generos_favoritos
-        ).exclude(
-            id__in=peliculas_vistas
-        ).distinct().annotate(
-            calificacion=Avg('calificaciones__puntuacion'),
-            num_calificaciones=Count('calificaciones')
-        ).order_by('-calificacion', '-num_calificaciones', '-fecha_agregado')
-        
-        if sugerencias.exists():
-            return sugerencias.first()
-        
-        pelicula_popular = Movie.objects.exclude(
-            id__in=peliculas_vistas
-        ).annotate(
-            calificacion=Avg('calificaciones__puntuacion'),
-            num_calificaciones=Count('calificaciones')
-        ).order_by('-calificacion', '-num_calificaciones', '-fecha_agregado').first()
-        
-        return pelicula_popular
+        recomendadas = recomendaciones.recomendar(user, n=5)
+        peliculas = Movie.objects.prefetch_related('generos').in_bulk(recomendadas)
+        for pelicula_id in recomendadas:
+            if pelicula_id in peliculas:
+                return peliculas[pelicula_id]
+        return None
     
     except Exception as e:
         logger.error(f"Error al obtener sugerencia para usuario {user.username}: {e}")
-        return Movie.objects.order_by('?').first()
+        return Movie.objects.first()
 
-def home(request):
-    if not request.user.is_authenticated:
-        return landing_page(request)
-    
-    peliculas_continuar = []
-    historial_activo = WatchHistory.objects.filter(
-        usuario=request.user,
-        completado=False,
-        timestamp__gt=0
-    ).select_related('pelicula').order_by('-ultima_visualizacion')
-    
-    for historial in historial_activo:
-        porcentaje = historial.progreso_porcentaje()
-        if 5 <= porcentaje < 95:
-            peliculas_continuar.append({
-                'pelicula': historial.pelicula,
-                'progreso': porcentaje,
-                'timestamp': historial.timestamp,
-                'ultima_visualizacion': historial.ultima_visualizacion
-            })
-    
-    peliculas_continuar = peliculas_continuar[:6]
-    
+def get_peliculas_continuar(user):
+    return [
+        {
+            'pelicula': historial.pelicula,
+            'progreso': historial.progreso_porcentaje(),
+            'timestamp': historial.timestamp,
+            'ultima_visualizacion': historial.ultima_visualizacion
+        }
+        for historial in WatchHistory.continuar_viendo(user)
+    ]
+
+
+def get_generos_usuario(user):
     generos_usuario_stats = Genre.objects.filter(
-        peliculas__visualizaciones__usuario=request.user
+        peliculas__visualizaciones__usuario=user
     ).distinct().annotate(
-        num_vistas=Count('peliculas__visualizaciones', filter=Q(peliculas__visualizaciones__usuario=request.user)),
-        calificacion_promedio=Avg('peliculas__calificaciones__puntuacion', filter=Q(peliculas__calificaciones__usuario=request.user))
+        num_vistas=Count('peliculas__visualizaciones', filter=Q(peliculas__visualizaciones__usuario=user)),
+        calificacion_promedio=Avg('peliculas__calificaciones__puntuacion', filter=Q(peliculas__calificaciones__usuario=user))
     ).order_by('-num_vistas', '-calificacion_promedio')[:2]
     
     generos_usuario = []
     for genero in generos_usuario_stats:
-        peliculas = genero.peliculas.all()[:10]
+        peliculas = list(genero.peliculas.prefetch_related('generos')[:10])
         generos_usuario.append({
             'genero': genero,
             'peliculas': peliculas
         })
-    
-    peliculas_top_vistas = Movie.objects.annotate(
-        num_vistas=Count('visualizaciones')
-    ).order_by('-num_vistas')[:5]
-    
+    return generos_usuario
+
+
+def get_peliculas_top_vistas():
+    # Solo la semana: sin contadores de tendencias se cuentan las visualizaciones de los últimos 7 días
+    ids = tendencias.contador.top('semana', 5)
+    if not ids:
+        hace_una_semana = timezone.now() - timedelta(days=7)
+        return list(Movie.objects.annotate(
+            num_vistas=Count('visualizaciones', filter=Q(visualizaciones__ultima_visualizacion__gte=hace_una_semana))
+        ).filter(num_vistas__gt=0).order_by('-num_vistas').prefetch_related('generos')[:5])
+    return _peliculas_en_orden(ids)
+
+
+def get_peliculas_tendencia_ahora():
+    # Lo que se está viendo en las últimas horas (puntuación con decaimiento)
+    return _peliculas_en_orden(tendencias.contador.top('ahora', 10))
+
+
+def _peliculas_en_orden(ids):
+    peliculas = Movie.objects.prefetch_related('generos').in_bulk(ids)
+    return [peliculas[pelicula_id] for pelicula_id in ids if pelicula_id in peliculas]
+
+
+def get_genero_global():
     genero_global = Genre.objects.filter(
         peliculas__isnull=False
     ).distinct().annotate(
@@ -117,14 +105,30 @@ def home(request):
     
     peliculas_genero_global = []
     if genero_global:
-        peliculas_genero_global = genero_global.peliculas.all()[:10]
+        peliculas_genero_global = list(genero_global.peliculas.prefetch_related('generos')[:10])
+    return genero_global, peliculas_genero_global
+
+
+@replicas.en_replica
+def home(request):
+    if not request.user.is_authenticated:
+        return landing_page(request)
     
-    pelicula_sugerida = get_movie_suggestion(request.user)
+    user = request.user
+    buffer_progreso.vaciar(usuario_id=user.id)
+    
+    peliculas_continuar = cache_inicio.obtener('continuar', lambda: get_peliculas_continuar(user), user)
+    generos_usuario = cache_inicio.obtener('generos_usuario', lambda: get_generos_usuario(user), user)
+    peliculas_tendencia_ahora = cache_inicio.obtener('tendencia_ahora', get_peliculas_tendencia_ahora)
+    peliculas_top_vistas = cache_inicio.obtener('top_vistas', get_peliculas_top_vistas)
+    genero_global, peliculas_genero_global = cache_inicio.obtener('genero_global', get_genero_global)
+    pelicula_sugerida = cache_inicio.obtener('sugerencia', lambda: get_movie_suggestion(user), user)
     
     context = {
         'pelicula_sugerida': pelicula_sugerida,
         'peliculas_continuar': peliculas_continuar,
         'generos_usuario': generos_usuario,
+        'peliculas_tendencia_ahora': peliculas_tendencia_ahora,
         'peliculas_top_vistas': peliculas_top_vistas,
         'genero_global': genero_global,
         'peliculas_genero_global': peliculas_genero_global,
@@ -134,44 +138,78 @@ def home(request):
     return render(request, 'movies/pages/home.html', context)
 
 
+@staff_member_required
+def home_cache_stats(request):
+    return JsonResponse(cache_inicio.estadisticas())
+
+
+@staff_member_required
+def write_queue_stats(request):
+    return JsonResponse(escritor.estadisticas())
+
+
+@staff_member_required
+def replica_stats(request):
+    return JsonResponse(replicas.estadisticas())
+
+
 @login_required
+@condicional('catalogo')
+@replicas.en_replica
 def movies_catalog(request):
-    generos_con_peliculas = Genre.objects.filter(peliculas__isnull=False).distinct()
-    
-    peliculas_por_genero = {}
-    for genero in generos_con_peliculas:
-        peliculas_por_genero[genero] = genero.peliculas.all() # type: ignore
-    
     context = {
-        'peliculas_por_genero': peliculas_por_genero,
+        'carruseles': catalogo.primeras_paginas(),
         'titulo_pagina': 'Catálogo de Películas'
     }
     
     return render(request, 'movies/pages/catalog.html', context)
 
 
-def landing_page(request):
-    peliculas_con_calificaciones = Movie.objects.filter(
-        calificaciones__isnull=False
-    ).distinct().prefetch_related('calificaciones')
-    
-    peliculas_con_promedio = [
-        (pelicula, pelicula.calificacion_promedio()) 
-        for pelicula in peliculas_con_calificaciones 
-        if pelicula.calificacion_promedio() > 0
-    ]
+@login_required
+@condicional('catalogo')
+@replicas.en_replica
+def movies_catalog_page(request, genero_id):
+    genero = get_object_or_404(Genre, id=genero_id)
     
-    peliculas_con_promedio.sort(key=lambda x: x[1], reverse=True)
-    peliculas_destacadas = [pelicula for pelicula, _ in peliculas_con_promedio[:6]]
+    try:
+        peliculas, cursor_siguiente = catalogo.pagina_genero(genero.id, request.GET.get('despues')) # type: ignore
+    except ValueError:
+        return HttpResponse('Cursor inválido', status=400)
+    
+    context = {
+        'genero': genero,
+        'peliculas': peliculas,
+        'cursor_siguiente': cursor_siguiente,
+    }
+    
+    return render(request, 'movies/components/catalog_carousel_items.html', context)
+
+
+@cache.memoizar('tarjetas')
+def get_peliculas_destacadas():
+    peliculas_destacadas = list(
+        Movie.objects.filter(calificacion_conteo__gt=0)
+        .prefetch_related('generos')
+        .order_by('-calificacion_media', '-calificacion_conteo')[:6]
+    )
     
     if len(peliculas_destacadas) < 6:
         otras_peliculas = Movie.objects.exclude(
             id__in=[p.id for p in peliculas_destacadas] # type: ignore
-        ).order_by('-fecha_agregado')[:6-len(peliculas_destacadas)]
+        ).prefetch_related('generos').order_by('-fecha_agregado')[:6-len(peliculas_destacadas)]
         peliculas_destacadas.extend(otras_peliculas)
     
-    total_peliculas = Movie.objects.count()
-    total_generos = Genre.objects.count()
+    return peliculas_destacadas
+
+@cache.memoizar('generos')
+def get_totales_catalogo():
+    return Movie.objects.count(), Genre.objects.count()
+
+@condicional('tarjetas')
+@replicas.en_replica
+def landing_page(request):
+    peliculas_destacadas = get_peliculas_destacadas()
+    total_peliculas, total_generos = get_totales_catalogo()
     
     context = {
         'peliculas_destacadas': peliculas_destacadas,
@@ -182,7 +220,13 @@ def landing_page(request):
     
     return render(request, 'movies/pages/landing.html', context)
 
+def get_progreso_pendiente(request, movie_id):
+    """Última visualización aún en el búfer de progreso (el historial que muestra el detalle)."""
+    pendiente = buffer_progreso.obtener(request.user.pk, movie_id)
+    return pendiente.ultima_visualizacion if pendiente is not None else None
+
 @login_required
+@condicional('detalle', pendiente=get_progreso_pendiente)
 def movie_detail(request, movie_id):
     pelicula = get_object_or_404(Movie, id=movie_id)
     
@@ -196,25 +240,22 @@ def movie_detail(request, movie_id):
             pelicula=pelicula
         ).exists()
         
-        progreso = WatchHistory.objects.filter(
-            usuario=request.user,
-            pelicula=pelicula
-        ).first()
+        progreso = historial_actual(request.user, pelicula)
         
         rating_usuario = Rating.objects.filter(
             usuario=request.user,
             pelicula=pelicula
         ).first()
     
-    generos_pelicula = pelicula.generos.all()  # type: ignore
-    
-    peliculas_relacionadas = Movie.objects.filter(
-        generos__in=generos_pelicula
-    ).exclude(
-        id=pelicula.id # type: ignore
-    ).distinct().annotate(
-        generos_comunes=Count('generos', filter=Q(generos__in=generos_pelicula))
-    ).order_by('-generos_comunes', '-fecha_agregado')[:8]
+    peliculas_relacionadas = [
+        relacion.relacionada
+        for relacion in cache.consulta_en_cache(
+            PeliculaRelacionada.objects.filter(
+                pelicula=pelicula
+            ).select_related('relacionada').prefetch_related('relacionada__generos')[:8],
+            'relacionadas',
+        )
+    ]
     
     context = {
         'pelicula': pelicula,
@@ -231,16 +272,7 @@ def movie_detail(request, movie_id):
 def toggle_favorite(request, movie_id):
     pelicula = get_object_or_404(Movie, id=movie_id)
     
-    favorito, created = Favorite.objects.get_or_create(
-        usuario=request.user,
-        pelicula=pelicula
-    )
-    
-    if not created:
-        favorito.delete()
-        es_favorito = False
-    else:
-        es_favorito = True
+    es_favorito = escritor.ejecutar(favoritos.alternar, request.user.id, pelicula.id, nombre='alternar_favorito')
     
     referer = request.META.get('HTTP_REFERER', '')
     
@@ -346,7 +378,7 @@ def activate(request, uidb64, token):
             })
         
         user.is_active = True
-        user.save()
+        escritor.ejecutar(user.save, update_fields=['is_active'], nombre='activar_cuenta')
         login(request, user)
         logger.info(f'Cuenta activada: usuario={user.username}')
         return redirect('movies:home')
@@ -417,81 +449,51 @@ def logout_view(request):
 
 @login_required
 def favorites_view(request):
-    favoritos = Favorite.objects.filter(usuario=request.user).select_related('pelicula').prefetch_related('pelicula__generos')
-    
     genero_filter = request.GET.get('genero', '')
-    order_by = request.GET.get('order', '-fecha_agregado')
-    
-    if genero_filter:
-        favoritos = [
-            fav for fav in favoritos 
-            if fav.pelicula.generos.filter(id=genero_filter).exists()  # type: ignore
-        ]
-    
-    if order_by == 'titulo':
-        favoritos = sorted(favoritos, key=lambda x: x.pelicula.titulo)
-    elif order_by == '-titulo':
-        favoritos = sorted(favoritos, key=lambda x: x.pelicula.titulo, reverse=True)
-    elif order_by == 'fecha_agregado':
-        favoritos = sorted(favoritos, key=lambda x: x.fecha_agregado)
-    else:  # '-fecha_agregado' (por defecto)
-        favoritos = sorted(favoritos, key=lambda x: x.fecha_agregado, reverse=True)
-    
-    peliculas_favoritas = [favorito.pelicula for favorito in favoritos]
+    order_by = request.GET.get('order', favoritos.ORDEN_POR_DEFECTO)
+    if order_by not in favoritos.ORDENES:
+        order_by = favoritos.ORDEN_POR_DEFECTO
+    genero_id = int(genero_filter) if genero_filter.isdigit() else None
+    cursor = request.GET.get('despues')
     
-    total_favoritos = len(peliculas_favoritas)
-    duracion_total = sum(pelicula.duracion for pelicula in peliculas_favoritas) // 60
-    
-    generos_count = {}
-    for pelicula in peliculas_favoritas:
-        for genero in pelicula.generos.all():  # type: ignore
-            genero_nombre = genero.nombre
-            generos_count[genero_nombre] = generos_count.get(genero_nombre, 0) + 1
-    
-    generos_favoritos = sorted(generos_count.items(), key=lambda x: x[1], reverse=True)[:3]
-    
-    todos_los_generos = Genre.objects.filter(peliculas__in=[p.id for p in peliculas_favoritas]).distinct().order_by('nombre')
+    try:
+        peliculas_favoritas, cursor_siguiente = favoritos.pagina(request.user, genero_id, order_by, cursor)
+    except ValueError:
+        return HttpResponse('Cursor inválido', status=400)
     
     context = {
         'peliculas_favoritas': peliculas_favoritas,
-        'total_favoritos': total_favoritos,
-        'duracion_total': duracion_total,
-        'generos_favoritos': generos_favoritos,
-        'todos_los_generos': todos_los_generos,
+        'cursor_siguiente': cursor_siguiente,
         'genero_filter': genero_filter,
         'order_by': order_by,
     }
     
+    # Páginas siguientes de la grilla: solo las tarjetas y el nuevo centinela
+    if cursor:
+        return render(request, 'movies/components/favorites_grid_items.html', context)
+    
     if request.headers.get('HX-Request'):
         return render(request, 'movies/pages/favorites_partial.html', context)
     
+    resumen = favoritos.resumen(request.user, genero_id)
+    context.update({
+        'total_favoritos': resumen['total_favoritos'],
+        'duracion_total': resumen['duracion_total'],
+        'generos_favoritos': favoritos.generos_mas_frecuentes(resumen['generos'], 3),
+        'todos_los_generos': resumen['generos'],
+    })
+    
     return render(request, 'movies/pages/favorites.html', context)
 
 @login_required
+@condicional('listas_usuario')
 def favorites_stats(request):
-    usuario = request.user
-    
-    favoritos = Favorite.objects.filter(usuario=usuario).select_related('pelicula')
-    peliculas_favoritas = [favorito.pelicula for favorito in favoritos]
-    
-    total_favoritos = len(peliculas_favoritas)
-    duracion_total = sum(p.duracion_minutos or 0 for p in peliculas_favoritas)
-    
-    generos_contador = {}
-    for pelicula in peliculas_favoritas:
-        for genero in pelicula.generos.all():
-            generos_contador[genero.nombre] = generos_contador.get(genero.nombre, 0) + 1
-    
-    generos_favoritos = sorted(
-        generos_contador.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:4]
+    resumen = favoritos.resumen(request.user)
     
     context = {
-        'total_favoritos': total_favoritos,
-        'duracion_total': duracion_total,
-        'generos_favoritos': generos_favoritos,
+        'total_favoritos': resumen['total_favoritos'],
+        'duracion_total': resumen['duracion_total'],
+        'generos_favoritos': favoritos.generos_mas_frecuentes(resumen['generos'], 4),
     }
     
     return render(request, 'movies/components/favorites_stats.html', context)
@@ -500,45 +502,53 @@ def favorites_stats(request):
 def watch_movie(request, movie_id):
     pelicula = get_object_or_404(Movie, id=movie_id)
     
-    historial = WatchHistory.objects.filter(
-        usuario=request.user,
-        pelicula=pelicula
-    ).first()
+    historial = historial_actual(request.user, pelicula)
     
     timestamp_inicial = historial.timestamp if historial else 0
     
+    # Los videos alojados en MEDIA_ROOT pasan por stream_video, que soporta rangos
+    url_video = pelicula.enlace_stream
+    if streaming.ruta_local(pelicula.enlace_stream):
+        url_video = reverse('movies:stream_video', args=[pelicula.id])
+    
     context = {
         'pelicula': pelicula,
         'timestamp_inicial': timestamp_inicial,
         'historial': historial,
+        'url_video': url_video,
     }
     
     return render(request, 'movies/pages/watch.html', context)
 
+@login_required
+@require_safe
+def stream_video(request, movie_id):
+    enlace = get_object_or_404(Movie.objects.values_list('enlace_stream', flat=True), id=movie_id)
+    ruta = streaming.ruta_local(enlace)
+    if ruta is None:
+        raise Http404('La película no tiene un video local')
+    
+    try:
+        return streaming.servir_video(request, ruta)
+    except FileNotFoundError:
+        raise Http404('Video no encontrado')
+
 @login_required
 @require_POST
 def update_watch_progress(request, movie_id):
-    pelicula = get_object_or_404(Movie, id=movie_id)
+    duracion = duracion_pelicula(movie_id)
+    if duracion is None:
+        raise Http404('Película no encontrada')
     
     timestamp = int(request.POST.get('timestamp', 0))
     
-    porcentaje_visto = (timestamp / pelicula.duracion) * 100 if pelicula.duracion > 0 else 0
-    completado = porcentaje_visto >= 90
-    
-    historial, created = WatchHistory.objects.get_or_create(
-        usuario=request.user,
-        pelicula=pelicula,
-        defaults={'timestamp': timestamp, 'completado': completado}
-    )
-    
-    if not created:
-        historial.timestamp = timestamp
-        historial.completado = completado
-        historial.save()
+    buffer_progreso.registrar(request.user.id, movie_id, timestamp, duracion)
     
     return HttpResponse(status=200)
 
 @login_required
+@condicional('catalogo')
+@replicas.en_replica
 def search_movies(request):
     query = request.GET.get('q', '').strip()
     
@@ -549,11 +559,9 @@ def search_movies(request):
     
     if query and len(query) >= 2:
         try:
-            resultados = Movie.objects.filter(
-                Q(titulo__icontains=query) | 
-                Q(descripcion__icontains=query)
-            ).prefetch_related('generos')[:15]
+            resultados = busqueda.obtener_backend().resultados(query, limite=15)
         except Exception as e:
+            logger.error(f"Error en la búsqueda '{query}': {e}")
             error = "Error en la búsqueda"
     
     return render(request, 'movies/components/search_results.html', {
@@ -577,14 +585,18 @@ def rate_movie(request, movie_id):
     except (ValueError, TypeError):
         return HttpResponse('Puntuación inválida', status=400)
     
-    rating, created = Rating.objects.update_or_create(
+    rating, created = escritor.ejecutar(
+        Rating.objects.update_or_create,
         usuario=request.user,
         pelicula=pelicula,
         defaults={
             'puntuacion': puntuacion,
-        }
+        },
+        nombre='calificar',
     )
     
+    pelicula.refresh_from_db(fields=['calificacion_conteo', 'calificacion_media'])
+    
     if created:
         logger.info(f'Nueva calificación: {request.user.username} calificó {pelicula.titulo} con {puntuacion} estrellas')
     else:
@@ -714,49 +726,22 @@ def password_reset_confirm(request, uidb64, token):
 
 @login_required
 def user_profile(request):
-    from .models import WatchHistory
-    from django.utils import timezone
-    from datetime import timedelta
-    
     user = request.user
+    buffer_progreso.vaciar(usuario_id=user.id)
     
     fecha_registro = user.date_joined
     dias_registrado = (timezone.now() - fecha_registro).days
     
-    historiales = WatchHistory.objects.filter(usuario=user)
-    
-    total_horas_vistas = 0
-    peliculas_completadas = 0
-    peliculas_en_progreso = 0
-    
-    for historial in historiales:
-        total_horas_vistas += historial.pelicula.duracion // 3600
-        
-        if historial.completado:
-            peliculas_completadas += 1
-        else:
-            peliculas_en_progreso += 1
-    
-    genero_mas_visto = None
-    if historiales.exists():
-        genero_mas_visto = (
-            Genre.objects
-            .annotate(vistas=Count('peliculas__visualizaciones', distinct=True))
-            .filter(vistas__gt=0)
-            .order_by('-vistas')
-            .first()
-        )
-    
-    ultimas_peliculas = historiales.select_related('pelicula').order_by('-ultima_visualizacion')[:5]
+    resumen = estadisticas.obtener(user)
     
     context = {
         'fecha_registro': fecha_registro,
         'dias_registrado': dias_registrado,
-        'total_horas_vistas': total_horas_vistas,
-        'peliculas_completadas': peliculas_completadas,
-        'peliculas_en_progreso': peliculas_en_progreso,
-        'genero_mas_visto': genero_mas_visto,
-        'ultimas_peliculas': ultimas_peliculas,
+        'total_horas_vistas': resumen.horas_vistas(),
+        'peliculas_completadas': resumen.completadas,
+        'peliculas_en_progreso': resumen.en_progreso,
+        'genero_mas_visto': resumen.genero_mas_visto,
+        'ultimas_peliculas': estadisticas.ultimos_historiales(resumen),
     }
     
     return render(request, 'movies/pages/profile.html', context)